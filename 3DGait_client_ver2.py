@@ -26,20 +26,43 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import argparse
+import asyncio
+import csv
+import itertools
+import json
+import multiprocessing
 import os
 import sys
-from functools import partial
+import threading
+from functools import lru_cache, partial
 
+import gevent
+import gevent.queue
 import numpy as np
 import tritonclient.grpc as grpcclient
+import tritonclient.grpc.aio as grpcaio
 import tritonclient.grpc.model_config_pb2 as mc
 import tritonclient.http as httpclient
-from PIL import Image
+import tritonclient.http.aio as httpaio
 from tritonclient.utils import InferenceServerException, triton_to_np_dtype
 import time
-import requests
 
+from arrival_schedule import make_intervals, split_intervals, trace_rate
+from autotuner import DEFAULT_GRID, search_cost, tune
+from client_trace import Tracer
+from energy_attribution import attribute_energy, integrate_energy, measure_idle_baseline
+from admission import AdmissionController, is_timeout
 from energy_meter_siroco import EnergyMeter
+from gallery import Gallery
+from latency_histogram import LatencyHistogram
+from request_pool import RequestPool
+from result_sink import ResultSink
+from sample_dataset import BatchPrefetcher, SampleDataset
+from shared_memory_io import SharedMemoryIO
+from track_identity import AdaptiveRate
+from track_simulator import DynamicBatcher, TrackStats, make_tracks
+from triton_metrics import MetricsClient, MetricsScraper
+from wire_codec import WireEncoder, request_bytes
 
 if sys.version_info >= (3, 0):
     import queue
@@ -50,24 +73,167 @@ else:
 class UserData:
     def __init__(self):
         self._completed_requests = queue.Queue()
-        #self._sampletimes=[]
-        
+        # request_id -> (time.monotonic_ns() when the request was sent,
+        # scheduled arrival, batch size)
+        self._send_times = {}
+        self.latencies = LatencyHistogram()
+        # (sent_ns, completed_ns, batch size) of every completed request,
+        # used to attribute the measured energy to requests
+        self.spans = []
+
+        # Open-loop runs also measure from the scheduled arrival time
+        self.arrival_latencies = LatencyHistogram()
+        # Called as hook(request_id, completion_ns) for every completion
+        self.completion_hooks = []
+        # Called as hook(request_id) for every request Triton dropped when
+        # its timeout expired (--deadline)
+        self.expiry_hooks = []
+        # AdmissionController of the requests when --deadline is given
+        self.admission = None
+        # SharedMemoryIO holding the tensors when --shared-memory is used
+        self.shared_memory = None
+        # RequestPool reusing the request objects unless --no-request-pool
+        self.request_pool = None
+        # BatchPrefetcher of real samples (image_filename): every request
+        # carries the next batch
+        self.dataset = None
+        # Gallery the output embeddings are matched against (--gallery)
+        self.gallery = None
+        self.output_name = None
+        self.top_k = 1
+        self.match_latencies = LatencyHistogram()
+        self.matched = 0
+        # Called as hook(request_id, labels, scores) with the gallery
+        # matches of every response
+        self.match_hooks = []
+        # Tracer recording the client stages of every request (--trace)
+        self.tracer = None
+        # Request ids, unique over the run (warm-up and every measurement
+        # window): the tracer and the completion paths are keyed on them
+        self._request_ids = itertools.count()
+        # ResultSink consuming every result unless --skip-output
+        self.result_sink = None
+        # WireEncoder of the batches built per request (--wire-dtype)
+        self.wire_encoder = None
+        # HTTP async requests: (greenlet, time.monotonic_ns() when its
+        # response arrived), queued by a link on the request greenlet
+        self._http_completed = gevent.queue.Queue()
+        # False for a model without batching (no batch dimension)
+        self.batched = True
+
+    def reset_measurements(self):
+        """
+        Starts new latency histograms and request spans, e.g. after the
+        warm-up or for a new measurement window.
+        """
+        self.latencies = LatencyHistogram()
+        self.arrival_latencies = LatencyHistogram()
+        self.spans = []
+        self.match_latencies = LatencyHistogram()
+        self.matched = 0
+        if self.admission is not None:
+            self.admission.reset()
+
+    def next_request_id(self):
+        return str(next(self._request_ids))
+
+    def batch_size(self, inputs):
+        # Inferences carried by a request: its leading dimension, or one
+        # sample for a model without batching
+        return inputs[0].shape()[0] if self.batched else 1
+
+    def abandon(self, request_id):
+        """
+        Forgets a request that was built but will never be answered (shed,
+        or its send raised), giving back its shared memory slot.
+        """
+        self._send_times.pop(request_id, None)
+        if self.shared_memory is not None:
+            self.shared_memory.release(request_id)
+
+    def mark_sent(self, request_id, scheduled_ns=None, batch_size=1):
+        self._send_times[request_id] = (time.monotonic_ns(), scheduled_ns, batch_size)
+
+    def mark_completed(self, request_id, completion_ns):
+        sent = self._send_times.pop(request_id, None)
+        if sent is not None:
+            sent_ns, scheduled_ns, batch_size = sent
+            self.latencies.record(completion_ns - sent_ns)
+            self.spans.append((sent_ns, completion_ns, batch_size))
+            if scheduled_ns is not None:
+                self.arrival_latencies.record(completion_ns - scheduled_ns)
+            if self.admission is not None:
+                self.admission.completed(
+                    sent_ns, sent_ns if scheduled_ns is None else scheduled_ns,
+                    completion_ns, batch_size)
+        if self.tracer is not None:
+            self.tracer.completed(request_id, completion_ns, time.monotonic_ns())
+        for hook in self.completion_hooks:
+            hook(request_id, completion_ns)
+
+    def mark_expired(self, request_id):
+        sent = self._send_times.pop(request_id, None)
+        if sent is not None and self.admission is not None:
+            self.admission.record_expired(sent[2])
+        if self.tracer is not None:
+            now_ns = time.monotonic_ns()
+            self.tracer.completed(request_id, now_ns, now_ns, stage="expired")
+        for hook in self.expiry_hooks:
+            hook(request_id)
+
+
+def admission_result(user_data):
+    """
+    (counts, slack histogram) of the admission controller of user_data,
+    to merge into another one, or None without --deadline.
+    """
+    admission = user_data.admission
+    if admission is None:
+        return None
+    return admission.counts(), admission.slack
+
+
+def http_infer(triton_client, *args, **kwargs):
+    # Body of the greenlet of an HTTP async request: (result, None), or
+    # (None, error) so that a failed request is not reported by gevent as
+    # a crashed greenlet
+    try:
+        return triton_client.infer(*args, **kwargs), None
+    except InferenceServerException as e:
+        return None, e
+
+
+def stamp_http_completion(user_data, greenlet):
+    # Runs in the hub as soon as the request greenlet has read the
+    # response, not when the collector gets to it
+    user_data._http_completed.put_nowait((greenlet, time.monotonic_ns()))
+
+
+def result_request_id(result):
+    response = result.get_response()
+    if isinstance(response, dict):
+        return response.get("id", "")
+    return response.id
 
 
 # Callback function used for async_stream_infer()
-def completion_callback(user_data, result, error):
-    # passing error raise and handling out
-    user_data._completed_requests.put((result, error))
-    #user_data._sampletimes.append(time.time())
+def completion_callback(user_data, result, error, request_id=None):
+    # passing error raise and handling out. The completion is stamped here,
+    # in the client thread that received the response, so the time spent in
+    # the queue until the main loop picks it up is not counted as latency.
+    # async_infer callbacks also carry the request_id, which a failed
+    # result does not.
+    user_data._completed_requests.put((result, error, time.monotonic_ns(), request_id))
 
 FLAGS = None
 
 
-def parse_model(model_metadata, model_config):
+def parse_model(model_metadata, model_config, input_shape=None):
     """
-    Check the configuration of a model to make sure it meets the
-    requirements for an image classification network (as expected by
-    this client)
+    Check the configuration of a model with one input and one output, of
+    any rank, layout and datatype, and return what this client needs to
+    build requests for it. Sample shapes do not include the batch
+    dimension; variable (-1) input dimensions are taken from input_shape.
     """
     if len(model_metadata.inputs) != 1:
         raise Exception("expecting 1 input, got {}".format(len(model_metadata.inputs)))
@@ -76,190 +242,695 @@ def parse_model(model_metadata, model_config):
             "expecting 1 output, got {}".format(len(model_metadata.outputs))
         )
 
-    if len(model_config.input) != 1:
-        raise Exception(
-            "expecting 1 input in model configuration, got {}".format(
-                len(model_config.input)
-            )
-        )
-
     input_metadata = model_metadata.inputs[0]
-    input_config = model_config.input[0]
     output_metadata = model_metadata.outputs[0]
+    max_batch_size = model_config.max_batch_size
 
-    if output_metadata.datatype != "FP32":
-        raise Exception(
-            "expecting output datatype to be FP32, model '"
-            + model_metadata.name
-            + "' output type is "
-            + output_metadata.datatype
-        )
+    # The batch dimension is the first one when the model supports batching
+    input_batch_dim = 1 if max_batch_size > 0 else 0
+    sample_shape = [int(d) for d in input_metadata.shape[input_batch_dim:]]
+    output_sample_shape = [int(d) for d in output_metadata.shape[input_batch_dim:]]
+    if any(d < 0 for d in sample_shape):
+        if input_shape is None:
+            raise Exception(
+                "model '{}' input has variable dimensions {}, give them with --input-shape".format(
+                    model_metadata.name, sample_shape))
+        if len(input_shape) != len(sample_shape) or any(
+                d >= 0 and d != given for d, given in zip(sample_shape, input_shape)):
+            raise Exception("--input-shape {} does not match model '{}' input {}".format(
+                input_shape, model_metadata.name, sample_shape))
+        sample_shape = list(input_shape)
 
-    # Output is expected to be a vector. But allow any number of
-    # dimensions as long as all but 1 is size 1 (e.g. { 10 }, { 1, 10
-    # }, { 10, 1, 1 } are all ok). Ignore the batch dimension if there
-    # is one.
-    output_batch_dim = model_config.max_batch_size > 0
-    non_one_cnt = 0
-    for dim in output_metadata.shape:
-        if output_batch_dim:
-            output_batch_dim = False
-        elif dim > 1:
-            non_one_cnt += 1
-            if non_one_cnt > 1:
-                raise Exception("expecting model output to be a vector")
-            
-    # Model input must have 3 dims, either CHW or HWC (not counting
-    # the batch dimension), either CHW or HWC
-    input_batch_dim = model_config.max_batch_size > 0
-    expected_input_dims = 3 + (1 if input_batch_dim else 0)
-    if len(input_metadata.shape) != expected_input_dims:
-        raise Exception(
-            "expecting input to have {} dimensions, model '{}' input has {}".format(
-                expected_input_dims, model_metadata.name, len(input_metadata.shape)
-            )
-        )
+    input_format = "FORMAT_NONE"
+    if len(model_config.input) == 1:
+        input_format = model_config.input[0].format
+        if type(input_format) != str:
+            input_format = mc.ModelInput.Format.Name(input_format)
 
-    if type(input_config.format) == str:
-        FORMAT_ENUM_TO_INT = dict(mc.ModelInput.Format.items())
-        input_config.format = FORMAT_ENUM_TO_INT[input_config.format]
-
-    #if (input_config.format != mc.ModelInput.FORMAT_NCHW) and (
-    #    input_config.format != mc.ModelInput.FORMAT_NHWC
-    #):
-    #    raise Exception(
-    #        "unexpected input format "
-    #        + mc.ModelInput.Format.Name(input_config.format)
-    #        + ", expecting "
-    #        + mc.ModelInput.Format.Name(mc.ModelInput.FORMAT_NCHW)
-    #        + " or "
-    #       + mc.ModelInput.Format.Name(mc.ModelInput.FORMAT_NHWC)
-    #   )
-
-    if input_config.format == mc.ModelInput.FORMAT_NHWC:
-        h = input_metadata.shape[1 if input_batch_dim else 0]
-        w = input_metadata.shape[2 if input_batch_dim else 1]
-        c = input_metadata.shape[3 if input_batch_dim else 2]
-    else:
-        c = input_metadata.shape[1 if input_batch_dim else 0]
-        h = input_metadata.shape[2 if input_batch_dim else 1]
-        w = input_metadata.shape[3 if input_batch_dim else 2]
+    if triton_to_np_dtype(input_metadata.datatype) in (None, np.object_):
+        raise Exception("unsupported input datatype {} of model '{}'".format(
+            input_metadata.datatype, model_metadata.name))
 
     return (
-        model_config.max_batch_size,
+        max_batch_size,
         input_metadata.name,
-        output_metadata.name,
-        c,
-        h,
-        w,
-        input_config.format,
+        sample_shape,
         input_metadata.datatype,
+        input_format,
+        output_metadata.name,
+        output_sample_shape,
+        output_metadata.datatype,
     )
 
 
-def preprocess(img, format, dtype, c, h, w, scaling, protocol):
+def generate_random_sample(batch_size, sample_shape, dtype=np.float32):
+    # Random test data of any shape: uniform [0, 1) for floating point
+    # inputs, the int8 range for integer ones.
+    shape = [batch_size] + list(sample_shape)
+    if np.issubdtype(dtype, np.floating):
+        return np.random.rand(*shape).astype(dtype)
+    if dtype == np.bool_:
+        return np.random.randint(0, 2, size=shape).astype(np.bool_)
+    info = np.iinfo(dtype)
+    return np.random.randint(max(info.min, -128), min(info.max, 127) + 1, size=shape).astype(dtype)
+    
+def postprocess(user_data, result, request_id):
     """
-    Pre-process an image to meet the size, type and format
-    requirements specified by the parameters.
+    Consumes one response: the ResultSink validates (and with
+    --decode-output decodes) it, and with --gallery the people of the
+    response are identified against the gallery: the whole batch of
+    output embeddings is matched at once and the time it takes is
+    recorded as the matching latency. The matches are passed on as
+    hook(request_id, labels, scores). The result is not kept.
     """
-    # np.set_printoptions(threshold='nan')
+    if result is None:
+        return
+    if user_data.result_sink is not None:
+        user_data.result_sink.consume(result)
+    if user_data.gallery is None:
+        return
+    start_ns = time.monotonic_ns()
+    embeddings = result.as_numpy(user_data.output_name)
+    labels, scores = user_data.gallery.match(embeddings, user_data.top_k)
+    end_ns = time.monotonic_ns()
+    user_data.match_latencies.record(end_ns - start_ns)
+    if user_data.tracer is not None:
+        user_data.tracer.span("match", request_id, start_ns, end_ns)
+    user_data.matched += len(labels)
+    for hook in user_data.match_hooks:
+        hook(request_id, labels, scores)
 
-    if c == 1:
-        sample_img = img.convert("L")
-    else:
-        sample_img = img.convert("RGB")
 
-    resized_img = sample_img.resize((w, h), Image.BILINEAR)
-    resized = np.array(resized_img)
-    if resized.ndim == 2:
-        resized = resized[:, :, np.newaxis]
+@lru_cache(maxsize=None)
+def load_gallery(path, nlist, nprobe):
+    """
+    Reads the gallery once per process, building its approximate index
+    if nlist > 0.
+    """
+    gallery = Gallery.load(path)
+    if nlist > 0:
+        gallery.build_index(nlist, nprobe)
+    return gallery
 
-    npdtype = triton_to_np_dtype(dtype)
-    typed = resized.astype(npdtype)
 
-    if scaling == "INCEPTION":
-        scaled = (typed / 127.5) - 1
-    elif scaling == "VGG":
-        if c == 1:
-            scaled = typed - np.asarray((128,), dtype=npdtype)
-        else:
-            scaled = typed - np.asarray((123, 117, 104), dtype=npdtype)
+def requestGenerator(batched_image_data1, input_name1, 
+                     output_name, output_shape, dtype, FLAGS,
+                     user_data=None, request_id=None, changed=False):
+    protocol = FLAGS.protocol.lower()
+    tracer = user_data.tracer if user_data is not None else None
+    start_ns = time.monotonic_ns() if tracer is not None else 0
+
+    if protocol == "grpc":
+        client = grpcclient
     else:
-        scaled = typed
+        client = httpclient
+
+    if user_data is not None and user_data.dataset is not None:
+        # Already in the wire datatype, encoded by the prefetcher
+        batched_image_data1 = user_data.dataset.next()
+        changed = True
+    elif changed and user_data is not None and user_data.wire_encoder is not None:
+        batched_image_data1 = user_data.wire_encoder.encode(batched_image_data1)
 
-    # Swap to CHW if necessary
-    if format == mc.ModelInput.FORMAT_NCHW:
-        ordered = np.transpose(scaled, (2, 0, 1))
+    if user_data is not None and user_data.shared_memory is not None:
+        # Tensors live in registered shared memory, only references are sent
+        inputs, outputs = user_data.shared_memory.request_tensors(request_id, batched_image_data1)
+    elif user_data is not None and user_data.request_pool is not None:
+        # Reuse the request objects (and the serialized batch) of the run
+        inputs, outputs = user_data.request_pool.get(
+            FLAGS.model_name, batched_image_data1, dtype, changed)
     else:
-        ordered = scaled
+        # Set the input data
+        inputs = [client.InferInput(input_name1, batched_image_data1.shape, dtype)]
+        inputs[0].set_data_from_numpy(batched_image_data1)
 
-    # Channels are in RGB order. Currently model configuration data
-    # doesn't provide any information as to other channel orderings
-    # (like BGR) so we just assume RGB.
-    return ordered
+        outputs = [client.InferRequestedOutput(output_name, class_count=FLAGS.classes)]
 
-def generate_random_sample (b, c, h, w, f):
-    #return torch.rand(b,c,h,w)
-    return np.random.rand(b,c,h,w,f).astype(np.float32)
+    if tracer is not None:
+        tracer.span("build", request_id, start_ns, time.monotonic_ns())
+    yield inputs, outputs, FLAGS.model_name, FLAGS.model_version
     
-def postprocess(results, output_name, batch_size, supports_batching):
+def compression_args(FLAGS):
     """
-    Post-process results to show classifications.
+    Keyword arguments of the infer calls that compress the request body
+    with --compression.
     """
+    if FLAGS.compression == "none":
+        return {}
+    if FLAGS.protocol.lower() == "grpc":
+        return {"compression_algorithm": FLAGS.compression}
+    return {"request_compression_algorithm": FLAGS.compression}
 
-    output_array = results.as_numpy(output_name)
-    if supports_batching and len(output_array) != batch_size:
-        raise Exception(
-            "expected {} results, got {}".format(batch_size, len(output_array))
-        )
 
-    # Include special handling for non-batching models
-    for results in output_array:
-        if not supports_batching:
-            results = [results]
-        for result in results:
-            if output_array.dtype.type == np.object_:
-                cls = "".join(chr(x) for x in result).spliºt(":")
-            else:
-                cls = result.split(":")
-            print("    {} ({}) = {}".format(cls[0], cls[1], cls[2]))
+def send_request(triton_client, user_data, request_id, inputs, outputs,
+                 model_name, model_version, http_requests, FLAGS,
+                 scheduled_ns=None, timeout_us=None):
+    """
+    Sends one request with the API selected in FLAGS. Asynchronous
+    requests complete through user_data._completed_requests (gRPC) or
+    http_requests (HTTP); a synchronous request is returned completed
+    (None if it expired).
+    With --deadline the request carries timeout_us, the Triton timeout
+    its driver got from the admission controller.
+    """
+    user_data.mark_sent(request_id, scheduled_ns, user_data.batch_size(inputs))
+    tracer = user_data.tracer
+    send_ns = time.monotonic_ns() if tracer is not None else 0
+    try:
+        if FLAGS.streaming:
+            triton_client.async_stream_infer(
+                model_name,
+                inputs,
+                request_id=request_id,
+                model_version=model_version,
+                outputs=outputs,
+            )
+        elif FLAGS.async_set and FLAGS.protocol.lower() == "grpc":
+            triton_client.async_infer(
+                model_name,
+                inputs,
+                partial(completion_callback, user_data, request_id=request_id),
+                request_id=request_id,
+                model_version=model_version,
+                outputs=outputs,
+                timeout=timeout_us,
+                **compression_args(FLAGS)
+            )
+        elif FLAGS.async_set:
+            # The blocking infer() in a greenlet of its own, rather than
+            # async_infer(), which sleeps 10 ms in the caller after every send
+            # and so caps a sender at less than 100 requests/s
+            greenlet = gevent.spawn(
+                http_infer, triton_client,
+                model_name,
+                inputs,
+                request_id=request_id,
+                model_version=model_version,
+                outputs=outputs,
+                timeout=timeout_us,
+                **compression_args(FLAGS)
+            )
+            greenlet.rawlink(partial(stamp_http_completion, user_data))
+            http_requests[greenlet] = request_id
+        else:
+            try:
+                result = triton_client.infer(
+                    model_name,
+                    inputs,
+                    request_id=request_id,
+                    model_version=model_version,
+                    outputs=outputs,
+                    timeout=timeout_us,
+                    **compression_args(FLAGS)
+                )
+            except InferenceServerException as e:
+                if user_data.admission is None or not is_timeout(e):
+                    raise
+                if tracer is not None:
+                    tracer.sent(request_id, send_ns, send_ns)
+                user_data.mark_expired(request_id)
+                return None
+    except Exception:
+        user_data.abandon(request_id)
+        raise
+    if not FLAGS.async_set and not FLAGS.streaming:
+        if tracer is not None:
+            # The synchronous call covers every stage up to the response
+            tracer.sent(request_id, send_ns, time.monotonic_ns())
+        user_data.mark_completed(request_id, time.monotonic_ns())
+        return result
+    if tracer is not None:
+        tracer.sent(request_id, send_ns, time.monotonic_ns())
+    return None
 
 
-def requestGenerator(batched_image_data1, input_name1, 
-                     output_name, output_shape, dtype, FLAGS):
-    protocol = FLAGS.protocol.lower()
+def collect_completions(user_data, http_requests, FLAGS, timeout=None):
+    """
+    Waits for at least one asynchronous request to complete (or until
+    timeout seconds elapse) and returns how many completed.
+    """
+    if FLAGS.protocol.lower() == "grpc":
+        try:
+            (results, error, completion_ns, request_id) = user_data._completed_requests.get(
+                timeout=timeout)
+        except queue.Empty:
+            return 0
+        if error is not None:
+            if request_id is not None and user_data.admission is not None and is_timeout(error):
+                user_data.mark_expired(request_id)
+                return 1
+            raise error
+        request_id = result_request_id(results)
+        user_data.mark_completed(request_id, completion_ns)
+        postprocess(user_data, results, request_id)
+        return 1
 
-    if protocol == "grpc":
-        client = grpcclient
+    # The HTTP client runs on gevent: wait on the queue of completions
+    # (yielding to the hub) instead of blocking the thread, then take
+    # every other completion already queued. Requests are timed by the
+    # stamp of their greenlet, not when they are taken here.
+    try:
+        completion = user_data._http_completed.get(timeout=timeout)
+    except gevent.queue.Empty:
+        return 0
+    completed = 0
+    while completion is not None:
+        greenlet, completion_ns = completion
+        completion = (user_data._http_completed.get_nowait()
+                      if not user_data._http_completed.empty() else None)
+        # Left over from an aborted run
+        request_id = http_requests.pop(greenlet, None)
+        if request_id is None:
+            continue
+        get_ns = time.monotonic_ns()
+        result, error = greenlet.get()
+        if error is not None:
+            if user_data.admission is None or not is_timeout(error):
+                raise error
+            user_data.mark_expired(request_id)
+            completed += 1
+            continue
+        if user_data.tracer is not None:
+            user_data.tracer.completed(request_id, completion_ns, get_ns)
+        user_data.mark_completed(request_id, completion_ns)
+        postprocess(user_data, result, request_id)
+        completed += 1
+    return completed
+
+
+def run_closed_loop(triton_client, user_data, batched_image_data, input_name,
+                    output_name, output_shape, dtype, total_requests, FLAGS):
+    """
+    Closed-loop driver. Keeps exactly FLAGS.conc requests in flight and
+    tops the window up as soon as any of them completes, until
+    total_requests have been sent and answered. HTTP async, gRPC async and
+    gRPC streaming share the same window semantics, so a given -conc is
+    comparable to perf_analyzer's --concurrency-range. Sync inference has
+    a window of one request.
+    """
+    pipelined = FLAGS.streaming or FLAGS.async_set
+    window = max(FLAGS.conc, 1) if pipelined else 1
+    # Ongoing HTTP async requests: greenlet -> request_id
+    http_requests = {}
+    sent = 0
+    completed = 0
+
+    while completed < total_requests:
+        while sent < total_requests and sent - completed < window:
+            request_id = user_data.next_request_id()
+            origin_ns = time.monotonic_ns()
+            for inputs, outputs, model_name, model_version in requestGenerator(
+                batched_image_data, input_name,
+                output_name, output_shape, dtype, FLAGS,
+                user_data, request_id):
+                timeout_us = None
+                if user_data.admission is not None:
+                    timeout_us = user_data.admission.admit_now(
+                        origin_ns, user_data.batch_size(inputs))
+                    if timeout_us is None:
+                        # Shed: answered without reaching the server
+                        user_data.abandon(request_id)
+                        completed += 1
+                        sent += 1
+                        continue
+                result = send_request(
+                    triton_client, user_data, request_id, inputs, outputs,
+                    model_name, model_version, http_requests, FLAGS,
+                    scheduled_ns=origin_ns if user_data.admission is not None else None,
+                    timeout_us=timeout_us)
+                if result is not None:
+                    postprocess(user_data, result, request_id)
+                if not pipelined:
+                    completed += 1
+                sent += 1
+
+        if pipelined:
+            completed += collect_completions(user_data, http_requests, FLAGS)
+
+
+
+def in_flight_cap(user_data, FLAGS):
+    """
+    Most requests an open loop keeps outstanding (0 for no limit):
+    FLAGS.max_in_flight, or the shared memory slots, one per request.
+    """
+    if user_data.shared_memory is not None:
+        return user_data.shared_memory.slots
+    return FLAGS.max_in_flight
+
+
+class OpenLoopStats:
+    def __init__(self, offered_rate):
+        self.offered_rate = offered_rate
+        self.sent = 0
+        self.late = 0
+        self.dropped = 0
+        self.send_start_ns = 0
+        self.send_end_ns = 0
+        self.done = False
+        self.error = None
+
+    def achieved_rate(self):
+        elapsed_ns = self.send_end_ns - self.send_start_ns
+        if elapsed_ns <= 0:
+            return 0.0
+        return self.sent / (elapsed_ns / 1e9)
+
+
+def open_loop_sender(triton_client, user_data, batched_image_data, input_name,
+                     output_name, output_shape, dtype, total_requests,
+                     intervals, stats, http_requests, completed_count, sleep, FLAGS):
+    """
+    Issues total_requests arrivals following the inter-arrival times in
+    intervals, independently of how fast the server answers. A send that
+    starts more than FLAGS.late_threshold ms after its arrival time counts
+    as late; an arrival that finds FLAGS.max_in_flight requests outstanding
+    is dropped.
+    """
+    late_threshold_ns = int(FLAGS.late_threshold * 1e6)
+    max_in_flight = in_flight_cap(user_data, FLAGS)
+    stats.send_start_ns = time.monotonic_ns()
+    arrival_ns = stats.send_start_ns
+    try:
+        for _ in range(total_requests):
+            arrival_ns += next(intervals)
+            delay_ns = arrival_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                sleep(delay_ns / 1e9)
+            elif -delay_ns > late_threshold_ns:
+                stats.late += 1
+
+            if max_in_flight > 0 and stats.sent - completed_count() >= max_in_flight:
+                stats.dropped += 1
+                continue
+            timeout_us = None
+            if user_data.admission is not None:
+                # Shed an arrival that would complete after its deadline
+                timeout_us = user_data.admission.admit(arrival_ns, time.monotonic_ns(), FLAGS.batch_size)
+                if timeout_us is None:
+                    continue
+
+            request_id = user_data.next_request_id()
+            for inputs, outputs, model_name, model_version in requestGenerator(
+                batched_image_data, input_name,
+                output_name, output_shape, dtype, FLAGS,
+                user_data, request_id):
+                send_request(
+                    triton_client, user_data, request_id, inputs, outputs,
+                    model_name, model_version, http_requests, FLAGS,
+                    scheduled_ns=arrival_ns, timeout_us=timeout_us)
+                stats.sent += 1
+    except Exception as e:
+        stats.error = e
+    stats.send_end_ns = time.monotonic_ns()
+    stats.done = True
+
+
+def run_with_sender(sender, sender_args, stats, user_data, FLAGS):
+    """
+    Runs an open-loop sender (a thread for gRPC, a greenlet for the
+    gevent-based HTTP client) and collects the completions in the calling
+    thread until every sent request has been answered. The sender is
+    called as sender(*sender_args, stats, http_requests, completed_count,
+    sleep, FLAGS).
+    """
+    if not (FLAGS.streaming or FLAGS.async_set):
+        raise Exception("open-loop modes need the asynchronous (-a) or streaming API")
+
+    http_requests = {}
+    completed = [0]
+    args = tuple(sender_args) + (stats, http_requests, lambda: completed[0])
+
+    if FLAGS.protocol.lower() == "grpc":
+        sender = threading.Thread(target=sender, args=args + (time.sleep, FLAGS))
+        sender.start()
     else:
-        client = httpclient
+        sender = gevent.spawn(sender, *(args + (gevent.sleep, FLAGS)))
 
-    # Set the input data
-    inputs = [client.InferInput(input_name1, batched_image_data1.shape, dtype)]
-    inputs[0].set_data_from_numpy(batched_image_data1)
+    while not stats.done or completed[0] < stats.sent:
+        completed[0] += collect_completions(
+            user_data, http_requests, FLAGS, timeout=0.05)
+        if stats.error is not None:
+            break
 
-    outputs = [client.InferRequestedOutput(output_name, class_count=FLAGS.classes)]
+    sender.join()
+    if stats.error is not None:
+        raise stats.error
+
+
+def run_open_loop(triton_client, user_data, batched_image_data, input_name,
+                  output_name, output_shape, dtype, total_requests, intervals,
+                  stats, FLAGS):
+    """
+    Open-loop driver. A dedicated sender issues requests on the arrival
+    schedule while this function collects the completions. Latency is
+    recorded both from the actual send and from the scheduled arrival, so
+    sender delays under overload are not hidden.
+    """
+    return run_with_sender(
+        open_loop_sender,
+        (triton_client, user_data, batched_image_data, input_name,
+         output_name, output_shape, dtype, total_requests, intervals),
+        stats, user_data, FLAGS)
+
+
+class AsyncioClient:
+    """
+    Triton aio client (tritonclient.grpc.aio / tritonclient.http.aio) with
+    the event loop that drives it. Both are created once and reused by
+    every run, as the synchronous client is.
+    """
+
+    def __init__(self, FLAGS, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.client = self.loop.run_until_complete(self._create(FLAGS, concurrency))
+        self.infer_args = compression_args(FLAGS)
+
+    async def _create(self, FLAGS, concurrency):
+        if FLAGS.protocol.lower() == "grpc":
+            return grpcaio.InferenceServerClient(url=FLAGS.url, verbose=FLAGS.verbose)
+        # One connection per request in flight; concurrency 0 (unbounded
+        # open loop) lets aiohttp open as many connections as requests
+        return httpaio.InferenceServerClient(
+            url=FLAGS.url, verbose=FLAGS.verbose, conn_limit=concurrency)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def close(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+
+
+async def aio_infer(aio_client, user_data, request_id, inputs, outputs,
+                    model_name, model_version, scheduled_ns=None, timeout_us=None):
+    # Sent and completed are stamped in the coroutine itself, with no
+    # callback or queue between the response and the timestamp
+    user_data.mark_sent(request_id, scheduled_ns, user_data.batch_size(inputs))
+    if user_data.tracer is not None:
+        # Serialization, network and parsing all happen in the await
+        sent_ns = time.monotonic_ns()
+        user_data.tracer.sent(request_id, sent_ns, sent_ns)
+    try:
+        result = await aio_client.client.infer(
+            model_name,
+            inputs,
+            model_version=model_version,
+            outputs=outputs,
+            request_id=request_id,
+            timeout=timeout_us,
+            **aio_client.infer_args
+        )
+    except InferenceServerException as e:
+        if user_data.admission is None or not is_timeout(e):
+            user_data.abandon(request_id)
+            raise
+        user_data.mark_expired(request_id)
+        return None
+    except Exception:
+        user_data.abandon(request_id)
+        raise
+    user_data.mark_completed(request_id, time.monotonic_ns())
+    postprocess(user_data, result, request_id)
+    return result
+
+
+def run_closed_loop_asyncio(aio_client, triton_client, user_data, batched_image_data,
+                            input_name, output_name, output_shape, dtype,
+                            total_requests, FLAGS):
+    """
+    Closed-loop driver of the --asyncio mode: FLAGS.conc coroutines on one
+    event loop, each sending its next request as soon as its previous one
+    completes, until total_requests have been answered.
+    """
+    requests = iter(range(total_requests))
+
+    async def slot():
+        for _ in requests:
+            request_id = user_data.next_request_id()
+            origin_ns = time.monotonic_ns()
+            for inputs, outputs, model_name, model_version in requestGenerator(
+                batched_image_data, input_name,
+                output_name, output_shape, dtype, FLAGS,
+                user_data, request_id):
+                timeout_us = None
+                if user_data.admission is not None:
+                    timeout_us = user_data.admission.admit_now(
+                        origin_ns, user_data.batch_size(inputs))
+                    if timeout_us is None:
+                        user_data.abandon(request_id)
+                        continue
+                await aio_infer(
+                    aio_client, user_data, request_id, inputs, outputs,
+                    model_name, model_version,
+                    scheduled_ns=origin_ns if user_data.admission is not None else None,
+                    timeout_us=timeout_us)
+
+    async def run():
+        await asyncio.gather(*[slot() for _ in range(min(max(FLAGS.conc, 1), total_requests))])
+
+    aio_client.run(run())
+
+
+def run_open_loop_asyncio(aio_client, triton_client, user_data, batched_image_data,
+                          input_name, output_name, output_shape, dtype,
+                          total_requests, intervals, stats, FLAGS):
+    """
+    Open-loop driver of the --asyncio mode: every arrival becomes a task
+    on the event loop, so thousands of requests can be outstanding at once
+    (bounded only by FLAGS.max_in_flight).
+    """
+    late_threshold_ns = int(FLAGS.late_threshold * 1e6)
+    max_in_flight = in_flight_cap(user_data, FLAGS)
+
+    async def send(request_id, arrival_ns, timeout_us):
+        for inputs, outputs, model_name, model_version in requestGenerator(
+            batched_image_data, input_name,
+            output_name, output_shape, dtype, FLAGS,
+            user_data, request_id):
+            await aio_infer(
+                aio_client, user_data, request_id, inputs, outputs,
+                model_name, model_version, scheduled_ns=arrival_ns, timeout_us=timeout_us)
+
+    async def run():
+        tasks = set()
+        stats.send_start_ns = time.monotonic_ns()
+        arrival_ns = stats.send_start_ns
+        for _ in range(total_requests):
+            arrival_ns += next(intervals)
+            delay_ns = arrival_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                await asyncio.sleep(delay_ns / 1e9)
+            elif -delay_ns > late_threshold_ns:
+                stats.late += 1
+
+            if max_in_flight > 0 and len(tasks) >= max_in_flight:
+                stats.dropped += 1
+                continue
+            timeout_us = None
+            if user_data.admission is not None:
+                timeout_us = user_data.admission.admit(arrival_ns, time.monotonic_ns(), FLAGS.batch_size)
+                if timeout_us is None:
+                    continue
+            task = asyncio.ensure_future(send(user_data.next_request_id(), arrival_ns, timeout_us))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            stats.sent += 1
+        stats.send_end_ns = time.monotonic_ns()
+        stats.done = True
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    aio_client.run(run())
+
+
+def track_sender(triton_client, user_data, tracks, batcher, track_stats,
+                 windows_per_track, input_name, output_name, output_shape,
+                 dtype, adaptive, stats, http_requests, completed_count, sleep, FLAGS):
+    """
+    Simulates the tracks: every track emits windows_per_track windows at
+    its own cadence, the batcher packs them and each released batch is
+    sent as one request. With an AdaptiveRate, the windows of tracks
+    already identified are only sent at its reduced rate.
+    """
+    stats.send_start_ns = time.monotonic_ns()
+    try:
+        while True:
+            active = [t for t in tracks if t.emitted < windows_per_track]
+            if not active and not batcher.pending:
+                break
+            wake_ns = batcher.deadline()
+            if active:
+                next_emit_ns = min(t.next_emit_ns for t in active)
+                if wake_ns is None or next_emit_ns < wake_ns:
+                    wake_ns = next_emit_ns
+            delay_ns = wake_ns - time.monotonic_ns()
+            if delay_ns > 0:
+                sleep(delay_ns / 1e9)
+
+            now_ns = time.monotonic_ns()
+            for track in active:
+                while track.next_emit_ns <= now_ns and track.emitted < windows_per_track:
+                    if track.stacker is not None:
+                        batcher.detach(track.track_id)
+                    emit_ns = track.emit()
+                    if adaptive is None or adaptive.should_infer(track.track_id):
+                        batcher.add(track.track_id, emit_ns, track.window)
+
+            admission = user_data.admission
+            if admission is not None:
+                # Stale windows never reach the server: superseded ones and
+                # those that would complete after their deadline
+                shed = batcher.shed(lambda emit_ns: admission.would_miss(emit_ns, now_ns))
+                if shed:
+                    admission.record_shed(len(shed))
+                    if adaptive is not None:
+                        adaptive.shed([track_id for track_id, _ in shed])
+            while batcher.ready(now_ns):
+                batch, members = batcher.pop_batch()
+                # The oldest window of the batch sets its deadline
+                origin_ns = min(emit_ns for _, emit_ns in members)
+                timeout_us = None
+                if admission is not None:
+                    timeout_us = admission.admit(origin_ns, now_ns, len(members))
+                    if timeout_us is None:
+                        if adaptive is not None:
+                            adaptive.shed([track_id for track_id, _ in members])
+                        continue
+                request_id = user_data.next_request_id()
+                track_stats.record_batch(request_id, members)
+                if adaptive is not None:
+                    adaptive.record_batch(request_id, [track_id for track_id, _ in members])
+                for inputs, outputs, model_name, model_version in requestGenerator(
+                    batch, input_name, output_name, output_shape, dtype, FLAGS,
+                    user_data, request_id, changed=True):
+                    send_request(
+                        triton_client, user_data, request_id, inputs, outputs,
+                        model_name, model_version, http_requests, FLAGS,
+                        scheduled_ns=origin_ns if admission is not None else None,
+                        timeout_us=timeout_us)
+                    stats.sent += 1
+    except Exception as e:
+        stats.error = e
+    stats.send_end_ns = time.monotonic_ns()
+    stats.done = True
+
+
+def run_track_simulation(triton_client, user_data, tracks, batcher, track_stats,
+                         windows_per_track, input_name, output_name,
+                         output_shape, dtype, stats, FLAGS, adaptive=None):
+    """
+    Multi-person workload: tracks emit gait windows that are batched on
+    the client (up to the model max_batch_size, waiting at most
+    --batch-wait ms) and latency is measured per window from its emission.
+    """
+    user_data.completion_hooks.append(track_stats.record_completion)
+    return run_with_sender(
+        track_sender,
+        (triton_client, user_data, tracks, batcher, track_stats,
+         windows_per_track, input_name, output_name, output_shape, dtype, adaptive),
+        stats, user_data, FLAGS)
 
-    yield inputs, outputs, FLAGS.model_name, FLAGS.model_version
-    
-def get_metrics():
-    metrics_url = "http://localhost:8002/metrics"
-    r = requests.get(metrics_url)
-    r.raise_for_status()
-    return r.text
-
-def get_metrics_values(metrics, model_name):
-    patterns = [
-        model_name
-    ]
-    values=[]
-    for line in metrics.split('\n'):
-        if patterns[0] in line:
-            fields = line.split()
-            values.append(fields[1])
-    return values
-            
-    
 
 def convert_http_metadata_config(_metadata, _config):
     # NOTE: attrdict broken in python 3.10 and not maintained.
@@ -278,50 +949,1401 @@ def convert_http_metadata_config(_metadata, _config):
     return AttrDict(_metadata), AttrDict(_config)
 
 
+def create_client(FLAGS, concurrency):
+    """
+    Creates the Triton client of the selected protocol. concurrency is the
+    number of connections of the HTTP client (requests in flight).
+    """
+    if FLAGS.protocol.lower() == "grpc":
+        # Create gRPC client for communicating with the server
+        return grpcclient.InferenceServerClient(
+            url=FLAGS.url, verbose=FLAGS.verbose
+        )
+    # Specify large enough concurrency to handle the
+    # the number of requests.
+    return httpclient.InferenceServerClient(
+        url=FLAGS.url, verbose=FLAGS.verbose, concurrency=concurrency
+    )
+
+
+class ModelInfo:
+    """
+    Properties of a served model needed to build requests for it.
+    """
+
+    def __init__(self, name, version, model_metadata, model_config, input_shape=None):
+        self.name = name
+        self.version = version
+        self.metadata = model_metadata
+        self.config = model_config
+        (self.max_batch_size, self.input_name, self.sample_shape, self.dtype,
+         self.format, self.output_name, self.output_sample_shape,
+         self.output_dtype) = parse_model(model_metadata, model_config, input_shape)
+        self.input_shape = model_metadata.inputs[0].shape
+        self.output_shape = model_metadata.outputs[0].shape
+        self.np_dtype = triton_to_np_dtype(self.dtype)
+
+
+def load_model(triton_client, model_name, model_version, FLAGS):
+    """
+    Retrieves the metadata and configuration of a model and checks that
+    it has the single input and output this client expects.
+    """
+    # Make sure the model matches our requirements, and get some
+    # properties of the model that we need for preprocessing
+    model_metadata = triton_client.get_model_metadata(
+        model_name=model_name, model_version=model_version
+    )
+    model_config = triton_client.get_model_config(
+        model_name=model_name, model_version=model_version
+    )
+
+    if FLAGS.protocol.lower() == "grpc":
+        model_config = model_config.config
+    else:
+        model_metadata, model_config = convert_http_metadata_config(
+            model_metadata, model_config
+        )
+
+    input_shape = parse_list(FLAGS.input_shape.replace("x", ",")) if FLAGS.input_shape else None
+    return ModelInfo(model_name, model_version, model_metadata, model_config, input_shape)
+
+
+def is_stable(windows, count, tolerance):
+    """
+    perf_analyzer-like stability criterion: the throughput and the p99
+    latency of each of the last count windows are within tolerance
+    (fraction) of their average.
+    """
+    if len(windows) < count:
+        return False
+    for key in ("throughput", "p99"):
+        values = [window[key] for window in windows[-count:]]
+        mean = sum(values) / count
+        if mean <= 0 or any(abs(value - mean) > tolerance * mean for value in values):
+            return False
+    return True
+
+
+class LoadGenerator:
+    """
+    Request side of one configuration: the test batch, the load mode of
+    FLAGS, the request objects or shared-memory regions and the drivers.
+    run_configuration uses one in the client process; with --workers every
+    worker process runs its own.
+    """
+
+    def __init__(self, triton_client, aio_client, model, FLAGS):
+        self.triton_client = triton_client
+        self.aio_client = aio_client
+        self.FLAGS = FLAGS
+        self.open_loop = FLAGS.request_rate > 0 or FLAGS.arrival == "trace"
+        self.track_mode = FLAGS.tracks > 0
+        self.windows = []
+        self.open_loop_stats = None
+        self.track_stats = None
+        self.track_batch_size = None
+        self.adaptive = None
+        self.tracer = Tracer() if FLAGS.trace else None
+
+        max_batch_size = model.max_batch_size
+
+        self.input_name = model.input_name
+        self.output_name = model.output_name
+        self.output_shape = model.output_shape
+        self.dtype = model.dtype
+
+        supports_batching = max_batch_size > 0
+        if not supports_batching and FLAGS.batch_size != 1:
+            raise Exception("This model doesn't support batching.")
+        
+        # With --wire-dtype the samples are FP32, as the optical flow is,
+        # and every batch is converted to the FP16/INT8 input of the model
+        self.wire_encoder = None
+        source_dtype = model.np_dtype
+        if FLAGS.wire_dtype:
+            if model.dtype != FLAGS.wire_dtype:
+                raise Exception("--wire-dtype {} needs a model with a {} input, '{}' takes {}".format(
+                    FLAGS.wire_dtype, FLAGS.wire_dtype, model.name, model.dtype))
+            self.wire_encoder = WireEncoder(
+                FLAGS.wire_dtype, FLAGS.int8_scale if FLAGS.int8_scale > 0 else None,
+                FLAGS.int8_zero_point)
+            source_dtype = np.float32
+
+        # One sample of any rank, e.g. 25x60x60x2 flow stacks for the 3D
+        # model or 50x60x60 for the 2D one
+        self.dataset = None
+        if FLAGS.image_filename:
+            # Real samples, memory-mapped; the random batch is replaced by
+            # the first one of the data
+            self.dataset = SampleDataset(FLAGS.image_filename, model.sample_shape, source_dtype)
+            self.batched_image_data = np.array(self.dataset.batch(0, FLAGS.batch_size))
+        else:
+            self.batched_image_data = generate_random_sample(
+                FLAGS.batch_size, model.sample_shape, source_dtype)
+        self.source_dtype = self.batched_image_data.dtype
+        if self.wire_encoder is not None:
+            # Encoded once into its own array (INT8 calibrates on it): the
+            # encoder buffer is reused by the batches that change
+            self.batched_image_data = self.wire_encoder.encode(
+                self.batched_image_data,
+                np.empty(self.batched_image_data.shape, dtype=self.wire_encoder.dtype))
+        if not supports_batching:
+            # The input of a model without batching has no batch dimension
+            self.batched_image_data = self.batched_image_data[0]
+
+        num_launches = FLAGS.iter
+        # Every concurrency slot issues -iter requests (sync mode has one slot).
+        # The open-loop mode has no slots and sends -iter requests in total.
+        if self.track_mode:
+            self.total_requests = num_launches * FLAGS.tracks
+            self.track_batch_size = max(max_batch_size, 1)
+            # A window every --stride frames of each track
+            self.window_rate = FLAGS.track_rate / FLAGS.stride
+            frame_budget = FLAGS.frame_budget if FLAGS.frame_budget > 0 else 1000.0 / self.window_rate
+            self.sample_shape = self.batched_image_data.shape[1:]
+            self.batcher = DynamicBatcher(
+                self.track_batch_size, int(FLAGS.batch_wait * 1e6), self.sample_shape,
+                self.source_dtype)
+            self.track_stats = TrackStats(FLAGS.tracks, self.track_batch_size, int(frame_budget * 1e6))
+            self.open_loop_stats = OpenLoopStats(FLAGS.tracks * self.window_rate)
+        elif self.open_loop:
+            self.total_requests = num_launches
+            if FLAGS.arrival == "trace":
+                offered_rate = trace_rate(FLAGS.arrival_trace)
+            else:
+                offered_rate = FLAGS.request_rate
+            self.intervals = make_intervals(
+                FLAGS.arrival, FLAGS.request_rate, FLAGS.arrival_trace, FLAGS.seed)
+            if FLAGS.workers > 1:
+                # This worker replays its share of the common schedule
+                offered_rate /= FLAGS.workers
+                self.intervals = split_intervals(
+                    self.intervals, FLAGS.workers, FLAGS.worker_index)
+            self.open_loop_stats = OpenLoopStats(offered_rate)
+        elif FLAGS.async_set or FLAGS.streaming:
+            self.total_requests = num_launches * FLAGS.conc
+        else:
+            self.total_requests = num_launches
+
+        # Send requests of FLAGS.batch_size images. If the number of
+        # images isn't an exact multiple of FLAGS.batch_size then just
+        # start over with the first images until the batch is filled.
+        self.user_data = user_data = UserData()
+        user_data.wire_encoder = self.wire_encoder
+        user_data.batched = supports_batching
+        if not FLAGS.skip_output:
+            user_data.result_sink = ResultSink(
+                self.output_name, model.output_sample_shape, model.output_dtype, max_batch_size,
+                FLAGS.classes, FLAGS.decode_output, shared_memory=FLAGS.shared_memory != "none")
+        if FLAGS.deadline > 0:
+            user_data.admission = AdmissionController(int(FLAGS.deadline * 1e6))
+            if self.track_mode:
+                user_data.expiry_hooks.append(self.track_stats.record_expired)
+        if FLAGS.gallery:
+            user_data.gallery = load_gallery(FLAGS.gallery, FLAGS.gallery_nlist, FLAGS.gallery_nprobe)
+            user_data.output_name = self.output_name
+            user_data.top_k = FLAGS.top_k
+            if int(np.prod(model.output_sample_shape)) != user_data.gallery.dimension:
+                raise Exception("model '{}' outputs {} values per sample, the gallery has {}-d embeddings".format(
+                    model.name, int(np.prod(model.output_sample_shape)), user_data.gallery.dimension))
+
+        if FLAGS.shared_memory == "system":
+            if self.open_loop or self.track_mode:
+                # The open loop drops the arrivals that find every slot
+                # taken (in_flight_cap)
+                slots = FLAGS.max_in_flight if FLAGS.max_in_flight > 0 else FLAGS.shared_memory_slots
+            else:
+                slots = max(FLAGS.conc, 1)
+            output_sample_shape = model.output_sample_shape
+            user_data.shared_memory = SharedMemoryIO(
+                triton_client,
+                grpcclient if FLAGS.protocol.lower() == "grpc" else httpclient,
+                self.input_name, self.batched_image_data.shape[1:], self.dtype,
+                self.output_name, output_sample_shape, model.output_dtype,
+                max(FLAGS.batch_size, max_batch_size), slots)
+            user_data.shared_memory.register()
+            if not self.track_mode:
+                user_data.shared_memory.preload(self.batched_image_data)
+            user_data.completion_hooks.append(user_data.shared_memory.release)
+            user_data.expiry_hooks.append(user_data.shared_memory.release)
+        elif not FLAGS.no_request_pool:
+            # Track batches and real samples change on every request:
+            # double buffer them
+            user_data.request_pool = RequestPool(
+                grpcclient if FLAGS.protocol.lower() == "grpc" else httpclient,
+                self.input_name, self.output_name, FLAGS.classes,
+                double_buffered=self.track_mode or self.dataset is not None)
+
+        if self.dataset is not None and not self.track_mode:
+            # Workers start at different samples
+            user_data.dataset = BatchPrefetcher(
+                self.dataset, FLAGS.batch_size if supports_batching else None,
+                FLAGS.prefetch_depth, start=FLAGS.worker_index * FLAGS.batch_size * FLAGS.iter,
+                encoder=self.wire_encoder)
+            user_data.dataset.start()
+
+        if self.track_mode and FLAGS.gallery:
+            # Identities are fused per track; --adaptive-rate also lowers
+            # the rate of the tracks already identified
+            # Track i replays sample i, whose subject is its true identity
+            subjects = None
+            if FLAGS.track_subjects:
+                labels = np.load(FLAGS.track_subjects)
+                if len(labels) != len(self.dataset):
+                    raise Exception("--track-subjects has {} labels, {} has {} samples".format(
+                        len(labels), FLAGS.image_filename, len(self.dataset)))
+                subjects = [labels[i % len(labels)] for i in range(FLAGS.tracks)]
+            self.adaptive = AdaptiveRate(
+                FLAGS.tracks, FLAGS.identity_threshold, FLAGS.identity_confirmations,
+                FLAGS.stable_stride, FLAGS.identity_decay, enabled=FLAGS.adaptive_rate,
+                subjects=subjects)
+            user_data.match_hooks.append(self.adaptive.matched)
+            user_data.expiry_hooks.append(self.adaptive.expired)
+
+        # Input bytes a request of the test batch carries: none with
+        # shared memory, the compressed tensor with --compression
+        self.request_bytes = 0
+        if user_data.shared_memory is None:
+            self.request_bytes = request_bytes(self.batched_image_data, FLAGS.compression)
+
+        if FLAGS.streaming:
+             triton_client.start_stream(
+                 partial(completion_callback, user_data), **compression_args(FLAGS))
+            
+        if aio_client is not None:
+            self.closed_loop = partial(run_closed_loop_asyncio, aio_client)
+            self.open_loop_driver = partial(run_open_loop_asyncio, aio_client)
+        else:
+            self.closed_loop = run_closed_loop
+            self.open_loop_driver = run_open_loop
+
+    def warm_up(self):
+        """
+        Engine first touch, connection setup and clock ramp-up happen
+        here, before anything is measured.
+        """
+        FLAGS = self.FLAGS
+        if FLAGS.warmup_iter > 0:
+            slots = max(FLAGS.conc, 1) if FLAGS.async_set or FLAGS.streaming else 1
+            self.closed_loop(
+                self.triton_client, self.user_data, self.batched_image_data, self.input_name,
+                self.output_name, self.output_shape, self.dtype, FLAGS.warmup_iter * slots, FLAGS)
+            self.user_data.reset_measurements()
+
+    def run(self, window_done=None):
+        """
+        Runs the load. The closed loop runs windows of total_requests until
+        window_done(windows) returns True (after one window by default).
+        """
+        FLAGS = self.FLAGS
+        user_data = self.user_data
+        # The warm-up is not traced
+        user_data.tracer = self.tracer
+        if self.track_mode:
+            # Tracks start emitting now, with the meter already running
+            tracks = make_tracks(
+                FLAGS.tracks, self.window_rate, self.sample_shape,
+                self.source_dtype, time.monotonic_ns(), FLAGS.seed,
+                self.dataset, FLAGS.window_frames, FLAGS.stride)
+            run_track_simulation(
+                self.triton_client, user_data, tracks, self.batcher, self.track_stats,
+                FLAGS.iter, self.input_name, self.output_name, self.output_shape, self.dtype,
+                self.open_loop_stats, FLAGS, self.adaptive)
+        elif self.open_loop:
+            self.open_loop_driver(
+                self.triton_client, user_data, self.batched_image_data, self.input_name,
+                self.output_name, self.output_shape, self.dtype, self.total_requests,
+                self.intervals, self.open_loop_stats, FLAGS)
+        else:
+            while True:
+                window_start = time.monotonic_ns()
+                self.closed_loop(
+                    self.triton_client, user_data, self.batched_image_data, self.input_name,
+                    self.output_name, self.output_shape, self.dtype, self.total_requests, FLAGS)
+                window_end = time.monotonic_ns()
+                summary = user_data.latencies.summary()
+                self.windows.append({
+                    "start_ns": window_start, "end_ns": window_end,
+                    "latencies": user_data.latencies, "spans": user_data.spans,
+                    "match_latencies": user_data.match_latencies, "matched": user_data.matched,
+                    "admission": admission_result(user_data),
+                    "throughput": summary["count"] * FLAGS.batch_size / ((window_end - window_start) / 1e9),
+                    "p99": summary["p99"],
+                })
+                if window_done is None or window_done(self.windows):
+                    break
+                user_data.reset_measurements()
+
+    def close(self):
+        if self.user_data.dataset is not None:
+            self.user_data.dataset.stop()
+        if self.FLAGS.streaming:
+            self.triton_client.stop_stream()
+        if self.user_data.shared_memory is not None:
+            self.user_data.shared_memory.close()
+
+
+def worker_flags(FLAGS, workers, index):
+    """
+    FLAGS of worker index out of workers: the concurrency slots, requests
+    and in-flight limit are split among them, and every worker replays its
+    share of the same arrival schedule.
+    """
+    def share(value):
+        return value // workers + (1 if index < value % workers else 0)
+
+    flags = argparse.Namespace(**vars(FLAGS))
+    flags.workers = workers
+    flags.worker_index = index
+    if FLAGS.request_rate > 0 or FLAGS.arrival == "trace":
+        flags.iter = share(FLAGS.iter)
+        if FLAGS.max_in_flight > 0:
+            flags.max_in_flight = max(share(FLAGS.max_in_flight), 1)
+    else:
+        flags.conc = share(FLAGS.conc)
+    return flags
+
+
+def model_label(model):
+    if model.version:
+        return "{}@{}".format(model.name, model.version)
+    return model.name
+
+
+def parse_mix(value):
+    """
+    Parses --mix, comma separated name[@version][:weight] entries, into
+    (name, version, weight) tuples.
+    """
+    entries = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, weight = entry.partition(":")
+        name, _, version = name.partition("@")
+        entries.append((name, version, float(weight) if weight else 1.0))
+    return entries
+
+
+def worker_assignments(model, FLAGS, mix=None):
+    """
+    (model label, FLAGS) of every worker process. Without a mix all the
+    workers load model; with a mix every model gets its weighted share of
+    the concurrency slots, or of the request rate and requests (open loop),
+    split among FLAGS.workers processes of its own.
+    """
+    open_loop = FLAGS.request_rate > 0 or FLAGS.arrival == "trace"
+    if open_loop and FLAGS.seed is None:
+        # One schedule shared by all the workers of a model
+        FLAGS.seed = int(time.monotonic_ns() % (1 << 31))
+    if mix is None:
+        groups = [(model.name, FLAGS)]
+    else:
+        total_weight = sum(weight for _, weight in mix)
+        groups = []
+        for position, (mix_model, weight) in enumerate(mix):
+            fraction = weight / total_weight
+            flags = argparse.Namespace(**vars(FLAGS))
+            flags.model_name = mix_model.name
+            flags.model_version = mix_model.version
+            if open_loop:
+                flags.request_rate = FLAGS.request_rate * fraction
+                flags.iter = max(int(round(FLAGS.iter * fraction)), 1)
+                if FLAGS.max_in_flight > 0:
+                    flags.max_in_flight = max(int(round(FLAGS.max_in_flight * fraction)), 1)
+                flags.seed = FLAGS.seed + position
+            else:
+                flags.conc = max(int(round(FLAGS.conc * fraction)), 1)
+            groups.append((model_label(mix_model), flags))
+
+    assignments = []
+    for label, flags in groups:
+        count = FLAGS.workers if open_loop else min(FLAGS.workers, max(flags.conc, 1))
+        assignments.extend((label, worker_flags(flags, count, i)) for i in range(count))
+    return assignments
+
+
+def worker_main(FLAGS, label, ready, go, results):
+    """
+    Body of a --workers process: its own client and load generator, warmed
+    up before reporting ready. The measured load starts when the client
+    process sets go, once the energy meter is running, and the worker
+    sends back its histograms, request spans and CPU time when done.
+    """
+    index = FLAGS.worker_index
+    model_name = FLAGS.model_name
+    try:
+        if FLAGS.worker_cpus:
+            cpus = parse_list(FLAGS.worker_cpus)
+            os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+        concurrency = max(FLAGS.conc, FLAGS.max_in_flight, 1)
+        unbounded = (FLAGS.request_rate > 0 or FLAGS.arrival == "trace") and FLAGS.max_in_flight == 0
+        if unbounded:
+            concurrency = max(concurrency, 64)
+        triton_client = create_client(FLAGS, concurrency)
+        aio_client = AsyncioClient(FLAGS, 0 if unbounded else concurrency) if FLAGS.asyncio else None
+        model = load_model(triton_client, model_name, FLAGS.model_version, FLAGS)
+        load = LoadGenerator(triton_client, aio_client, model, FLAGS)
+        load.warm_up()
+    except Exception as e:
+        ready.put((label, repr(e)))
+        return
+
+    ready.put((label, None))
+    go.wait()
+    cpu_start = time.process_time()
+    error = None
+    try:
+        load.run()
+    except Exception as e:
+        error = repr(e)
+    cpu = time.process_time() - cpu_start
+    start_ns = min((span[0] for span in load.user_data.spans), default=0)
+    end_ns = max((span[1] for span in load.user_data.spans), default=0)
+    load.close()
+    if aio_client is not None:
+        aio_client.close()
+
+    stats = load.open_loop_stats
+    results.put((label, {
+        "latencies": load.user_data.latencies,
+        "arrival_latencies": load.user_data.arrival_latencies,
+        "spans": load.user_data.spans,
+        "match_latencies": load.user_data.match_latencies,
+        "matched": load.user_data.matched,
+        "admission": admission_result(load.user_data),
+        "trace": None if load.tracer is None else load.tracer.spans,
+        "cpu": cpu,
+        "request_bytes": load.request_bytes,
+        "start_ns": start_ns,
+        "end_ns": end_ns,
+        "open_loop": None if stats is None else (
+            stats.sent, stats.late, stats.dropped, stats.send_start_ns, stats.send_end_ns),
+    }, error))
+
+
+class WorkerResults:
+    """
+    Measurements of every worker merged into the shape run_configuration
+    reports from (user_data, open_loop_stats...).
+    """
+
+    def __init__(self, FLAGS):
+        self.user_data = UserData()
+        if FLAGS.deadline > 0:
+            self.user_data.admission = AdmissionController(int(FLAGS.deadline * 1e6))
+        # Model label of every span, and label -> merged UserData of the
+        # workers of that model
+        self.span_models = []
+        self.models = {}
+        self.windows = []
+        self.track_stats = None
+        self.track_batch_size = None
+        self.adaptive = None
+        # Spans of every worker, as one process each
+        self.tracer = Tracer() if FLAGS.trace else None
+        self.client_cpu = 0.0
+        # Input bytes per request, averaged over the requests of the workers
+        self.request_bytes = 0
+        self._request_bytes_total = 0
+        # First send and last completion of any worker
+        self.start_ns = None
+        self.end_ns = None
+        self.open_loop_stats = None
+        if FLAGS.request_rate > 0 or FLAGS.arrival == "trace":
+            if FLAGS.arrival == "trace":
+                self.open_loop_stats = OpenLoopStats(trace_rate(FLAGS.arrival_trace))
+            else:
+                self.open_loop_stats = OpenLoopStats(FLAGS.request_rate)
+
+    def add(self, label, result):
+        for user_data in (self.user_data, self.models.setdefault(label, UserData())):
+            user_data.latencies.merge(result["latencies"])
+            user_data.arrival_latencies.merge(result["arrival_latencies"])
+            user_data.spans.extend(result["spans"])
+            user_data.match_latencies.merge(result["match_latencies"])
+            user_data.matched += result["matched"]
+        if result["admission"] is not None:
+            self.user_data.admission.merge(*result["admission"])
+        if result["trace"] is not None:
+            self.tracer.add_process(
+                "worker {} ({})".format(len(self.tracer.processes), label), result["trace"])
+        self.span_models.extend([label] * len(result["spans"]))
+        self.client_cpu += result["cpu"]
+        self._request_bytes_total += result["request_bytes"] * result["latencies"].total_count
+        if self.user_data.latencies.total_count > 0:
+            self.request_bytes = self._request_bytes_total / self.user_data.latencies.total_count
+        if result["end_ns"] > 0:
+            self.start_ns = result["start_ns"] if self.start_ns is None else min(self.start_ns, result["start_ns"])
+            self.end_ns = result["end_ns"] if self.end_ns is None else max(self.end_ns, result["end_ns"])
+        if result["open_loop"] is not None:
+            stats = self.open_loop_stats
+            sent, late, dropped, start_ns, end_ns = result["open_loop"]
+            stats.sent += sent
+            stats.late += late
+            stats.dropped += dropped
+            stats.send_start_ns = start_ns if stats.send_start_ns == 0 else min(stats.send_start_ns, start_ns)
+            stats.send_end_ns = max(stats.send_end_ns, end_ns)
+
+    def close(self):
+        pass
+
+
+def start_workers(model, FLAGS, mix=None):
+    """
+    Starts the worker processes (--workers, --mix) and returns once all of
+    them are warmed up and waiting for the go event.
+    """
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    go = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker_main, daemon=True,
+            args=(flags, label, ready, go, results))
+        for label, flags in worker_assignments(model, FLAGS, mix)]
+    for process in processes:
+        process.start()
+    errors = []
+    waiting = len(processes)
+    while waiting > 0:
+        try:
+            label, error = ready.get(timeout=1.0)
+        except queue.Empty:
+            if any(process.exitcode is not None for process in processes):
+                errors.append("a worker exited during start-up")
+                break
+            continue
+        waiting -= 1
+        if error is not None:
+            errors.append(error)
+    if errors:
+        for process in processes:
+            process.terminate()
+            process.join()
+        raise Exception("worker start-up failed: " + "; ".join(errors))
+    return processes, go, results
+
+
+def collect_workers(workers, FLAGS):
+    """
+    Releases the workers and merges their measurements. Nothing is merged
+    until every worker has finished, so aggregation does not compete with
+    the load.
+    """
+    processes, go, results = workers
+    go.set()
+    received = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    merged = WorkerResults(FLAGS)
+    errors = []
+    for label, result, error in received:
+        if result is not None:
+            merged.add(label, result)
+        if error is not None:
+            errors.append(error)
+    if errors:
+        raise Exception("worker failed: " + "; ".join(errors))
+    return merged
+
+
+def run_configuration(triton_client, energy_measurer_GPU, metrics_client, model, FLAGS,
+                      metrics_rows=None, aio_client=None, mix=None):
+    """
+    Runs one (model, batch, concurrency) configuration with the load mode
+    selected in FLAGS, prints its report and returns the results as a dict.
+    With --metrics-interval, the per-interval server metrics of the run are
+    appended to metrics_rows. Requests go through aio_client when given
+    (--asyncio). With a mix, a list of (ModelInfo, weight), the models
+    receive weighted traffic at the same time from worker processes, and
+    the report adds each model's latency, throughput and energy share.
+    """
+    load = None
+    if mix is not None:
+        run_label = "+".join(model_label(mix_model) for mix_model, _ in mix)
+        counter_models = [mix_model.name for mix_model, _ in mix]
+    else:
+        run_label = model.name
+        counter_models = model.name
+    if FLAGS.workers > 1 or mix is not None:
+        workers = start_workers(model, FLAGS, mix)
+    else:
+        load = LoadGenerator(triton_client, aio_client, model, FLAGS)
+        load.warm_up()
+    open_loop = FLAGS.request_rate > 0 or FLAGS.arrival == "trace"
+    track_mode = FLAGS.tracks > 0
+
+    # Idle power, measured before any request of this configuration is
+    # sent (worker processes are already started and waiting)
+    if FLAGS.idle_baseline > 0:
+        idle_power = measure_idle_baseline(energy_measurer_GPU, FLAGS.idle_baseline)
+    else:
+        idle_power = dict.fromkeys(energy_measurer_GPU.rails, 0.0)
+
+    # Current metrics value        
+    init_values = metrics_client.model_counters(counter_models)
+    if mix is not None:
+        mix_init = dict((model_label(mix_model), metrics_client.model_counters(
+            mix_model.name, version=mix_model.version)) for mix_model, _ in mix)
+    # Closed-loop measurement windows of -iter requests per slot, with the
+    # server counters at every window boundary
+    boundaries = [init_values]
+    scraper = None
+    if FLAGS.metrics_interval > 0:
+        scraper = MetricsScraper(metrics_client, counter_models, FLAGS.metrics_interval / 1000.0)
+        scraper.start()
+
+    def window_done(windows):
+        if FLAGS.stability_windows == 0:
+            return True
+        boundaries.append(metrics_client.model_counters(counter_models))
+        if FLAGS.verbose:
+            print("    Window", len(windows),
+                  "Throughput(infer/s)=", round(windows[-1]["throughput"], 2),
+                  "p99(ms)=", round(windows[-1]["p99"], 3))
+        return (is_stable(windows, FLAGS.stability_windows, FLAGS.stability_tolerance / 100.0)
+                or len(windows) >= FLAGS.max_windows)
+
+    start_time = time.time()
+    # Client CPU (every thread of the process) spent driving the run
+    cpu_start = time.process_time()
+    
+     # START
+    energy_measurer_GPU.start_measuring() 
+    
+    try:
+        if load is None:
+            load = collect_workers(workers, FLAGS)
+            client_cpu = load.client_cpu
+        else:
+            load.run(window_done)
+    finally:
+        acc_energy = energy_measurer_GPU.total_energy
+        rail_energy = dict(energy_measurer_GPU.rail_energy)
+        energy_measurer_GPU.stop_measuring()
+        end_time = time.time()
+        if load is not None and not isinstance(load, WorkerResults):
+            client_cpu = time.process_time() - cpu_start
+        sample_times, sample_power = energy_measurer_GPU.samples(rail="all")
+        samples_lost = energy_measurer_GPU.sample_count > energy_measurer_GPU.capacity
+        if scraper is not None:
+            scraper.stop()
+        if load is not None:
+            load.close()
+
+    user_data = load.user_data
+    windows = load.windows
+    open_loop_stats = load.open_loop_stats
+    track_stats = load.track_stats
+    adaptive = load.adaptive
+    track_batch_size = load.track_batch_size
+    # Every line of the report starts with the configuration: the client
+    # batcher of the tracks replaces -b and -conc in the multi-person mode
+    if track_mode:
+        config = ["Tracks=", FLAGS.tracks, "Max_batch=", track_batch_size,
+                  "Batch_wait(ms)=", FLAGS.batch_wait]
+    else:
+        config = ["Batch=", int(FLAGS.batch_size), "Conc=", int(FLAGS.conc)]
+    
+    # Gets metrics before starting
+    end_values = metrics_client.model_counters(counter_models)
+    measured_seconds = end_time - start_time
+    if windows:
+        run_requests = sum(window["latencies"].total_count for window in windows)
+    else:
+        run_requests = user_data.latencies.total_count
+    client_cpu_per_request = client_cpu / run_requests * 1e6 if run_requests > 0 else 0.0
+    stable = None
+    if windows and FLAGS.stability_windows > 0:
+        # Only the last windows, stable or not after --max-windows, are
+        # reported: latency, throughput, energy and inference counts
+        stable = is_stable(windows, FLAGS.stability_windows, FLAGS.stability_tolerance / 100.0)
+        reported = windows[-FLAGS.stability_windows:]
+        init_values = boundaries[-len(reported) - 1]
+        start_ns, end_ns = reported[0]["start_ns"], reported[-1]["end_ns"]
+        measured_seconds = (end_ns - start_ns) / 1e9
+        user_data.reset_measurements()
+        for window in reported:
+            user_data.latencies.merge(window["latencies"])
+            user_data.spans.extend(window["spans"])
+            user_data.match_latencies.merge(window["match_latencies"])
+            user_data.matched += window["matched"]
+            if window["admission"] is not None:
+                user_data.admission.merge(*window["admission"])
+        keep = (sample_times >= start_ns) & (sample_times <= end_ns)
+        sample_times, sample_power = sample_times[keep], sample_power[keep]
+        stable_energy = integrate_energy(sample_times, sample_power)
+        rail_energy = dict(zip(energy_measurer_GPU.rails, stable_energy))
+        acc_energy = rail_energy[FLAGS.power_rail]
+        print("", *config,
+              "Windows=", len(windows), "Reported_windows=", len(reported), "Stable=", stable)
+        if not stable:
+            print("Warning: throughput/latency did not stabilize within",
+                  FLAGS.max_windows, "windows")
+    elif isinstance(load, WorkerResults) and load.end_ns is not None:
+        # From the first send to the last completion of any worker: process
+        # wake-up and the merge after the run are not measured
+        measured_seconds = (load.end_ns - load.start_ns) / 1e9
+        keep = (sample_times >= load.start_ns) & (sample_times <= load.end_ns)
+        sample_times, sample_power = sample_times[keep], sample_power[keep]
+        rail_energy = dict(zip(energy_measurer_GPU.rails, integrate_energy(sample_times, sample_power)))
+        acc_energy = rail_energy[FLAGS.power_rail]
+    number_of_inferences = int(end_values["nv_inference_count"] - init_values["nv_inference_count"])
+    energy_per_inference = acc_energy / number_of_inferences if number_of_inferences > 0 else 0.0
+    print("", *config, "Inferences=", number_of_inferences, "Energy_per_inference(mJ)=", energy_per_inference)
+    rail_energy_per_inference = dict(
+        (rail, energy / number_of_inferences if number_of_inferences > 0 else 0.0)
+        for rail, energy in rail_energy.items())
+    print("", *config,
+          "Rail_energy_per_inference(mJ)",
+          *["{}= {}".format(rail, round(energy, 4)) for rail, energy in rail_energy_per_inference.items()])
+
+    # Dynamic energy: power above the idle baseline while requests were in
+    # flight, split among them. Idle power, warm-up gaps and the tail after
+    # the last response are left out.
+    rails = energy_measurer_GPU.rails
+    request_energy, unattributed = attribute_energy(
+        sample_times, sample_power, rails, idle_power, user_data.spans)
+    attributed_inferences = sum(span[2] for span in user_data.spans)
+    mode_index = rails.index(FLAGS.power_rail)
+    dynamic_per_inference = dict(
+        (rail, request_energy[:, i].sum() / attributed_inferences if attributed_inferences > 0 else 0.0)
+        for i, rail in enumerate(rails))
+    batch_energy = request_energy[:, mode_index]
+    if len(batch_energy) > 0:
+        batch_p50, batch_p99 = np.percentile(batch_energy, [50, 99])
+    else:
+        batch_p50 = batch_p99 = 0.0
+    if samples_lost:
+        print("Warning: the power sample buffer overflowed, only the last",
+              energy_measurer_GPU.capacity, "samples are attributed")
+    print("", *config,
+          "Idle_power(mW)=", round(idle_power[FLAGS.power_rail], 2),
+          "Dynamic_energy_per_inference(mJ)=", round(dynamic_per_inference[FLAGS.power_rail], 4),
+          "Dynamic_energy_per_batch(mJ)",
+          "mean=", round(batch_energy.mean() if len(batch_energy) > 0 else 0.0, 4),
+          "p50=", round(batch_p50, 4), "p99=", round(batch_p99, 4),
+          "Unattributed(mJ)=", round(unattributed[mode_index], 3))
+    if FLAGS.verbose:
+        print("", *config,
+              "Rail_dynamic_energy_per_inference(mJ)",
+              *["{}= {}".format(rail, round(energy, 4)) for rail, energy in dynamic_per_inference.items()])
+
+    latency = user_data.latencies.summary()
+    # Inferences of the completed requests: with --tracks every batch has
+    # its own size
+    throughput = attributed_inferences / measured_seconds
+    if scraper is not None:
+        # Server-side view over time: a queue time that keeps growing while
+        # the throughput stays flat means the server saturated mid-run.
+        intervals = scraper.intervals()
+        if intervals:
+            print("", *config,
+                  "Metric_intervals=", len(intervals),
+                  "Peak_throughput(infer/s)=", round(max(row["throughput"] for row in intervals), 2),
+                  "Max_queue(ms)=", round(max(row["queue_ms"] for row in intervals), 3),
+                  "Max_compute_infer(ms)=", round(max(row["compute_infer_ms"] for row in intervals), 3),
+                  "Scrape_errors=", scraper.errors)
+        if FLAGS.verbose:
+            for row in intervals:
+                print("    t=", round(row["time_s"], 2),
+                      "Throughput(infer/s)=", round(row["throughput"], 2),
+                      "Mean_batch=", round(row["mean_batch"], 2),
+                      "Queue(ms)=", round(row["queue_ms"], 3),
+                      "Compute_infer(ms)=", round(row["compute_infer_ms"], 3),
+                      "GPU_util=", row["nv_gpu_utilization"])
+        if metrics_rows is not None:
+            for row in intervals:
+                metrics_rows.append(dict(
+                    model=run_label, batch=FLAGS.batch_size, conc=FLAGS.conc, **row))
+    tracer = load.tracer
+    if tracer is not None:
+        # Server queue/compute time per request of every metrics interval
+        # (from its start) and the power samples as counter tracks
+        if scraper is not None and intervals:
+            first_ns = scraper.series[0][0]
+            ends_ns = [first_ns + int(row["time_s"] * 1e9) for row in intervals]
+            tracer.add_counter(
+                "server (ms)", [first_ns] + ends_ns[:-1],
+                {"queue": [row["queue_ms"] for row in intervals],
+                 "compute_infer": [row["compute_infer_ms"] for row in intervals]})
+        tracer.add_counter(
+            "power (mW)", sample_times,
+            dict((rail, sample_power[:, i]) for i, rail in enumerate(energy_measurer_GPU.rails)
+                 if rail not in energy_measurer_GPU.unavailable))
+        trace_file = FLAGS.trace.format(model=run_label, batch=FLAGS.batch_size, conc=FLAGS.conc)
+        tracer.write(trace_file)
+        print("", *config,
+              "Trace=", trace_file, "Spans=", tracer.span_count(), "Dropped_spans=", tracer.dropped)
+    print("", *config,
+          "Requests=", latency["count"],
+          "Throughput(infer/s)=", round(throughput, 2),
+          "Latency(ms)",
+          "p50=", round(latency["p50"], 3), "p90=", round(latency["p90"], 3),
+          "p99=", round(latency["p99"], 3), "p99.9=", round(latency["p99.9"], 3),
+          "max=", round(latency["max"], 3),
+          "Client_CPU_per_request(us)=", round(client_cpu_per_request, 1),
+          "Request_bytes=", int(load.request_bytes))
+    if FLAGS.gallery:
+        # Identification after the response, on the client: not part of
+        # the request latency above, but of the end-to-end one
+        matching = user_data.match_latencies.summary()
+        print("", *config,
+              "Matched=", user_data.matched, "Top_k=", FLAGS.top_k,
+              "Matching_latency(ms)",
+              "p50=", round(matching["p50"], 3), "p99=", round(matching["p99"], 3),
+              "max=", round(matching["max"], 3),
+              "Inference+matching_p99(ms)=", round(latency["p99"] + matching["p99"], 3))
+    mix_results = {}
+    if mix is not None:
+        # Per model: its requests, its Triton counters and its share of the
+        # dynamic energy attributed to requests
+        span_models = np.array(load.span_models)
+        total_dynamic = request_energy[:, mode_index].sum()
+        for mix_model, weight in mix:
+            label = model_label(mix_model)
+            counters = metrics_client.model_counters(mix_model.name, version=mix_model.version)
+            model_inferences = int(counters["nv_inference_count"] - mix_init[label]["nv_inference_count"])
+            model_data = load.models.get(label, UserData())
+            model_latency = model_data.latencies.summary()
+            model_energy = request_energy[span_models == label, mode_index].sum() if len(span_models) else 0.0
+            model_attributed = sum(span[2] for span in model_data.spans)
+            mix_results[label] = {
+                "throughput": model_attributed / measured_seconds,
+                "inferences": model_inferences,
+                "latency_p50_ms": model_latency["p50"],
+                "latency_p99_ms": model_latency["p99"],
+                "energy_share": model_energy / total_dynamic if total_dynamic > 1e-9 else 0.0,
+                "dynamic_energy_per_inference_mJ": model_energy / model_attributed if model_attributed > 0 else 0.0,
+            }
+            print("    Model=", label, "Weight=", weight,
+                  "Requests=", model_latency["count"], "Inferences=", model_inferences,
+                  "Throughput(infer/s)=", round(mix_results[label]["throughput"], 2),
+                  "Latency(ms)", "p50=", round(model_latency["p50"], 3),
+                  "p99=", round(model_latency["p99"], 3),
+                  "Energy_share(%)=", round(100.0 * mix_results[label]["energy_share"], 2),
+                  "Dynamic_energy_per_inference(mJ)=",
+                  round(mix_results[label]["dynamic_energy_per_inference_mJ"], 4))
+    if track_mode:
+        window_latency = track_stats.window_latencies.summary()
+        print("", "Tracks=", FLAGS.tracks, "Track_rate(win/s)=", FLAGS.track_rate / FLAGS.stride,
+              "Max_batch=", track_batch_size, "Batches=", track_stats.batches,
+              "Mean_batch=", round(track_stats.mean_batch_size(), 2),
+              "Fill_ratio=", round(track_stats.fill_ratio(), 3),
+              "Offered(win/s)=", round(open_loop_stats.offered_rate, 2),
+              "Achieved(win/s)=", round(track_stats.windows / (end_time - start_time), 2),
+              "Late_windows=", track_stats.late_windows,
+              "Window_latency(ms)",
+              "p50=", round(window_latency["p50"], 3), "p99=", round(window_latency["p99"], 3),
+              "max=", round(window_latency["max"], 3),
+              "Worst_track_p99(ms)=", round(track_stats.worst_track_p99(), 3))
+        if FLAGS.verbose:
+            for track_id, histogram in enumerate(track_stats.track_latencies):
+                print("    Track", track_id, histogram.format_summary())
+    if adaptive is not None:
+        # Windows answered with the fused identity cost no inference: the
+        # saving is estimated at the dynamic energy of an inferred window.
+        # Missed windows (shed or expired) count as wrong identities
+        emitted = adaptive.emitted()
+        energy_saved = adaptive.skipped * dynamic_per_inference[FLAGS.power_rail]
+        accuracy = adaptive.accuracy()
+        print("", "Tracks=", FLAGS.tracks, "Adaptive_rate=", FLAGS.adaptive_rate,
+              "Emitted=", emitted, "Inferred=", adaptive.inferred, "Skipped=", adaptive.skipped,
+              "Missed=", adaptive.missed,
+              "Skipped(%)=", round(100.0 * adaptive.skipped / emitted, 2) if emitted else 0.0,
+              "Stable_tracks=", adaptive.stable_tracks(),
+              "Energy_per_window(mJ)=", round(acc_energy / emitted, 4) if emitted else 0.0,
+              "Estimated_energy_saved(mJ)=", round(energy_saved, 3),
+              "Identity_accuracy=", round(accuracy, 4) if accuracy is not None else float("nan"))
+    if open_loop:
+        # Latency from the scheduled arrival includes any time the request
+        # waited because the sender or the connection pool was saturated.
+        arrival_latency = user_data.arrival_latencies.summary()
+        print("", "Batch=", int(FLAGS.batch_size), "Arrival=", FLAGS.arrival,
+              "Offered_rate(req/s)=", round(open_loop_stats.offered_rate, 2),
+              "Achieved_rate(req/s)=", round(open_loop_stats.achieved_rate(), 2),
+              "Sent=", open_loop_stats.sent, "Late=", open_loop_stats.late,
+              "Dropped=", open_loop_stats.dropped,
+              "Arrival_latency(ms)",
+              "p50=", round(arrival_latency["p50"], 3), "p90=", round(arrival_latency["p90"], 3),
+              "p99=", round(arrival_latency["p99"], 3), "p99.9=", round(arrival_latency["p99.9"], 3),
+              "max=", round(arrival_latency["max"], 3))
+    admission = user_data.admission
+    if admission is not None:
+        # Goodput counts only the inferences answered within their
+        # deadline; shed and expired ones never used the GPU
+        goodput = admission.on_time / measured_seconds
+        completed_rate = (admission.on_time + admission.late) / measured_seconds
+        slack = admission.slack.summary(percentiles=(1, 50))
+        print("", *config,
+              "Deadline(ms)=", FLAGS.deadline,
+              "Goodput(infer/s)=", round(goodput, 2),
+              "Completed(infer/s)=", round(completed_rate, 2),
+              "Admitted=", admission.admitted, "Shed=", admission.shed,
+              "Expired=", admission.expired, "On_time=", admission.on_time,
+              "Late=", admission.late,
+              "Slack(ms)", "p1=", round(slack["p1"], 3), "p50=", round(slack["p50"], 3))
+
+    result = {
+        "model": run_label,
+        "batch": FLAGS.batch_size,
+        "conc": FLAGS.conc,
+        "requests": latency["count"],
+        "inferences": number_of_inferences,
+        "energy_per_inference_mJ": energy_per_inference,
+        "throughput": throughput,
+        "client_cpu_per_request_us": client_cpu_per_request,
+        "request_bytes": load.request_bytes,
+    }
+    for label, values in mix_results.items():
+        for key, value in values.items():
+            result["{}_{}".format(label, key)] = value
+    if stable is not None:
+        result["windows"] = len(windows)
+        result["stable"] = stable
+    for rail, energy in rail_energy_per_inference.items():
+        result["energy_per_inference_{}_mJ".format(rail)] = energy
+    result["idle_power_mW"] = idle_power[FLAGS.power_rail]
+    result["dynamic_energy_per_inference_mJ"] = dynamic_per_inference[FLAGS.power_rail]
+    result["dynamic_energy_per_batch_mJ"] = float(batch_energy.mean()) if len(batch_energy) > 0 else 0.0
+    result["dynamic_energy_per_batch_p99_mJ"] = float(batch_p99)
+    result["unattributed_energy_mJ"] = float(unattributed[mode_index])
+    for rail, energy in dynamic_per_inference.items():
+        result["dynamic_energy_per_inference_{}_mJ".format(rail)] = float(energy)
+    for key, value in latency.items():
+        if key != "count":
+            result["latency_{}_ms".format(key)] = value
+    if FLAGS.gallery:
+        result["matched"] = user_data.matched
+        for key, value in matching.items():
+            if key != "count":
+                result["match_latency_{}_ms".format(key)] = value
+    if track_mode:
+        result.update({
+            "tracks": FLAGS.tracks,
+            "mean_batch": track_stats.mean_batch_size(),
+            "fill_ratio": track_stats.fill_ratio(),
+            "late_windows": track_stats.late_windows,
+            "window_latency_p99_ms": window_latency["p99"],
+        })
+    if adaptive is not None:
+        result.update({
+            "windows_inferred": adaptive.inferred,
+            "windows_skipped": adaptive.skipped,
+            "windows_missed": adaptive.missed,
+            "energy_per_window_mJ": acc_energy / emitted if emitted else 0.0,
+            "estimated_energy_saved_mJ": energy_saved,
+            "identity_accuracy": accuracy if accuracy is not None else float("nan"),
+        })
+    if open_loop:
+        result.update({
+            "offered_rate": open_loop_stats.offered_rate,
+            "achieved_rate": open_loop_stats.achieved_rate(),
+            "late": open_loop_stats.late,
+            "dropped": open_loop_stats.dropped,
+            "arrival_latency_p99_ms": arrival_latency["p99"],
+        })
+    if admission is not None:
+        result.update({
+            "deadline_ms": FLAGS.deadline,
+            "goodput": goodput,
+            "admitted": admission.admitted,
+            "shed": admission.shed,
+            "expired": admission.expired,
+            "on_time": admission.on_time,
+            "late_completions": admission.late,
+        })
+    return result
+
+
+def run_point(triton_client, energy_measurer_GPU, metrics_client, aio_client, model,
+              FLAGS, results, metrics_rows, batch_size, conc, iterations, mix=None):
+    """
+    Runs one configuration of a sweep or a tuning search with -b, -conc and
+    -iter overridden, adds its result to results and returns it.
+    """
+    run_flags = argparse.Namespace(**vars(FLAGS))
+    if model is not None:
+        run_flags.model_name = model.name
+    run_flags.batch_size = batch_size
+    run_flags.conc = conc
+    run_flags.iter = iterations
+    try:
+        result = run_configuration(
+            triton_client, energy_measurer_GPU, metrics_client, model,
+            run_flags, metrics_rows, aio_client, mix)
+    except InferenceServerException as e:
+        print("inference failed: " + str(e))
+        sys.exit(1)
+    results.append(result)
+    if FLAGS.sweep_output:
+        # Keep partial results if the sweep is interrupted
+        write_results(results, FLAGS.sweep_output)
+    if FLAGS.metrics_output and metrics_rows:
+        write_results(metrics_rows, FLAGS.metrics_output)
+    if FLAGS.sweep_pause > 0:
+        time.sleep(FLAGS.sweep_pause)
+    return result
+
+
+def parse_list(value, type=int):
+    return [type(v) for v in value.split(",") if v.strip()]
+
+
+def write_results(results, filename):
+    """
+    Writes the sweep results to filename, as JSON if it ends in .json and
+    as CSV otherwise.
+    """
+    if filename.endswith(".json"):
+        with open(filename, "w") as output:
+            json.dump(results, output, indent=2)
+        return
+    fieldnames = []
+    for result in results:
+        for key in result:
+            if key not in fieldnames:
+                fieldnames.append(key)
+    with open(filename, "w", newline="") as output:
+        writer = csv.DictWriter(output, fieldnames=fieldnames, restval="")
+        writer.writeheader()
+        writer.writerows(results)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "-v",
-        "--verbose",
-        action="store_true",
+        "-v",
+        "--verbose",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Enable verbose output",
+    )
+    parser.add_argument(
+        "-a",
+        "--async",
+        dest="async_set",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Use asynchronous inference API",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Use streaming inference API. "
+        + "The flag is only available with gRPC protocol.",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Drive the requests from one asyncio event loop with the "
+        + "tritonclient aio clients (implies -a). Not available with "
+        + "--streaming or --tracks.",
+    )
+    parser.add_argument(
+        "-conc",
+        type=int,
+        required=False,
+        default=1,
+        help="Number of requests kept in flight in async/streaming mode. "
+        + "Default is 1.",
+    )
+    parser.add_argument(
+        "-iter",
+        type=int,
+        required=False,
+        default=100,
+        help="Requests sent per concurrency slot, the run issues "
+        + "iter * conc requests in async/streaming mode. Default is 100.",
+    )
+    
+    parser.add_argument(
+        "--warmup-iter",
+        type=int,
+        required=False,
+        default=10,
+        help="Requests per concurrency slot sent before measuring, to warm "
+        + "up the engine, the connections and the clocks. Default is 10.",
+    )
+    parser.add_argument(
+        "--stability-windows",
+        type=int,
+        required=False,
+        default=0,
+        help="Closed loop: repeat measurement windows of -iter requests per "
+        + "slot until the throughput and p99 latency of this many consecutive "
+        + "windows agree within --stability-tolerance, and report only those "
+        + "windows. Default is 0 (one window).",
+    )
+    parser.add_argument(
+        "--stability-tolerance",
+        type=float,
+        required=False,
+        default=10.0,
+        help="Maximum deviation (percent) of each window from the average "
+        + "of the stable windows. Default is 10.",
+    )
+    parser.add_argument(
+        "--max-windows",
+        type=int,
+        required=False,
+        default=10,
+        help="Windows run before giving up on stability. Default is 10.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        required=False,
+        default=1,
+        help="Client processes generating the load, each with its own Triton "
+        + "client. -conc (closed loop) or the arrivals, -iter and "
+        + "--max-in-flight (open loop) are split among them and their "
+        + "measurements merged. Default is 1.",
+    )
+    parser.add_argument(
+        "--mix",
+        type=str,
+        required=False,
+        default=None,
+        help="Mixed workload: comma separated name[@version][:weight] models "
+        + "loaded together, each in worker processes of its own with its "
+        + "weighted share of -conc (closed loop) or of the request rate "
+        + "(open loop). Replaces -m.",
+    )
+    parser.add_argument(
+        "--worker-cpus",
+        type=str,
+        required=False,
+        default=None,
+        help="Comma separated CPU cores the workers are pinned to, round robin.",
+    )
+    parser.add_argument(
+        "--request-rate",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Open-loop mode: issue requests at this mean rate "
+        + "(requests/second) regardless of the server response time. "
+        + "Requires -a or --streaming. -iter is then the total number of requests.",
+    )
+    parser.add_argument(
+        "--arrival",
+        type=str,
+        choices=["constant", "poisson", "trace"],
+        required=False,
+        default=None,
+        help="Inter-arrival distribution of the open-loop mode. "
+        + "Default is constant.",
+    )
+    parser.add_argument(
+        "--arrival-trace",
+        type=str,
+        required=False,
+        default=None,
+        help="File with one inter-arrival time (ms) per line, "
+        + "replayed with --arrival trace.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        required=False,
+        default=0,
+        help="Open-loop mode: drop arrivals that find this many requests "
+        + "outstanding. Default is 0 (never drop).",
+    )
+    parser.add_argument(
+        "--late-threshold",
+        type=float,
+        required=False,
+        default=1.0,
+        help="Open-loop mode: a send starting more than this many ms "
+        + "after its arrival time is reported as late. Default is 1.",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Deadline (ms) of every request from its arrival, window "
+        + "emission or send. Requests predicted to miss it are shed before "
+        + "sending, the others carry the remaining time as Triton timeout, "
+        + "and goodput is reported. Default is 0 (no deadline).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        default=None,
+        help="Seed of the Poisson arrival process.",
+    )
+    parser.add_argument(
+        "--tracks",
+        type=int,
+        required=False,
+        default=0,
+        help="Multi-person mode: simulate this many people, each emitting "
+        + "-iter gait windows that are batched on the client. "
+        + "Requires -a or --streaming. Default is 0 (disabled).",
+    )
+    parser.add_argument(
+        "--track-rate",
+        type=float,
         required=False,
-        default=False,
-        help="Enable verbose output",
+        default=25.0,
+        help="Frames per second of each simulated person, who emits a "
+        + "window every --stride frames. Default is 25.",
     )
     parser.add_argument(
-        "-a",
-        "--async",
-        dest="async_set",
-        action="store_true",
+        "--window-frames",
+        type=int,
         required=False,
-        default=False,
-        help="Use asynchronous inference API",
+        default=25,
+        help="Frames per window in multi-person mode: every person streams "
+        + "flow frames into a sliding window of this length (the frame "
+        + "axis of the model input). 0 sends a fixed window. Default is 25.",
     )
     parser.add_argument(
-        "--streaming",
+        "--stride",
+        type=int,
+        required=False,
+        default=1,
+        help="Frames between two windows of a person in multi-person mode. "
+        + "Default is 1 (a window per frame).",
+    )
+    parser.add_argument(
+        "--batch-wait",
+        type=float,
+        required=False,
+        default=10.0,
+        help="Maximum time (ms) a window waits in the client batcher "
+        + "before a partial batch is sent. Default is 10.",
+    )
+    parser.add_argument(
+        "--frame-budget",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Latency budget (ms) of a window in multi-person mode. "
+        + "Default is the window period (1000 * --stride / --track-rate).",
+    )
+    parser.add_argument(
+        "--shared-memory",
+        type=str,
+        choices=["none", "system"],
+        required=False,
+        default="none",
+        help="Pass input and output tensors through Triton system shared "
+        + "memory registered once per run instead of serializing them in "
+        + "every request. Default is none.",
+    )
+    parser.add_argument(
+        "--shared-memory-slots",
+        type=int,
+        required=False,
+        default=64,
+        help="Shared memory slots (requests in flight) for the open-loop "
+        + "and multi-person modes. Default is 64.",
+    )
+    parser.add_argument(
+        "--no-request-pool",
         action="store_true",
         required=False,
         default=False,
-        help="Use streaming inference API. "
-        + "The flag is only available with gRPC protocol.",
+        help="Build and serialize new request objects for every request "
+        + "instead of reusing them.",
     )
     parser.add_argument(
-        "-conc",
+        "--prefetch-depth",
         type=int,
         required=False,
-        default=1,
-        help="Concurrency. Default is 1.",
+        default=4,
+        help="Batches of input samples (image_filename) prepared ahead of "
+        + "the sender. Default is 4.",
     )
     parser.add_argument(
-        "-iter",
+        "-m", "--model-name", type=str, required=False, default=None,
+        help="Name of model"
+    )
+    parser.add_argument(
+        "--sweep-models",
+        type=str,
+        required=False,
+        default=None,
+        help="Comma separated models to sweep in this process. Default is -m.",
+    )
+    parser.add_argument(
+        "--sweep-batch",
+        type=str,
+        required=False,
+        default=None,
+        help="Comma separated batch sizes to sweep, e.g. 1,4,8,16,32. "
+        + "Default is -b.",
+    )
+    parser.add_argument(
+        "--sweep-conc",
+        type=str,
+        required=False,
+        default=None,
+        help="Comma separated concurrencies to sweep. Default is -conc.",
+    )
+    parser.add_argument(
+        "--sweep-output",
+        type=str,
+        required=False,
+        default=None,
+        help="File (.csv or .json) where the results of every "
+        + "configuration are written.",
+    )
+    parser.add_argument(
+        "--sweep-pause",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Seconds to wait between configurations of a sweep. Default is 0.",
+    )
+    parser.add_argument(
+        "--tune-slo",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Search the --sweep-batch x --sweep-conc grid (by default "
+        + "batch and concurrency 1,4,...,32) for the throughput/energy "
+        + "Pareto frontier of the configurations whose p99 latency is below "
+        + "this many ms, using successive halving instead of the full grid. "
+        + "-iter is the length of the final runs.",
+    )
+    parser.add_argument(
+        "--tune-eta",
         type=int,
         required=False,
-        default=100,
-        help="Concurrency. Default is 1.",
+        default=3,
+        help="Successive halving keeps 1/eta of the configurations after "
+        + "every round and runs them eta times longer. Default is 3.",
+    )
+    parser.add_argument(
+        "--tune-min-iter",
+        type=int,
+        required=False,
+        default=20,
+        help="Shortest run (-iter) of the first round. Default is 20.",
     )
-    
     parser.add_argument(
-        "-m", "--model-name", type=str, required=True, help="Name of model"
+        "--input-shape",
+        type=str,
+        required=False,
+        default=None,
+        help="Input sample shape without the batch dimension, e.g. 25x60x60x2, "
+        + "for models with variable (-1) input dimensions.",
     )
     parser.add_argument(
         "-x",
@@ -345,16 +2367,138 @@ if __name__ == "__main__":
         type=int,
         required=False,
         default=1,
-        help="Number of class results to report. Default is 1.",
+        help="Top classes per sample the server returns with its classification "
+        + "extension instead of the raw output. They are only checked, not "
+        + "reported; 0 requests the raw output. Default is 1.",
+    )
+    parser.add_argument(
+        "--decode-output",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Copy the raw output of every response into a preallocated "
+        + "array (needs -c 0). Responses are always validated and then released.",
+    )
+    parser.add_argument(
+        "--skip-output",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Pure throughput: request the output as raw binary data without "
+        + "classification (-c 0) and neither validate nor decode it.",
+    )
+    parser.add_argument(
+        "--wire-dtype",
+        type=str,
+        required=False,
+        default=None,
+        choices=["FP16", "INT8"],
+        help="Send FP32 samples converted to the FP16 or INT8 input of the "
+        + "model (which must have that input datatype). Default is to "
+        + "generate the samples in the model input datatype.",
+    )
+    parser.add_argument(
+        "--int8-scale",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Quantization scale of --wire-dtype INT8. Default is 0 "
+        + "(calibrated on the first batch as max |x| / 127).",
+    )
+    parser.add_argument(
+        "--int8-zero-point",
+        type=int,
+        required=False,
+        default=0,
+        help="Quantization zero point of --wire-dtype INT8. Default is 0.",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        required=False,
+        default="none",
+        choices=["none", "gzip", "deflate"],
+        help="Compress the request body (HTTP) or message (gRPC) with this "
+        + "algorithm. Default is none.",
+    )
+    parser.add_argument(
+        "--gallery",
+        type=str,
+        required=False,
+        default=None,
+        help="Gallery of enrolled people (.npz with 'embeddings' and 'labels', "
+        + "or .npy of embeddings) every output batch is identified against. "
+        + "Outputs are then requested as raw tensors.",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        required=False,
+        default=1,
+        help="Identities returned per sample by the gallery matching. Default is 1.",
+    )
+    parser.add_argument(
+        "--adaptive-rate",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Multi-person mode with --gallery: once the fused identity of "
+        + "a person is confident, send only one window in --stable-stride.",
+    )
+    parser.add_argument(
+        "--identity-threshold",
+        type=float,
+        required=False,
+        default=0.2,
+        help="Margin of the best fused gallery score of a person over the "
+        + "second one, relative to the best, needed to consider it "
+        + "identified. Default is 0.2.",
+    )
+    parser.add_argument(
+        "--identity-confirmations",
+        type=int,
+        required=False,
+        default=3,
+        help="Inferred windows of a person before it can be considered "
+        + "identified. Default is 3.",
+    )
+    parser.add_argument(
+        "--identity-decay",
+        type=float,
+        required=False,
+        default=0.8,
+        help="Decay per window of the fused identity scores. Default is 0.8.",
     )
     parser.add_argument(
-        "-s",
-        "--scaling",
+        "--stable-stride",
+        type=int,
+        required=False,
+        default=5,
+        help="With --adaptive-rate, windows per inference of an identified "
+        + "person. Default is 5.",
+    )
+    parser.add_argument(
+        "--track-subjects",
         type=str,
-        choices=["NONE", "INCEPTION", "VGG"],
         required=False,
-        default="NONE",
-        help="Type of scaling to apply to image pixels. Default is NONE.",
+        default=None,
+        help="Multi-person mode with --gallery and real samples: .npy of "
+        + "the subject (gallery label) of every sample, to score the "
+        + "reported identities against.",
+    )
+    parser.add_argument(
+        "--gallery-nlist",
+        type=int,
+        required=False,
+        default=0,
+        help="Clusters of the approximate gallery index. Default is 0 (exact matching).",
+    )
+    parser.add_argument(
+        "--gallery-nprobe",
+        type=int,
+        required=False,
+        default=8,
+        help="Clusters searched per sample with the approximate index. Default is 8.",
     )
     parser.add_argument(
         "-u",
@@ -373,283 +2517,258 @@ if __name__ == "__main__":
         help="Protocol (HTTP/gRPC) used to communicate with "
         + "the inference service. Default is HTTP.",
     )
+    parser.add_argument(
+        "--power-device",
+        type=str,
+        required=False,
+        default="orin2",
+        help="Device whose power rails are sampled, as named in the "
+        + "sensor map. Default is orin2.",
+    )
+    parser.add_argument(
+        "--power-rail",
+        type=str,
+        required=False,
+        default="GPU",
+        help="Rail reported as Energy_per_inference. Every rail of the "
+        + "device is sampled and reported. Default is GPU.",
+    )
+    parser.add_argument(
+        "--power-config",
+        type=str,
+        required=False,
+        default=None,
+        help="JSON sensor map (device -> rail -> current/voltage sysfs "
+        + "files). Default is power_sensors.json.",
+    )
+    parser.add_argument(
+        "--sysfs-root",
+        type=str,
+        required=False,
+        default="/sys",
+        help="Root of the sysfs tree with the power sensors. Default is /sys.",
+    )
+    parser.add_argument(
+        "--metrics-url",
+        type=str,
+        required=False,
+        default="localhost:8002",
+        help="Triton metrics endpoint. Default is localhost:8002.",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        required=False,
+        default=0.0,
+        help="Scrape the server metrics every this many ms during each run "
+        + "and report per-interval throughput, queue and compute time. "
+        + "Default is 0 (only before and after the run).",
+    )
+    parser.add_argument(
+        "--metrics-output",
+        type=str,
+        required=False,
+        default=None,
+        help="CSV/JSON file for the per-interval metrics of --metrics-interval.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        required=False,
+        default=None,
+        help="Record the client stages of every request and write them, with "
+        + "the server metrics (--metrics-interval) and the power samples, as a "
+        + "Chrome trace JSON viewable in Perfetto. The name can contain {model}, "
+        + "{batch} and {conc} to keep one file per configuration of a sweep.",
+    )
+    parser.add_argument(
+        "--idle-baseline",
+        type=float,
+        required=False,
+        default=2.0,
+        help="Seconds of idle power measured before every configuration "
+        + "and subtracted from the dynamic energy. 0 disables it. Default is 2.",
+    )
     parser.add_argument(
         "image_filename",
         type=str,
         nargs="?",
         default=None,
-        help="Input image / Input folder.",
+        help="Input samples: a packed .npy array of samples or a folder of "
+        + ".npy files, memory-mapped and sent instead of random data.",
     )
     FLAGS = parser.parse_args()
-    
-     # Initialize thread that measures energy
-    energy_measurer_GPU = EnergyMeter('orin2', 2, 'GPU', 0)
-    energy_measurer_GPU.start()
-    energy = []
-    
+
+    if FLAGS.model_name is None and not FLAGS.sweep_models and not FLAGS.mix:
+        parser.error("a model name (-m), --sweep-models or --mix is required")
+    if FLAGS.arrival in ("constant", "poisson") and FLAGS.request_rate <= 0:
+        # Would silently run the closed loop
+        parser.error("--arrival {} needs --request-rate".format(FLAGS.arrival))
+    if FLAGS.arrival is None:
+        FLAGS.arrival = "constant"
     if FLAGS.streaming and FLAGS.protocol.lower() != "grpc":
         raise Exception("Streaming is only allowed with gRPC protocol")
 
-    try:
-        if FLAGS.protocol.lower() == "grpc":
-            # Create gRPC client for communicating with the server
-            triton_client = grpcclient.InferenceServerClient(
-                url=FLAGS.url, verbose=FLAGS.verbose
-            )
-        else:
-            # Specify large enough concurrency to handle the
-            # the number of requests.
-            concurrency = 32 if FLAGS.async_set else 1
-            triton_client = httpclient.InferenceServerClient(
-                url=FLAGS.url, verbose=FLAGS.verbose, concurrency=concurrency
-            )
-    except Exception as e:
-        print("client creation failed: " + str(e))
-        sys.exit(1)
-
-    # Make sure the model matches our requirements, and get some
-    # properties of the model that we need for preprocessing
-    try:
-        model_metadata = triton_client.get_model_metadata(
-            model_name=FLAGS.model_name, model_version=FLAGS.model_version
-        )
-        #model_metadata1 = triton_client.get_model_metadata(
-        #    model_name=FLAGS.model_name, model_version=FLAGS.model_version
-        #)
-    except InferenceServerException as e:
-        print("failed to retrieve the metadata: " + str(e))
-        sys.exit(1)
-
-    try:
-        model_config = triton_client.get_model_config(
-            model_name=FLAGS.model_name, model_version=FLAGS.model_version
-        )
-    except InferenceServerException as e:
-        print("failed to retrieve the config: " + str(e))
-        sys.exit(1)
-
-    if FLAGS.protocol.lower() == "grpc":
-        model_config = model_config.config
-    else:
-        model_metadata, model_config = convert_http_metadata_config(
-            model_metadata, model_config
-        )
-     
+    if FLAGS.asyncio:
+        if FLAGS.streaming or FLAGS.tracks > 0:
+            raise Exception("--asyncio supports the closed-loop and open-loop modes without streaming")
+        FLAGS.async_set = True
 
-    #max_batch_size, input_name, output_name, c, h, w, format, dtype = parse_model(
-    #    model_metadata, model_config
-    #)
-    
-      ##################################################
-      # Extraemos valores del modelo y la configuracion
-      ################################################
-      
-    if len(model_metadata.inputs) != 1:
-        raise Exception("expecting 1 input, got {}".format(len(model_metadata.inputs))
-        )
-    if len(model_metadata.outputs) != 1:
-        raise Exception(
-            "expecting 1 output, got {}".format(len(model_metadata.outputs))
-        )
-            
-    max_batch_size = model_config.max_batch_size
+    open_loop = FLAGS.request_rate > 0 or FLAGS.arrival == "trace"
+    track_mode = FLAGS.tracks > 0
+    if FLAGS.adaptive_rate and not (FLAGS.gallery and FLAGS.tracks > 0):
+        raise Exception("--adaptive-rate needs --gallery and --tracks")
+    if FLAGS.track_subjects and not (FLAGS.gallery and FLAGS.tracks > 0 and FLAGS.image_filename):
+        raise Exception("--track-subjects needs --gallery, --tracks and input samples")
+    if FLAGS.skip_output:
+        if FLAGS.decode_output or FLAGS.gallery:
+            raise Exception("--skip-output does not read the outputs, unlike --decode-output and --gallery")
+        FLAGS.classes = 0
+    if FLAGS.gallery:
+        if FLAGS.shared_memory != "none":
+            raise Exception("--gallery reads the outputs from the responses, not from shared memory")
+        # Embeddings, not classification strings
+        FLAGS.classes = 0
+    if FLAGS.compression != "none" and FLAGS.shared_memory != "none":
+        raise Exception("--compression compresses the input tensors, which --shared-memory does not send")
+    if FLAGS.decode_output and (FLAGS.classes > 0 or FLAGS.shared_memory != "none"):
+        raise Exception("--decode-output needs raw outputs (-c 0) in the responses, not in shared memory")
+    if FLAGS.deadline > 0 and FLAGS.streaming:
+        raise Exception("--deadline needs -a or sync requests: a failed stream response "
+                        + "does not identify its request")
+    if FLAGS.stride < 1 or FLAGS.window_frames < 0:
+        raise Exception("--stride must be at least 1 and --window-frames at least 0")
+    if (open_loop or track_mode) and not (FLAGS.async_set or FLAGS.streaming):
+        raise Exception("--request-rate and --tracks need the asynchronous (-a) or streaming API")
+    if FLAGS.tune_slo > 0 and (open_loop or track_mode or not (FLAGS.async_set or FLAGS.streaming)):
+        raise Exception("--tune-slo searches the concurrency of the asynchronous (-a) or streaming closed loop")
+    if FLAGS.stability_windows > 0 and (open_loop or track_mode):
+        raise Exception("--stability-windows applies to the closed loop")
+    FLAGS.worker_index = 0
+    if FLAGS.workers > 1:
+        if track_mode or FLAGS.stability_windows > 0 or not (FLAGS.async_set or FLAGS.streaming):
+            raise Exception("--workers needs the asynchronous (-a) or streaming API and "
+                            + "does not support --tracks or --stability-windows")
+    mix_entries = parse_mix(FLAGS.mix) if FLAGS.mix else None
+    if mix_entries is not None:
+        if (track_mode or FLAGS.stability_windows > 0 or FLAGS.tune_slo > 0 or FLAGS.sweep_models
+                or FLAGS.arrival == "trace" or not (FLAGS.async_set or FLAGS.streaming)):
+            raise Exception("--mix needs the asynchronous (-a) or streaming API and does not support "
+                            + "--tracks, --stability-windows, --tune-slo, --sweep-models or trace arrivals")
+        if not mix_entries or any(weight <= 0 for _, _, weight in mix_entries):
+            raise Exception("--mix needs models with positive weights")
 
-    c = model_metadata.inputs[0].shape[1] # 25
-    h = model_metadata.inputs[0].shape[2] # 60
-    w = model_metadata.inputs[0].shape[3] # 60
-    f = model_metadata.inputs[0].shape[4] # 2
-    
-    input_name = model_metadata.inputs[0].name
-    output_name = model_metadata.outputs[0].name
-    output_shape = model_metadata.outputs[0].shape
-    dtype = model_metadata.inputs[0].datatype
+    # Sweep grid, a single configuration unless --sweep-* is given
+    models = parse_list(FLAGS.sweep_models, str) if FLAGS.sweep_models else [FLAGS.model_name]
+    batch_sizes = parse_list(FLAGS.sweep_batch) if FLAGS.sweep_batch else [FLAGS.batch_size]
+    concurrencies = parse_list(FLAGS.sweep_conc) if FLAGS.sweep_conc else [FLAGS.conc]
+    if FLAGS.tune_slo > 0:
+        # The search covers the whole grid unless it is given
+        if not FLAGS.sweep_batch:
+            batch_sizes = DEFAULT_GRID
+        if not FLAGS.sweep_conc:
+            concurrencies = DEFAULT_GRID
 
+     # Initialize thread that measures energy
+    energy_measurer_GPU = EnergyMeter(
+        FLAGS.power_device, 2, FLAGS.power_rail, 0,
+        sysfs_root=FLAGS.sysfs_root, capacity=1 << 18, config=FLAGS.power_config)
+    if energy_measurer_GPU.unavailable:
+        print("Warning: no sensor files for rails", ", ".join(energy_measurer_GPU.unavailable),
+              "under", FLAGS.sysfs_root, "- their energy is reported as nan")
+    energy_measurer_GPU.start()
 
-    supports_batching = max_batch_size > 0
-    if not supports_batching and FLAGS.batch_size != 1:
-        print("ERROR: This model doesn't support batching.")
+    # One client (and connection pool) for the whole sweep
+    concurrency = max(max(concurrencies), FLAGS.max_in_flight, 1) if FLAGS.async_set else 1
+    if FLAGS.async_set and (open_loop or track_mode) and FLAGS.max_in_flight == 0:
+        concurrency = max(concurrency, 64)
+    try:
+        triton_client = create_client(FLAGS, concurrency)
+    except Exception as e:
+        print("client creation failed: " + str(e))
+        energy_measurer_GPU.finish()
         sys.exit(1)
-        
-    batched_image_data = generate_random_sample(FLAGS.batch_size, c, h, w, f)
-
-    num_launches = FLAGS.iter
-    launches = num_launches
-    min_latency = 9999.0
-    min_energy = 9999.0
-    start_wall = time.time()
-    
-       
-    # Send requests of FLAGS.batch_size images. If the number of
-    # images isn't an exact multiple of FLAGS.batch_size then just
-    # start over with the first images until the batch is filled.
-    # requests = []
-    responses = []
-    result_filenames = []
-    request_ids = []
-    inferences_time = []
-    image_idx = 0
-    user_data = UserData()
+    metrics_client = MetricsClient(FLAGS.metrics_url)
+    # Requests of the --asyncio mode go through the aio client; the
+    # synchronous one still reads metadata and registers shared memory
+    aio_client = None
+    if FLAGS.asyncio:
+        unbounded = open_loop and FLAGS.max_in_flight == 0
+        aio_client = AsyncioClient(FLAGS, 0 if unbounded else concurrency)
 
-    
-    sent_count = 0
-
-    if FLAGS.streaming:
-         triton_client.start_stream(partial(completion_callback, user_data))
-            
-    # Current metrics value        
-    metrics = get_metrics()
-    init_values = get_metrics_values(metrics, FLAGS.model_name)
-    start_time = time.time()
-    acc_energy = 0
-    
-     # START
-    request_time_start=[]
-    cont_request = 0
-    
-    energy_measurer_GPU.start_measuring() 
-    
-    while (launches > 0):
-        # Holds the handles to the ongoing HTTP async requests.
-        # Start energy measurement
-        async_requests = []
-        try:
-            for inputs, outputs, model_name, model_version in requestGenerator(
-                batched_image_data, input_name,
-                output_name, output_shape, dtype, FLAGS):
-                
-                if FLAGS.streaming:
-                    triton_client.async_stream_infer(
-                        FLAGS.model_name,
-                        inputs,
-                        request_id=str(cont_request),
-                        model_version=FLAGS.model_version,
-                         outputs=outputs,
-                    ) 
-                    cont_request += 1
-
-                elif FLAGS.async_set:
-                    if FLAGS.protocol.lower() == "grpc":
-                            start = time.time()
-                            triton_client.async_infer(
-                                FLAGS.model_name,
-                                inputs,
-                                partial(completion_callback, user_data),
-                                request_id=str(cont_request),
-                                model_version=FLAGS.model_version,
-                                outputs=outputs,
-                            )
-                            cont_request += 1
-                    else:
-                        for i in range(FLAGS.conc):
-                            async_requests.append(
-                                triton_client.async_infer(
-                                    FLAGS.model_name,
-                                    inputs=inputs,
-                                    request_id=str(i),
-                                    model_version=FLAGS.model_version,
-                                    outputs=outputs,
-                                )
-                            )
-                            cont_request += 1
+    results = []
+    metrics_rows = []
+    tune_trials = []
+    try:
+        if mix_entries is not None:
+            try:
+                mix = [(load_model(triton_client, name, version, FLAGS), weight)
+                       for name, version, weight in mix_entries]
+            except InferenceServerException as e:
+                print("failed to retrieve the metadata/config: " + str(e))
+                sys.exit(1)
+            for mix_model, weight in mix:
+                print("Model=", model_label(mix_model), "Weight=", weight,
+                      "Input=", mix_model.input_name, mix_model.sample_shape, mix_model.dtype,
+                      "Max_batch_size=", mix_model.max_batch_size)
+            measure = partial(
+                run_point, triton_client, energy_measurer_GPU, metrics_client,
+                aio_client, None, FLAGS, results, metrics_rows, mix=mix)
+            models = []
+            for batch_size in batch_sizes:
+                for conc in concurrencies:
+                    measure(batch_size, conc, FLAGS.iter)
+        for model_name in models:
+            try:
+                model = load_model(triton_client, model_name, FLAGS.model_version, FLAGS)
+            except InferenceServerException as e:
+                print("failed to retrieve the metadata/config: " + str(e))
+                sys.exit(1)
+            measure = partial(
+                run_point, triton_client, energy_measurer_GPU, metrics_client,
+                aio_client, model, FLAGS, results, metrics_rows)
+            if FLAGS.tune_slo > 0:
+                # Batch sizes the model cannot take are left out of the search
+                tune_batches = [b for b in batch_sizes
+                                if (model.max_batch_size == 0 and b == 1) or b <= model.max_batch_size]
+                energy_key = ("dynamic_energy_per_inference_mJ" if FLAGS.idle_baseline > 0
+                              else "energy_per_inference_mJ")
+                trials, front, chosen = tune(
+                    measure, tune_batches, concurrencies, FLAGS.tune_slo, FLAGS.iter,
+                    eta=FLAGS.tune_eta, min_iter=FLAGS.tune_min_iter, minimize=energy_key)
+                runs = [trial for trial in trials if not trial["skipped"]]
+                grid_size = len(tune_batches) * len(concurrencies)
+                points, avoided, spent = search_cost(trials, grid_size, FLAGS.iter)
+                print("Model=", model_name, "SLO_p99(ms)=", FLAGS.tune_slo,
+                      "Grid=", grid_size, "Measured=", points, "Runs=", len(runs),
+                      "Runs_avoided=", avoided, "Skipped_by_SLO=", len(trials) - len(runs),
+                      "Iterations(%grid)=", round(100.0 * spent, 1))
+                for result in front:
+                    print("    Pareto", "Batch=", result["batch"], "Conc=", result["conc"],
+                          "Throughput(infer/s)=", round(result["throughput"], 2),
+                          "Energy_per_inference(mJ)=", round(result[energy_key], 4),
+                          "p99(ms)=", round(result["latency_p99_ms"], 3))
+                if chosen is None:
+                    print("    No configuration meets the SLO")
                 else:
-                    responses.append(
-                         triton_client.infer(
-                            FLAGS.model_name,
-                            inputs,
-                            request_id=str(sent_count),
-                            model_version=FLAGS.model_version,
-                            outputs=outputs,
-                        )
-                    )
-                    cont_request += 1
-
-        except InferenceServerException as e:
-            print("inference failed: " + str(e))
-            if FLAGS.streaming:
-                triton_client.stop_stream()
-            sys.exit(1)
-            
-        launches -= 1
-        if FLAGS.protocol.lower() == "grpc":
-            if FLAGS.streaming or FLAGS.async_set:
-                processed_count = 0
-                while processed_count < num_launches:
-                    (results, error) = user_data._completed_requests.get()
-                    #if processed_count == 0:
-                    #    first_annotatedtime = user_data._sampletimes[processed_count]-start
-                    #if processed_count == sent_count-1:
-                    #    last_annotatedtime = user_data._sampletimes[processed_count]-start
-                    #print("Request time " + str(request_time[processed_count]-start_wall) + "\tResponse time: " + str(user_data._sampletimes[processed_count] -start_wall)
-                    #      +"\tDif: "+ str(user_data._sampletimes[processed_count]- request_time[processed_count])) 
-                    processed_count += 1
-                    if error is not None:
-                        print("inference failed: " + str(error))
-                        sys.exit(1)
-                    responses.append(results)
-                    end_response = time.time()
-
-                  #  energy_measurer_GPU.stop_measuring()
-                  #  acc_energy = energy_measurer_GPU.total_energy
-                #if first_annotatedtime < min_latency:
-                #   first_latency = first_annotatedtime
-                #    last_latency = last_annotatedtime
-                #    min_energy = energy_measurer_GPU.total_energy
-        
-        else:
-            if FLAGS.async_set:
-                # Collect results from the ongoing async requests
-                # for HTTP Async requests
-                 for async_request in async_requests:
-                    responses.append(async_request.get_result())
-                
-                #print ("Async Time: ", stop-start
-
-        #for response in responses:
-        #    length = len(response._buffer)
-        #    if length != 4096 :
-        #        print("Output error")
-        #        sys.exit(1)
-            
-        # print("PASS")
-     
-    acc_energy = energy_measurer_GPU.total_energy
-    energy_measurer_GPU.stop_measuring()
-    energy_measurer_GPU.finish()
-    end_time = time.time()
-    
-    if FLAGS.streaming:
-                triton_client.stop_stream()
-    
-    # Gets metrics before starting
-    metrics = get_metrics()
-    end_values = get_metrics_values(metrics, FLAGS.model_name)
-    number_of_inferences = int(end_values[2])-int(init_values[2])
-    print("", "Batch=",int(FLAGS.batch_size), "Conc=", int(FLAGS.conc), "Inferences=", number_of_inferences, "Energy_per_inference(mJ)=", acc_energy/number_of_inferences)
-
-"""
-    print("Number of succesul requested inferences: ", int(end_values[0])-int(init_values[0]))
-    print("Number of failed requested inferences: ", int(end_values[1])-int(init_values[1]))
-    print("Number of inferences performed (num_inf*batch_size): ", int(end_values[2])-int(init_values[2]))
-    print("Number of inference batch executions: ", int(end_values[3])-int(init_values[3]))
-    
-    print("Inference request duration (us): ", (int(end_values[4])-int(init_values[4]))/number_of_inferences)
-    print("Inference queue duration (us): ", (int(end_values[5])-int(init_values[5]))/number_of_inferences)
-    print("Inference compute input duration (us): ", (int(end_values[6])-int(init_values[6]))/number_of_inferences)
-    print("Inference compute infer duration (us): ", (int(end_values[7])-int(init_values[7]))/number_of_inferences)
-    print("Inference compute output duration (us): ", (int(end_values[8])-int(init_values[8]))/number_of_inferences)
-    ##
-
-    #print ("Latencia per sample=", min_latency/(FLAGS.conc * FLAGS.batch_size))
-    
-    #print("Thoughput (samples per second): ", (FLAGS.conc * FLAGS.batch_size)/last_latency)
-    print("Latency: ", end_time - start_time)
-    print("Latency per inference: ", (end_time - start_time)/(num_launches) * int(FLAGS.conc))
-    print("Troughput (inferences/second): ", number_of_inferences/((int(end_values[4])-int(init_values[4]))/1000000.0)) 
-    print("Troughput: ", ((num_launches) * int(FLAGS.conc) * FLAGS.batch_size)/(end_time - start_time))
-"""
-    #print("", int(FLAGS.batch_size), int(FLAGS.conc), acc_energy/number_of_inferences)
-    
-   
-    
-
-        
+                    print("    Chosen", "Batch=", chosen["batch"], "Conc=", chosen["conc"],
+                          "Throughput(infer/s)=", round(chosen["throughput"], 2),
+                          "Energy_per_inference(mJ)=", round(chosen[energy_key], 4),
+                          "p99(ms)=", round(chosen["latency_p99_ms"], 3))
+                # The trials, with rung and SLO verdict, replace the plain
+                # results in the output
+                for trial in trials:
+                    trial["model"] = model_name
+                    trial["chosen"] = trial is chosen
+                tune_trials.extend(trials)
+                if FLAGS.sweep_output:
+                    write_results(tune_trials, FLAGS.sweep_output)
+                continue
+            for batch_size in batch_sizes:
+                for conc in concurrencies:
+                    measure(batch_size, conc, FLAGS.iter)
+    finally:
+        energy_measurer_GPU.finish()
+        metrics_client.close()
+        if aio_client is not None:
+            aio_client.close()
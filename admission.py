@@ -0,0 +1,121 @@
+import threading
+import time
+
+from latency_histogram import LatencyHistogram
+
+
+# Message of the error Triton returns for a request whose timeout expired
+# while it was queued (UNAVAILABLE over gRPC)
+TIMEOUT_MESSAGE = "Request timeout expired"
+
+
+def is_timeout(error):
+    """
+    True if error is Triton rejecting a request whose timeout expired
+    while it was queued. Client-side socket or connection timeouts, and
+    any other error, are not: they are failures.
+    """
+    message = error.message() if hasattr(error, "message") else str(error)
+    return message is not None and message.strip() == TIMEOUT_MESSAGE
+
+
+class AdmissionController:
+    """
+    Deadline admission of requests. Every request has a deadline of
+    deadline_ns after its origin (scheduled arrival, window emission or
+    send time). Before sending, the controller predicts when the request
+    would complete from an exponentially weighted average of the recent
+    send-to-completion latencies (client timestamps); a request that would
+    miss its deadline is shed without reaching the server, and the others
+    are sent with their remaining time as the Triton timeout, so the
+    server drops them if they are still queued when it runs out.
+
+    While requests are shed nothing completes to update the prediction,
+    so every shed request decays it: once the queue has drained, requests
+    are admitted again.
+
+    Completions are counted on time if they answer within the deadline
+    of their origin; on-time inferences per second is the goodput. All
+    the counts are in inferences (samples or windows), not requests.
+    """
+
+    def __init__(self, deadline_ns, alpha=0.1):
+        self.deadline_ns = deadline_ns
+        self.alpha = alpha
+        self.predicted_ns = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.on_time = 0
+        self.late = 0
+        self.slack = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def would_miss(self, origin_ns, now_ns):
+        return origin_ns + self.deadline_ns - now_ns <= self.predicted_ns
+
+    def timeout_us(self, origin_ns, now_ns):
+        return max(int((origin_ns + self.deadline_ns - now_ns) // 1000), 1)
+
+    def admit(self, origin_ns, now_ns, count=1):
+        """
+        Returns the Triton timeout (us) to send a request (of count
+        windows) with, or None if it is shed.
+        """
+        if self.would_miss(origin_ns, now_ns):
+            self.record_shed(count)
+            return None
+        with self._lock:
+            self.admitted += count
+        return self.timeout_us(origin_ns, now_ns)
+
+    def admit_now(self, origin_ns, count=1):
+        """
+        admit() for a request sent now, e.g. by a closed loop as soon as
+        it is built (origin_ns, the start of the build).
+        """
+        return self.admit(origin_ns, time.monotonic_ns(), count)
+
+    def record_shed(self, count):
+        with self._lock:
+            self.shed += count
+            self.predicted_ns *= 1.0 - self.alpha
+
+    def completed(self, sent_ns, origin_ns, completion_ns, inferences):
+        with self._lock:
+            latency_ns = completion_ns - sent_ns
+            if self.predicted_ns == 0.0:
+                self.predicted_ns = float(latency_ns)
+            else:
+                self.predicted_ns += self.alpha * (latency_ns - self.predicted_ns)
+            remaining_ns = origin_ns + self.deadline_ns - completion_ns
+            if remaining_ns >= 0:
+                self.on_time += inferences
+                self.slack.record(remaining_ns)
+            else:
+                self.late += inferences
+
+    def record_expired(self, count):
+        with self._lock:
+            self.expired += count
+
+    def counts(self):
+        return (self.admitted, self.shed, self.expired, self.on_time, self.late)
+
+    def merge(self, counts, slack):
+        """
+        Adds the counts() and slack histogram of another controller, e.g.
+        of a worker process or a measurement window.
+        """
+        with self._lock:
+            self.admitted += counts[0]
+            self.shed += counts[1]
+            self.expired += counts[2]
+            self.on_time += counts[3]
+            self.late += counts[4]
+            self.slack.merge(slack)
+
+    def reset(self):
+        with self._lock:
+            self.admitted = self.shed = self.expired = self.on_time = self.late = 0
+            self.slack = LatencyHistogram()
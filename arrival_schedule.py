@@ -0,0 +1,81 @@
+import itertools
+import random
+
+
+def constant_intervals(rate):
+    """
+    Inter-arrival times (ns) of a fixed-rate source, e.g. a camera that
+    emits one gait window every 1/rate seconds.
+    """
+    interval_ns = int(1e9 / rate)
+    return itertools.repeat(interval_ns)
+
+
+def poisson_intervals(rate, seed=None):
+    """
+    Exponentially distributed inter-arrival times (ns) with mean 1/rate,
+    i.e. a Poisson arrival process.
+    """
+    rng = random.Random(seed)
+    while True:
+        yield int(rng.expovariate(rate) * 1e9)
+
+
+def read_trace(filename):
+    """
+    Reads the inter-arrival times (one value in milliseconds per line)
+    stored in filename and returns them in ns. Empty lines and lines
+    starting with '#' are ignored.
+    """
+    intervals = []
+    with open(filename, "r") as trace:
+        for line in trace:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                intervals.append(int(float(line) * 1e6))
+    if not intervals:
+        raise Exception("arrival trace '{}' is empty".format(filename))
+    return intervals
+
+
+def trace_intervals(filename):
+    """
+    Replays the inter-arrival times of a trace file, repeating the trace
+    if the run is longer.
+    """
+    return itertools.cycle(read_trace(filename))
+
+
+def trace_rate(filename):
+    """
+    Mean arrival rate (requests/second) of a trace file.
+    """
+    intervals = read_trace(filename)
+    return len(intervals) / (sum(intervals) / 1e9)
+
+
+def make_intervals(arrival, rate, trace_file=None, seed=None):
+    if arrival == "constant":
+        return constant_intervals(rate)
+    if arrival == "poisson":
+        return poisson_intervals(rate, seed)
+    if arrival == "trace":
+        if trace_file is None:
+            raise Exception("trace arrivals need an arrival trace file")
+        return trace_intervals(trace_file)
+    raise Exception("unknown arrival process '{}'".format(arrival))
+
+
+def split_intervals(intervals, parts, index):
+    """
+    Inter-arrival times of the arrivals index, index + parts, index +
+    2 * parts... of intervals, so that parts senders together replay the
+    whole schedule.
+    """
+    elapsed = 0
+    last = 0
+    for position, interval in enumerate(intervals):
+        elapsed += interval
+        if position % parts == index:
+            yield elapsed - last
+            last = elapsed
@@ -0,0 +1,153 @@
+import math
+
+# Batch sizes and concurrencies of performance_sweeping.sh
+DEFAULT_GRID = [1, 4, 8, 12, 16, 20, 24, 28, 32]
+
+
+def dominates(a, b, maximize, minimize):
+    """
+    True if result a is at least as good as b in both objectives and
+    strictly better in one.
+    """
+    no_worse = a[maximize] >= b[maximize] and a[minimize] <= b[minimize]
+    better = a[maximize] > b[maximize] or a[minimize] < b[minimize]
+    return no_worse and better
+
+
+def pareto_ranks(results, maximize, minimize):
+    """
+    Non-dominated sorting: rank 0 is the Pareto frontier, rank 1 the
+    frontier once rank 0 is removed, and so on.
+    """
+    ranks = [None] * len(results)
+    remaining = list(range(len(results)))
+    rank = 0
+    while remaining:
+        front = [i for i in remaining
+                 if not any(dominates(results[j], results[i], maximize, minimize)
+                            for j in remaining if j != i)]
+        for i in front:
+            ranks[i] = rank
+        remaining = [i for i in remaining if ranks[i] is None]
+        rank += 1
+    return ranks
+
+
+def pareto_front(results, maximize, minimize):
+    ranks = pareto_ranks(results, maximize, minimize)
+    front = [result for result, rank in zip(results, ranks) if rank == 0]
+    return sorted(front, key=lambda result: result[maximize])
+
+
+def coarse_indices(size, stride):
+    """
+    Grid indices of one axis at stride, the last one always included.
+    """
+    indices = list(range(0, size, stride))
+    if indices[-1] != size - 1:
+        indices.append(size - 1)
+    return indices
+
+
+def initial_stride(size, eta):
+    """
+    Largest power of eta that is still a step inside an axis of size
+    values, 1 for axes of up to eta values.
+    """
+    stride = 1
+    while (size - 1) // (stride * eta) >= 1:
+        stride *= eta
+    return stride
+
+
+def tune(measure, batch_sizes, concurrencies, slo_ms, max_iter, eta=3, min_iter=20,
+         maximize="throughput", minimize="energy_per_inference_mJ",
+         latency_key="latency_p99_ms"):
+    """
+    Searches the (batch, concurrency) grid for the configurations that
+    meet a latency SLO without measuring all of it. The first rung runs a
+    coarse subsample of the grid (every eta**k-th batch and concurrency,
+    the largest ones included) with short runs; every following rung
+    keeps the best 1/eta (by Pareto rank, then throughput), adds their
+    grid neighbours at eta times finer stride and measures them eta times
+    longer, until the stride is 1 and the runs have max_iter iterations.
+
+    The SLO prunes the grid too: latency grows with batch size and
+    concurrency, so once (b, c) misses the SLO the configurations with a
+    larger or equal batch and concurrency are never measured.
+
+    measure(batch, conc, iterations) runs one configuration and returns
+    its result dict. Returns (trials, front, chosen): every run made or
+    skipped (with its rung, iterations and SLO verdict), the Pareto
+    frontier of the final rung and the frontier point with the highest
+    throughput.
+    """
+    batch_sizes = sorted(batch_sizes)
+    concurrencies = sorted(concurrencies)
+    strides = [initial_stride(len(batch_sizes), eta), initial_stride(len(concurrencies), eta)]
+    candidates = [(i, j) for i in coarse_indices(len(batch_sizes), strides[0])
+                  for j in coarse_indices(len(concurrencies), strides[1])]
+    # One rung per refinement of the stride, plus those needed to get
+    # down to eta configurations, limited by how short the first runs
+    # may be (runs are never shorter than min_iter)
+    refinements = max(int(round(math.log(stride, eta))) for stride in strides)
+    rungs = max(refinements + 1, math.ceil(math.log(len(candidates), eta) - 1e-9))
+    rungs = min(rungs, 1 + max(refinements, int(math.log(max(max_iter / min_iter, 1), eta))))
+    shortest = min(min_iter, max_iter)
+
+    trials = []
+    failed = []
+    for rung in range(rungs):
+        iterations = max(int(max_iter / eta ** (rungs - 1 - rung)), shortest, 1)
+        measured = []
+        for i, j in sorted(candidates):
+            b, c = batch_sizes[i], concurrencies[j]
+            if any(b >= fb and c >= fc for fb, fc in failed):
+                trials.append({"batch": b, "conc": c, "rung": rung, "iter": 0,
+                               "meets_slo": False, "skipped": True})
+                continue
+            result = dict(measure(b, c, iterations))
+            result.update({"rung": rung, "iter": iterations,
+                           "meets_slo": result[latency_key] <= slo_ms, "skipped": False})
+            trials.append(result)
+            if result["meets_slo"]:
+                measured.append((i, j, result))
+            else:
+                failed.append((b, c))
+        if not measured:
+            return trials, [], None
+        if rung == rungs - 1:
+            break
+        results = [result for _, _, result in measured]
+        ranks = pareto_ranks(results, maximize, minimize)
+        order = sorted(range(len(measured)), key=lambda k: (ranks[k], -results[k][maximize]))
+        keep = [measured[k][:2] for k in order[:max(1, math.ceil(len(measured) / eta))]]
+        candidates = set(keep)
+        # Neighbours of the survivors at the finer stride, on the axes
+        # not yet at stride 1
+        finer = [max(stride // eta, 1) for stride in strides]
+        for i, j in keep:
+            if finer[0] < strides[0]:
+                candidates.update((i + d, j) for d in (-finer[0], finer[0])
+                                  if 0 <= i + d < len(batch_sizes))
+            if finer[1] < strides[1]:
+                candidates.update((i, j + d) for d in (-finer[1], finer[1])
+                                  if 0 <= j + d < len(concurrencies))
+        strides = finer
+
+    results = [result for _, _, result in measured]
+    front = pareto_front(results, maximize, minimize)
+    chosen = max(front, key=lambda result: (result[maximize], -result[minimize]))
+    return trials, front, chosen
+
+
+def search_cost(trials, grid_size, max_iter):
+    """
+    What the search saved against measuring the whole grid with max_iter
+    iterations: (configurations measured, runs avoided, fraction of the
+    grid iterations spent).
+    """
+    runs = [trial for trial in trials if not trial["skipped"]]
+    points = len({(trial["batch"], trial["conc"]) for trial in runs})
+    iterations = sum(trial["iter"] for trial in runs)
+    return points, grid_size - len(runs), iterations / float(grid_size * max_iter)
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+
+
+class Tracer:
+    """
+    Per-request spans of the client stages, written as a Chrome trace
+    (JSON object format) that Perfetto and chrome://tracing open.
+
+    Recording a span is one list append of (stage, request_id, start_ns,
+    end_ns) with time.monotonic_ns() stamps; nothing is formatted until
+    write(). The stages of a request are:
+
+        build             tensor creation and serialization (requestGenerator)
+        send              the client API call that submits the request
+        in_flight         network and server, until the response callback
+                          (HTTP responses are parsed in it)
+        completion_queue  hop through the completion queue to the collector
+        match             gallery identification of the outputs
+        expired           in flight until Triton dropped it (--deadline)
+
+    Every request is drawn as an async track with its stages in order.
+    Counter tracks (server metrics, power samples) can be added before
+    writing.
+    """
+
+    def __init__(self, max_spans=1 << 21):
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        # request_id -> end of its send, until it completes
+        self._sent = {}
+        # (process label, spans) of other processes (--workers)
+        self.processes = []
+        # (name, times_ns, {series: values})
+        self.counters = []
+
+    def span(self, stage, request_id, start_ns, end_ns):
+        if len(self.spans) < self.max_spans:
+            self.spans.append((stage, request_id, start_ns, end_ns))
+        else:
+            self.dropped += 1
+
+    def sent(self, request_id, start_ns, end_ns):
+        if end_ns > start_ns:
+            self.span("send", request_id, start_ns, end_ns)
+        self._sent[request_id] = end_ns
+
+    def completed(self, request_id, completion_ns, picked_ns, stage="in_flight"):
+        """
+        Closes the in-flight span of a request answered (the callback
+        stamp) at completion_ns and picked up by the send loop at
+        picked_ns.
+        """
+        sent_ns = self._sent.pop(request_id, None)
+        if sent_ns is None:
+            return
+        self.span(stage, request_id, sent_ns, completion_ns)
+        if picked_ns > completion_ns:
+            self.span("completion_queue", request_id, completion_ns, picked_ns)
+
+    def add_process(self, label, spans):
+        self.processes.append((label, spans))
+
+    def add_counter(self, name, times_ns, series):
+        self.counters.append((name, np.asarray(times_ns), series))
+
+    def span_count(self):
+        return len(self.spans) + sum(len(spans) for _, spans in self.processes)
+
+    def write(self, filename, label="client"):
+        """
+        Writes the spans of this process (label) and of the added ones,
+        and the counter tracks, with timestamps relative to the earliest.
+        """
+        processes = [(label, self.spans)] + self.processes
+        starts = [min(span[2] for span in spans) for _, spans in processes if spans]
+        starts += [int(times[0]) for _, times, _ in self.counters if len(times)]
+        origin_ns = min(starts, default=0)
+
+        events = []
+        for pid, (process_label, spans) in enumerate(processes):
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                           "args": {"name": process_label}})
+            for stage, request_id, start_ns, end_ns in spans:
+                event = {"name": stage, "cat": "request", "id": str(request_id),
+                         "pid": pid, "tid": 0}
+                events.append(dict(event, ph="b", ts=(start_ns - origin_ns) / 1e3))
+                events.append(dict(event, ph="e", ts=(end_ns - origin_ns) / 1e3))
+        for name, times, series in self.counters:
+            names = list(series)
+            columns = [np.asarray(series[key], dtype=float) for key in names]
+            for i, t in enumerate(times):
+                events.append({"name": name, "ph": "C", "pid": 0, "tid": 0,
+                               "ts": (int(t) - origin_ns) / 1e3,
+                               "args": dict((key, float(column[i])) for key, column in zip(names, columns))})
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+
+
+def measure_idle_baseline(energy_meter, seconds):
+    """
+    Measures the mean power (mW) of every rail of energy_meter while the
+    client sends nothing. Returns {rail: mW}.
+    """
+    energy_meter.start_measuring()
+    time.sleep(seconds)
+    rail_energy = dict(energy_meter.rail_energy)
+    elapsed = energy_meter.time
+    energy_meter.stop_measuring()
+    if elapsed <= 0:
+        return dict.fromkeys(rail_energy, 0.0)
+    return dict((rail, energy / elapsed) for rail, energy in rail_energy.items())
+
+
+def integrate_energy(times, power):
+    """
+    Energy (mJ) of every column of power (mW) over the sample timestamps
+    times (ns), with the trapezoidal rule.
+    """
+    if len(times) < 2:
+        return np.zeros(power.shape[1:])
+    dt = np.diff(times) / 1e9
+    return (0.5 * (power[1:] + power[:-1]) * dt.reshape((-1,) + (1,) * (power.ndim - 1))).sum(axis=0)
+
+
+def attribute_energy(times, power, rails, baseline, spans):
+    """
+    Splits the dynamic energy (power above the idle baseline) of every rail
+    among the requests that were in flight when it was consumed.
+
+    times (ns) and power (mW, one column per rail) are the power samples,
+    baseline the idle power of every rail and spans a list of
+    (sent_ns, completed_ns, weight) of the requests, weight being their
+    batch size. The energy of each interval between two samples is shared
+    among the requests in flight at its midpoint in proportion to their
+    weight; energy consumed with no request in flight is unattributed.
+
+    Returns (per-request energy in mJ with one row per span and one column
+    per rail, unattributed energy per rail in mJ).
+    """
+    n_rails = len(rails)
+    if len(times) < 2 or not spans:
+        return np.zeros((len(spans), n_rails)), np.zeros(n_rails)
+
+    dynamic = power - np.array([baseline.get(rail, 0.0) for rail in rails])
+    dt = np.diff(times) / 1e9
+    interval_energy = 0.5 * (dynamic[1:] + dynamic[:-1]) * dt[:, None]
+    midpoints = (times[1:] + times[:-1]) // 2
+
+    # Timestamps stay int64: as float64 they lose nanoseconds once the
+    # monotonic clock passes 2**53 ns
+    starts = np.array([span[0] for span in spans], dtype=np.int64)
+    ends = np.array([span[1] for span in spans], dtype=np.int64)
+    weights = np.array([span[2] for span in spans], dtype=np.float64)
+
+    # Total weight in flight at every midpoint: requests started minus
+    # requests finished before it.
+    start_order = np.argsort(starts)
+    end_order = np.argsort(ends)
+    started = np.concatenate(([0.0], np.cumsum(weights[start_order])))
+    finished = np.concatenate(([0.0], np.cumsum(weights[end_order])))
+    in_flight = (started[np.searchsorted(starts[start_order], midpoints, side="right")]
+                 - finished[np.searchsorted(ends[end_order], midpoints, side="right")])
+
+    busy = in_flight > 1e-9
+    density = np.zeros_like(interval_energy)
+    density[busy] = interval_energy[busy] / in_flight[busy, None]
+    unattributed = interval_energy[~busy].sum(axis=0)
+
+    # Energy per unit of weight accumulated up to every midpoint; each
+    # request gets its weight times the accumulation over its lifetime.
+    cumulative = np.vstack((np.zeros(n_rails), np.cumsum(density, axis=0)))
+    first = np.searchsorted(midpoints, starts, side="left")
+    last = np.searchsorted(midpoints, ends, side="left")
+    per_request = weights[:, None] * (cumulative[last] - cumulative[first])
+    return per_request, unattributed
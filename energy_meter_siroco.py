@@ -1,94 +1,255 @@
+import glob
+import json
+import os
+import sys
+import tempfile
 import threading
 import time
-from queue import Queue
+
+import numpy as np
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'power_sensors.json')
+
+def load_sensor_map(device, config=None):
+	"""
+	Returns the rails of device as {rail: {'current': path, 'voltage': path}}
+	from the JSON sensor map config (power_sensors.json by default). Paths
+	are relative to the sysfs root.
+	"""
+	with open(config or DEFAULT_CONFIG, 'r') as f:
+		devices = json.load(f)
+	if device not in devices:
+		raise Exception("Device not supported: {}".format(device))
+	return devices[device]
+
+def resolve_sensor(sysfs_root, path):
+	"""
+	Path of a sensor file under sysfs_root, or None if it does not exist.
+	Paths can contain wildcards (hwmon/hwmon*/ : the hwmon index of a chip
+	depends on the probe order).
+	"""
+	matches = sorted(glob.glob(os.path.join(sysfs_root, path)))
+	return matches[0] if matches else None
 
 class EnergyMeter(threading.Thread):
-	def __init__(self, device, sleep_time, mode, descartes):
+	"""
+	Samples the INA3221 power rails of a device in a background thread and
+	integrates the energy (mJ) of every rail while measuring.
+
+	All rails are read in one pass, each with its own current and voltage
+	channel. Every sample is stamped with time.monotonic_ns() and stored in
+	a preallocated ring buffer, and energy is integrated with the
+	trapezoidal rule over the real sample timestamps, so scheduler jitter
+	does not turn into energy error. Sensors are read with os.pread() on
+	raw file descriptors. While not measuring, the thread blocks on an
+	event.
+
+	total_energy is the energy of the `mode` rail; rail_energy holds every
+	rail. The sensor paths come from the config file and are resolved under
+	sysfs_root, which allows pointing the meter at a fake sysfs tree. A
+	rail whose files do not exist (other than `mode`) is listed in
+	unavailable and its power and energy are NaN, so it is never mistaken
+	for a rail drawing nothing.
+	"""
+
+	def __init__(self, device, sleep_time, mode, descartes, sysfs_root='/sys', capacity=1 << 16, config=None):
 		self.device = device
 		self.sleep_time = float(sleep_time / 1000.0)
+		self.period_ns = int(sleep_time * 1e6)
 		self.mode = mode
-		self.queue = Queue()
 		self.total_energy = 0.0
 		self.COUNTER = 0
 		self.time = 0.0
 		self.steps = 0
-		self.sensors = dict()
+		# Samples discarded after every start_measuring()
 		self.descartes = descartes
-		if self.device == 'orin':
-			# GPU
-			self.sensors['GPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr1_input', 'r')
-			self.sensors['VGPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/in1_input', 'r')
-			# CPU
-			self.sensors['CPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr2_input', 'r')
-			# SoC - GPU - CPU (rest of SoC components)
-			self.sensors['SOC'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr3_input', 'r')
-			# Computer Vision modules + Deep Learning Accelerators
-			self.sensors['CV'] = open('/sys/bus/i2c/drivers/ina3221/1-0041/hwmon/hwmon1/curr1_input', 'r')
-			# Memory
-			self.sensors['VDDRQ'] = open('/sys/bus/i2c/drivers/ina3221/1-0041/hwmon/hwmon1/curr2_input', 'r')
-			# Other components of the board (eMMC, video, audio, etc)
-			self.sensors['SYS5V'] = open('/sys/bus/i2c/drivers/ina3221/1-0041/hwmon/hwmon1/curr3_input', 'r')   
-		elif self.device == 'orin2':
-			# GPU
-			self.sensors['GPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr1_input', 'r')
-			self.sensors['VGPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/in1_input', 'r')
-    		# CPU
-			self.sensors['CPU'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr2_input', 'r')
-			# SoC - GPU - CPU (rest of SoC components)
-			self.sensors['SOC'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr3_input', 'r')
-			# Computer Vision modules + Deep Learning Accelerators
-			self.sensors['CV'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr1_input', 'r')
-            # Memory
-			self.sensors['VDDRQ'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr2_input', 'r')
-            # Other components of the board (eMMC, video, audio, etc)
-			self.sensors['SYS5V'] = open('/sys/bus/i2c/drivers/ina3221/1-0040/hwmon/hwmon1/curr3_input', 'r')
-		else:
-			print("Device not supported\n")
-			return
+		self.sysfs_root = sysfs_root
+
+		sensor_map = load_sensor_map(device, config)
+		if mode not in sensor_map:
+			raise Exception("Rail {} not available in {}".format(mode, device))
+		self.rails = list(sensor_map)
+		self.mode_index = self.rails.index(mode)
+		# rail -> (current fd, voltage fd), None if unavailable
+		self.sensors = dict()
+		self.unavailable = []
+		for rail in self.rails:
+			paths = [resolve_sensor(sysfs_root, sensor_map[rail][kind]) for kind in ('current', 'voltage')]
+			if None in paths:
+				if rail == mode:
+					raise Exception("Sensor files of rail {} not found under {}".format(rail, sysfs_root))
+				self.unavailable.append(rail)
+				self.sensors[rail] = None
+				continue
+			self.sensors[rail] = tuple(os.open(path, os.O_RDONLY) for path in paths)
+		self.rail_energy = dict.fromkeys(self.rails, 0.0)
+		self._energy = np.zeros(len(self.rails))
+
+		# Ring buffer of timestamps (ns) and power (mW) of every rail
+		self.capacity = capacity
+		self.sample_times = np.zeros(capacity, dtype=np.int64)
+		self.sample_power = np.zeros((capacity, len(self.rails)), dtype=np.float64)
+		self.sample_count = 0
+		self._power = np.zeros(len(self.rails))
+		self._last_t = None
+		self._last_p = np.zeros(len(self.rails))
+		self._discard = 0
+		self._lock = threading.Lock()
 
 		# Launch threads.
 		self.measuring = False
 		self.executing = True
+		self._wake = threading.Event()
 		threading.Thread.__init__(self)
+		self.daemon = True
+
+	def sample(self):
+		"""
+		Takes one power sample of every rail, stores it and adds the energy
+		of the interval since the previous sample.
+		"""
+		power = self._power
+		for i, rail in enumerate(self.rails):
+			fds = self.sensors[rail]
+			if fds is None:
+				power[i] = np.nan
+				continue
+			power[i] = int(os.pread(fds[0], 32, 0)) * int(os.pread(fds[1], 32, 0)) / 1000.0
+		t = time.monotonic_ns()
+		with self._lock:
+			if not self.measuring:
+				return
+			if self._discard > 0:
+				self._discard -= 1
+				return
+			index = self.sample_count % self.capacity
+			self.sample_times[index] = t
+			self.sample_power[index] = power
+			self.sample_count += 1
+			if self._last_t is not None:
+				dt = (t - self._last_t) / 1e9
+				self._energy += 0.5 * (power + self._last_p) * dt
+				self.total_energy = float(self._energy[self.mode_index])
+				for i, rail in enumerate(self.rails):
+					self.rail_energy[rail] = float(self._energy[i])
+				self.time += dt
+			self._last_t = t
+			self._last_p[:] = power
+			self.steps += 1
 
 	def run(self):
 		while self.executing:
+			# Block until start_measuring() or finish()
+			self._wake.wait()
+			next_t = time.monotonic_ns()
 			while self.measuring:
-				t = time.time_ns()			
-				mA = float(self.sensors[self.mode].read().strip())
-				mV = float(self.sensors['VGPU'].read().strip())
-				self.total_energy = self.total_energy + (self.sleep_time * mA * mV/1000.0)
-				self.sensors[self.mode].seek(0)
-				self.sensors['VGPU'].seek(0)
-
-				time.sleep(max(self.sleep_time - ((time.time_ns() - t) / 1e9), 0))
-
-		#print((time.time_ns() - t) / (1000.0*1000.0*1000.0))
-				#time.sleep(self.sleep_time)
-			#time.sleep(self.sleep_time)
-
+				self.sample()
+				# Absolute schedule: a late wake-up does not shift the
+				# following samples, it only shortens the next sleep.
+				next_t += self.period_ns
+				delay = next_t - time.monotonic_ns()
+				if delay > 0:
+					time.sleep(delay / 1e9)
+				else:
+					next_t = time.monotonic_ns()
 
-	# def write_function(self):
-	# 	while self.measuring or not self.queue.empty():
-	# 		if not self.queue.empty():
-	# 			self.file.write(self.queue.get() + '\n')
+	def samples(self, start_ns=None, end_ns=None, rail=None):
+		"""
+		Returns (timestamps ns, power mW) of the stored samples, oldest
+		first, optionally restricted to [start_ns, end_ns]. power is the
+		`rail` column (the measured mode by default), or a matrix with one
+		column per rail in self.rails if rail is 'all'.
+		"""
+		with self._lock:
+			count = min(self.sample_count, self.capacity)
+			first = self.sample_count - count
+			order = (np.arange(first, self.sample_count) % self.capacity)
+			times = self.sample_times[order]
+			power = self.sample_power[order]
+		if rail != 'all':
+			power = power[:, self.rails.index(rail or self.mode)]
+		if start_ns is not None or end_ns is not None:
+			keep = np.ones(len(times), dtype=bool)
+			if start_ns is not None:
+				keep &= times >= start_ns
+			if end_ns is not None:
+				keep &= times <= end_ns
+			times, power = times[keep], power[keep]
+		return times, power
 
 	def start_measuring(self):
-		self.total_energy = 0.0
-		self.time = 0.0
-		self.measuring = True
+		with self._lock:
+			self.total_energy = 0.0
+			self._energy[:] = 0.0
+			self.rail_energy = dict.fromkeys(self.rails, 0.0)
+			self.time = 0.0
+			self.steps = 0
+			self.sample_count = 0
+			self._last_t = None
+			self._discard = self.descartes
+			self.measuring = True
+		self._wake.set()
 
 	def stop_measuring(self):
 		self.measuring = False
+		self._wake.clear()
 
 	def finish(self):
 		self.measuring = False
 		self.executing = False
+		self._wake.set()
 		self.join()
+		for fds in self.sensors.values():
+			for fd in fds or ():
+				os.close(fd)
+
+
+def create_fake_sysfs(root, device='orin2', current=1000, voltage=5000, config=None):
+	"""
+	Creates the sensor files of device under root. current (mA) and
+	voltage (mV) are either one value for every rail or a dict per rail.
+	Returns the paths of the files as {rail: (current path, voltage path)}.
+	"""
+	files = dict()
+	for rail, paths in load_sensor_map(device, config).items():
+		rail_current = current[rail] if isinstance(current, dict) else current
+		rail_voltage = voltage[rail] if isinstance(voltage, dict) else voltage
+		files[rail] = []
+		for kind, value in (('current', rail_current), ('voltage', rail_voltage)):
+			# Wildcards (the hwmon index) are created as 1
+			path = os.path.join(root, paths[kind].replace('*', '1'))
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with open(path, 'w') as f:
+				f.write('{}\n'.format(value))
+			files[rail].append(path)
+	return files
+
 
 if __name__ == '__main__':
-    measurer = EnergyMeter('xavier', 100, 'GPU', '/tmp/', 'prueba.txt')
-    measurer.start()
-    time.sleep(5)
-    measurer.finish()
-    print(measurer.total_energy)
+	# Self-check against a fake sysfs tree with constant rails: the measured
+	# energy of every rail must be its power x the wall-clock measuring time.
+	seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+	device = sys.argv[2] if len(sys.argv) > 2 else 'orin'
+	root = tempfile.mkdtemp()
+	rails = list(load_sensor_map(device))
+	currents = dict((rail, 500 * (i + 1)) for i, rail in enumerate(rails))
+	create_fake_sysfs(root, device, currents, 5000)
+	measurer = EnergyMeter(device, 2, 'GPU', 0, sysfs_root=root)
+	measurer.start()
+	cpu_start = time.process_time()
+	wall_start = time.monotonic()
+	measurer.start_measuring()
+	time.sleep(seconds)
+	measurer.stop_measuring()
+	wall = time.monotonic() - wall_start
+	cpu = time.process_time() - cpu_start
+	# Idle phase: the thread must not consume CPU
+	idle_start = time.process_time()
+	time.sleep(1.0)
+	idle_cpu = time.process_time() - idle_start
+	measurer.finish()
+	print("Samples=", measurer.steps, "Measured_time(s)=", round(measurer.time, 4),
+		  "Meter_CPU(%)=", round(100.0 * cpu / seconds, 2), "Idle_CPU(%)=", round(100.0 * idle_cpu, 2))
+	for rail in rails:
+		print("   ", rail, "Energy(mJ)=", round(measurer.rail_energy[rail], 3),
+			  "Expected(mJ)=", round(currents[rail] * 5.0 * wall, 3))
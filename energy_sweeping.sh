@@ -1,6 +1,6 @@
 #/bin/bash
 
-for b in 1 4 8 12 16 20 24 28 32
-do
-	python 3DGait_client_ver2.py -m 3D_best_0_batchd -a -b $b -conc 8 -iter 300 
-done
+# The whole batch sweep runs in one process, reusing the client, the
+# server connection and the energy meter. Results go to a single CSV and
+# cover the last 3 windows of 100 iterations once they are stable.
+python 3DGait_client_ver2.py -m 3D_best_0_batchd -a -conc 8 -iter 100 --stability-windows 3 --sweep-batch 1,4,8,12,16,20,24,28,32 --sweep-output energy_3D_best_0_batchd.csv
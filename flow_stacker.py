@@ -0,0 +1,139 @@
+"""
+Sliding window of optical-flow frames of one tracked person.
+
+    python flow_stacker.py -f 25 -n 2000
+
+compares the CPU time per new window of rebuilding the stack from the
+last frames with pushing one frame into the FlowStacker.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+class FlowStacker:
+    """
+    Keeps the last `frames` optical-flow frames (h, w, 2) of a track and
+    exposes them as one model input sample, in the layout and dtype of
+    the model:
+
+    - (frames, h, w, c): frames stacked along the first axis (3D model)
+    - (frames * c, h, w): the channels of every frame stacked, oldest
+      frame first (2D model)
+    - (c, frames, h, w): channels first, time second
+
+    Frames go into a ring buffer of twice the window length and every
+    frame is written at i and i + frames, so the current window is always
+    one contiguous slice of it: push() copies one frame (twice) and
+    window() returns a view, with no copy for the first two layouts. The
+    view is valid until the next push; the only full copy of the window
+    is the one that packs it into the request batch.
+
+    With stride k a window is ready every k frames once the first one is
+    complete.
+    """
+
+    def __init__(self, sample_shape, dtype, frames=25, stride=1):
+        sample_shape = tuple(sample_shape)
+        self.sample_shape = sample_shape
+        self.frames = frames
+        self.stride = max(stride, 1)
+        if len(sample_shape) == 4 and sample_shape[0] == frames:
+            self.layout = "thwc"
+            self.frame_shape = sample_shape[1:]
+            stored_shape = self.frame_shape
+        elif len(sample_shape) == 4 and sample_shape[1] == frames:
+            self.layout = "cthw"
+            self.frame_shape = sample_shape[2:] + sample_shape[:1]
+            stored_shape = sample_shape[:1] + sample_shape[2:]
+        elif len(sample_shape) == 3 and sample_shape[0] % frames == 0:
+            self.layout = "tchw"
+            self.frame_shape = sample_shape[1:] + (sample_shape[0] // frames,)
+            stored_shape = (sample_shape[0] // frames,) + sample_shape[1:]
+        else:
+            raise Exception("Cannot stack {} frames into input samples of shape {}".format(
+                frames, sample_shape))
+        self.ring = np.zeros((2 * frames,) + stored_shape, dtype=dtype)
+        self.position = 0
+        self.count = 0
+
+    def push(self, frame):
+        """
+        Adds one (h, w, c) frame. Returns True if a window is ready.
+        """
+        if self.layout != "thwc":
+            frame = frame.transpose(2, 0, 1)
+        self.ring[self.position] = frame
+        self.ring[self.position + self.frames] = frame
+        self.position = (self.position + 1) % self.frames
+        self.count += 1
+        return self.ready()
+
+    def ready(self):
+        return self.count >= self.frames and (self.count - self.frames) % self.stride == 0
+
+    def window(self):
+        """
+        The last `frames` frames, oldest first, as a sample of the model
+        input shape.
+        """
+        view = self.ring[self.position:self.position + self.frames]
+        if self.layout == "thwc":
+            return view
+        if self.layout == "tchw":
+            return view.reshape(self.sample_shape)
+        return view.transpose(1, 0, 2, 3)
+
+    def split(self, sample):
+        """
+        The (frames, h, w, c) frames of a sample in the model layout, e.g.
+        to replay a recorded window frame by frame.
+        """
+        if self.layout == "thwc":
+            return sample
+        if self.layout == "tchw":
+            return sample.reshape((self.frames, self.frame_shape[2]) + self.frame_shape[:2]).transpose(0, 2, 3, 1)
+        return sample.transpose(1, 2, 3, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--frames", type=int, default=25,
+                        help="Frames per window. Default is 25.")
+    parser.add_argument("-n", "--iterations", type=int, default=1000,
+                        help="Windows built per measurement. Default is 1000.")
+    parser.add_argument("--shape", type=str, default="25x60x60x2",
+                        help="Model input sample shape. Default is 25x60x60x2.")
+    FLAGS = parser.parse_args()
+
+    sample_shape = tuple(int(d) for d in FLAGS.shape.split("x"))
+    stacker = FlowStacker(sample_shape, np.float32, FLAGS.frames)
+    frames = np.random.rand(FLAGS.iterations + FLAGS.frames, *stacker.frame_shape).astype(np.float32)
+    batch = np.empty((1,) + sample_shape, dtype=np.float32)
+
+    def to_layout(window):
+        if stacker.layout == "tchw":
+            return window.transpose(0, 3, 1, 2).reshape(sample_shape)
+        if stacker.layout == "cthw":
+            return window.transpose(3, 0, 1, 2)
+        return window
+
+    # Rebuilding: stack the last frames into a new window for every frame
+    start = time.process_time_ns()
+    for i in range(FLAGS.iterations):
+        batch[0] = to_layout(np.stack(frames[i:i + FLAGS.frames]))
+    rebuild = (time.process_time_ns() - start) / FLAGS.iterations / 1000.0
+
+    for frame in frames[:FLAGS.frames]:
+        stacker.push(frame)
+    start = time.process_time_ns()
+    for frame in frames[FLAGS.frames:]:
+        stacker.push(frame)
+        batch[0] = stacker.window()
+    incremental = (time.process_time_ns() - start) / FLAGS.iterations / 1000.0
+
+    print("Layout=", stacker.layout, "Rebuild(us)=", round(rebuild, 1),
+          "Incremental(us)=", round(incremental, 1),
+          "Saving(%)=", round(100.0 * (rebuild - incremental) / rebuild, 1))
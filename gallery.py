@@ -0,0 +1,188 @@
+"""
+Identification of gait signatures against a gallery of enrolled people.
+
+    python gallery.py -n 50000 -d 128 -b 32
+
+benchmarks exact and approximate (--nlist, --nprobe) top-k matching of
+batches of random embeddings against a random gallery, with the recall
+of the approximate index.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def normalize(embeddings):
+    """
+    Rows of embeddings scaled to unit L2 norm, as float32.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """
+    Columns and values of the k highest scores of every row, best first.
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-values, axis=1)
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+class Gallery:
+    """
+    Embeddings of the enrolled people held as one contiguous (N, D)
+    float32 matrix of unit rows, with the identity of every row.
+
+    match() scores a whole batch of query embeddings with a single matrix
+    product (cosine similarity) and keeps the k best identities of each.
+    With an index built (build_index), only the rows of the nprobe
+    clusters closest to the batch queries are scored.
+    """
+
+    def __init__(self, embeddings, labels=None):
+        self.embeddings = np.ascontiguousarray(normalize(embeddings))
+        if labels is None:
+            labels = np.arange(len(self.embeddings))
+        self.labels = np.asarray(labels)
+        self.index = None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a .npz with 'embeddings' (and optionally 'labels') arrays,
+        or a .npy of embeddings whose identities are the row numbers.
+        """
+        data = np.load(path)
+        if isinstance(data, np.ndarray):
+            return cls(data)
+        return cls(data["embeddings"], data["labels"] if "labels" in data else None)
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @property
+    def dimension(self):
+        return self.embeddings.shape[1]
+
+    def build_index(self, nlist, nprobe, iterations=10, seed=0):
+        """
+        Builds an inverted-file index: k-means on the gallery into nlist
+        clusters, whose rows are stored contiguously.
+        """
+        self.index = ClusterIndex(self.embeddings, nlist, nprobe, iterations, seed)
+
+    def match(self, embeddings, k=1):
+        """
+        Top-k identification of a batch of embeddings (B, D), or of one
+        embedding. Returns (labels, scores), both (B, k), best first.
+        """
+        queries = normalize(np.reshape(embeddings, (-1, self.dimension)))
+        if self.index is not None:
+            rows, scores = self.index.search(queries, k)
+        else:
+            rows, scores = top_k(queries @ self.embeddings.T, k)
+        return self.labels[rows], scores
+
+
+class ClusterIndex:
+    """
+    Inverted-file approximate index. The gallery rows are reordered so
+    that every cluster is one slice; a batch is scored against the
+    centroids first, and then every probed cluster against the queries
+    whose nprobe best clusters include it.
+    """
+
+    def __init__(self, embeddings, nlist, nprobe, iterations=10, seed=0):
+        nlist = max(1, min(nlist, len(embeddings)))
+        self.nprobe = max(1, min(nprobe, nlist))
+        rng = np.random.default_rng(seed)
+        centroids = embeddings[rng.choice(len(embeddings), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(embeddings @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, embeddings)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+        assignment = np.argmax(embeddings @ centroids.T, axis=1)
+        self.centroids = centroids
+        # Gallery row of every reordered row, and the slice of each cluster
+        self.order = np.argsort(assignment, kind="stable")
+        self.vectors = np.ascontiguousarray(embeddings[self.order])
+        counts = np.bincount(assignment, minlength=nlist)
+        self.bounds = np.concatenate(([0], np.cumsum(counts)))
+
+    def search(self, queries, k):
+        probes = top_k(queries @ self.centroids.T, self.nprobe)[0]
+        clusters = np.unique(probes)
+        sizes = self.bounds[clusters + 1] - self.bounds[clusters]
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        # Scores of every query against the union of the probed clusters;
+        # each cluster is only scored against the queries that probed it
+        scores = np.full((len(queries), offsets[-1]), -np.inf, dtype=np.float32)
+        for i, cluster in enumerate(clusters):
+            probing = np.flatnonzero((probes == cluster).any(axis=1))
+            vectors = self.vectors[self.bounds[cluster]:self.bounds[cluster + 1]]
+            scores[probing, offsets[i]:offsets[i + 1]] = queries[probing] @ vectors.T
+        rows = np.concatenate([np.arange(self.bounds[c], self.bounds[c + 1]) for c in clusters])
+        columns, values = top_k(scores, k)
+        return self.order[rows[columns]], values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--people", type=int, default=50000,
+                        help="Enrolled people in the gallery. Default is 50000.")
+    parser.add_argument("-d", "--dimension", type=int, default=128,
+                        help="Embedding size. Default is 128.")
+    parser.add_argument("-b", "--batch-size", type=int, default=32,
+                        help="Queries per batch. Default is 32.")
+    parser.add_argument("-k", "--top-k", type=int, default=5,
+                        help="Identities returned per query. Default is 5.")
+    parser.add_argument("--nlist", type=int, default=256,
+                        help="Clusters of the approximate index. Default is 256.")
+    parser.add_argument("--nprobe", type=int, default=16,
+                        help="Clusters searched per query. Default is 16.")
+    parser.add_argument("--batches", type=int, default=50,
+                        help="Batches per measurement. Default is 50.")
+    FLAGS = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery = Gallery(rng.standard_normal((FLAGS.people, FLAGS.dimension)))
+    # Queries are noisy versions of enrolled signatures
+    truth = rng.integers(0, FLAGS.people, (FLAGS.batches, FLAGS.batch_size))
+    queries = gallery.embeddings[truth] + 0.05 * rng.standard_normal(truth.shape + (FLAGS.dimension,))
+
+    def run():
+        found = []
+        start = time.monotonic_ns()
+        for batch in queries:
+            found.append(gallery.match(batch, FLAGS.top_k)[0])
+        return (time.monotonic_ns() - start) / FLAGS.batches / 1e6, np.array(found)
+
+    exact_ms, exact = run()
+    start = time.monotonic()
+    gallery.build_index(FLAGS.nlist, FLAGS.nprobe)
+    build_s = time.monotonic() - start
+    approximate_ms, approximate = run()
+
+    recall = np.mean([len(set(a) & set(e)) / float(len(e))
+                      for a, e in zip(approximate.reshape(-1, exact.shape[-1]),
+                                      exact.reshape(-1, exact.shape[-1]))])
+    print("People=", FLAGS.people, "Dimension=", FLAGS.dimension, "Batch=", FLAGS.batch_size,
+          "Top_k=", FLAGS.top_k)
+    print("    Exact", "Per_batch(ms)=", round(exact_ms, 3),
+          "Top1_accuracy=", round(float(np.mean(exact[..., 0] == truth)), 4))
+    print("    Index", "Nlist=", FLAGS.nlist, "Nprobe=", FLAGS.nprobe, "Build(s)=", round(build_s, 2),
+          "Per_batch(ms)=", round(approximate_ms, 3),
+          "Top1_accuracy=", round(float(np.mean(approximate[..., 0] == truth)), 4),
+          "Recall_at_k=", round(float(recall), 4))
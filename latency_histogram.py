@@ -0,0 +1,111 @@
+import math
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed (HDR-style) histogram of latencies in nanoseconds.
+
+    Values below 2**sub_bucket_bits are stored exactly. Above that, every
+    power of two is split in 2**(sub_bucket_bits - 1) linear sub-buckets,
+    so the relative error of any reported percentile is bounded by
+    2**-(sub_bucket_bits - 1) (0.8% with the default of 8 bits). Recording
+    a value is a handful of integer operations and one list increment.
+    """
+
+    def __init__(self, sub_bucket_bits=8, max_value_ns=600 * 10**9):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.max_value_ns = max_value_ns
+        self.counts = [0] * (self._index(max_value_ns) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total_count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return (
+            self.sub_bucket_count
+            + (shift - 1) * self.half_count
+            + (value >> shift)
+            - self.half_count
+        )
+
+    def _bucket_value(self, index):
+        # Highest value that falls into the bucket, so percentiles are
+        # never optimistic.
+        if index < self.sub_bucket_count:
+            return index
+        shift = (index - self.sub_bucket_count) // self.half_count + 1
+        mantissa = (index - self.sub_bucket_count) % self.half_count + self.half_count
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value_ns):
+        value_ns = int(value_ns)
+        if value_ns < 0:
+            value_ns = 0
+        elif value_ns > self.max_value_ns:
+            value_ns = self.max_value_ns
+        self.counts[self._index(value_ns)] += 1
+        self.total_count += 1
+        self.total_ns += value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def merge(self, other):
+        if other.sub_bucket_bits != self.sub_bucket_bits or len(other.counts) != len(self.counts):
+            raise Exception("cannot merge histograms with different bucket layouts")
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total_count += other.total_count
+        self.total_ns += other.total_ns
+        if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def percentile(self, p):
+        """
+        Value (ns) below or at which p percent of the samples fall.
+        """
+        if self.total_count == 0:
+            return 0
+        rank = max(1, int(math.ceil(p / 100.0 * self.total_count)))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._bucket_value(i), self.max_ns)
+        return self.max_ns
+
+    def mean(self):
+        if self.total_count == 0:
+            return 0.0
+        return self.total_ns / self.total_count
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        """
+        Returns a dict with count, mean, percentiles and max in milliseconds.
+        """
+        values = {"count": self.total_count, "mean": self.mean() / 1e6}
+        for p in percentiles:
+            values["p{:g}".format(p)] = self.percentile(p) / 1e6
+        values["max"] = self.max_ns / 1e6
+        return values
+
+    def format_summary(self):
+        s = self.summary()
+        return " ".join(
+            "{}={}".format(k, v if k == "count" else "{:.3f}".format(v))
+            for k, v in s.items()
+        )
@@ -0,0 +1,62 @@
+import threading
+
+
+class RequestPool:
+    """
+    Cache of prebuilt request objects keyed on (model, batch size, dtype).
+
+    Building a request means creating an InferInput, serializing the batch
+    into it with set_data_from_numpy (a full copy of the tensor) and
+    creating an InferRequestedOutput. The client only reads these objects
+    when a request is sent, so when the batch does not change during a run
+    they can be built once and reused by every request.
+
+    When the content does change (changed=True), each key keeps two sets of
+    objects used alternately: the new batch is serialized into the set that
+    was not handed out last, so a request still being encoded from the
+    previous batch is never modified underneath.
+    """
+
+    def __init__(self, client_module, input_name, output_name, class_count=0,
+                 double_buffered=False):
+        self.client_module = client_module
+        self.input_name = input_name
+        self.output_name = output_name
+        self.class_count = class_count
+        self.double_buffered = double_buffered
+        # key -> [current index, [(inputs, outputs), ...]]
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def _build(self, batch, dtype):
+        inputs = [self.client_module.InferInput(self.input_name, list(batch.shape), dtype)]
+        inputs[0].set_data_from_numpy(batch)
+        outputs = [self.client_module.InferRequestedOutput(self.output_name, class_count=self.class_count)]
+        self.builds += 1
+        return inputs, outputs
+
+    def get(self, model_name, batch, dtype, changed=False):
+        """
+        Returns (inputs, outputs) for batch. With changed=False the cached
+        objects for (model_name, batch size, dtype) are returned as they
+        are; with changed=True the batch is serialized again, into the back
+        buffer when double buffering is enabled.
+        """
+        key = (model_name, batch.shape[0], dtype)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [0, [self._build(batch, dtype)]]
+                if self.double_buffered:
+                    entry[1].append(self._build(batch, dtype))
+                self._entries[key] = entry
+                return entry[1][0]
+            if not changed:
+                self.hits += 1
+                return entry[1][entry[0]]
+            entry[0] = (entry[0] + 1) % len(entry[1])
+            inputs, outputs = entry[1][entry[0]]
+            inputs[0].set_data_from_numpy(batch)
+            return inputs, outputs
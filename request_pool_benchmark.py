@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the client CPU time spent on one request, with new
+request objects for every request (the old requestGenerator path) and
+with the RequestPool. Building the objects is measured alone; whole
+requests are sent through the public infer() API to a server (Triton or
+triton_standin_server.py), so the client CPU time includes encoding the
+request as the HTTP/gRPC clients do and parsing the response.
+
+    python request_pool_benchmark.py -i grpc -u localhost:8001 -n 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+import tritonclient.grpc as grpcclient
+import tritonclient.http as httpclient
+from tritonclient.utils import triton_to_np_dtype
+
+from request_pool import RequestPool
+
+
+def build_new(client, batch, dtype, input_name, output_name):
+    inputs = [client.InferInput(input_name, list(batch.shape), dtype)]
+    inputs[0].set_data_from_numpy(batch)
+    outputs = [client.InferRequestedOutput(output_name)]
+    return inputs, outputs
+
+
+def measure(fn, iterations):
+    """
+    Mean CPU time (us) of one call of fn.
+    """
+    fn()
+    start = time.process_time_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time_ns() - start) / iterations / 1000.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--protocol", type=str, default="HTTP",
+                        help="Protocol (HTTP/gRPC) used to send the requests. Default is HTTP.")
+    parser.add_argument("-u", "--url", type=str, default="localhost:8000",
+                        help="Inference server URL. Default is localhost:8000.")
+    parser.add_argument("-m", "--model-name", type=str, default="3D_best_0_batchd",
+                        help="Name of the model. Default is 3D_best_0_batchd.")
+    parser.add_argument("-n", "--iterations", type=int, default=100,
+                        help="Requests built per measurement. Default is 100.")
+    FLAGS = parser.parse_args()
+
+    protocol = FLAGS.protocol.lower()
+    client = grpcclient if protocol == "grpc" else httpclient
+    triton_client = client.InferenceServerClient(url=FLAGS.url)
+    if protocol == "grpc":
+        metadata = triton_client.get_model_metadata(FLAGS.model_name, as_json=True)
+    else:
+        metadata = triton_client.get_model_metadata(FLAGS.model_name)
+    model_name = FLAGS.model_name
+    input_name = metadata["inputs"][0]["name"]
+    dtype = metadata["inputs"][0]["datatype"]
+    sample_shape = [int(d) for d in metadata["inputs"][0]["shape"][1:]]
+    output_name = metadata["outputs"][0]["name"]
+
+    def infer(inputs, outputs):
+        triton_client.infer(model_name, inputs, outputs=outputs)
+
+    print("Batch", "New_build(us)", "Pool_build(us)", "New_request(us)",
+          "Pool_request(us)", "Double_buffered_request(us)", "Saving_per_request(us)")
+    for b in [1, 4, 8, 16, 32]:
+        batch = np.random.rand(b, *sample_shape).astype(triton_to_np_dtype(dtype))
+        pool = RequestPool(client, input_name, output_name)
+        double = RequestPool(client, input_name, output_name, double_buffered=True)
+
+        new_build = measure(
+            lambda: build_new(client, batch, dtype, input_name, output_name), FLAGS.iterations)
+        pool_build = measure(lambda: pool.get(model_name, batch, dtype), FLAGS.iterations)
+        new_request = measure(
+            lambda: infer(*build_new(client, batch, dtype, input_name, output_name)),
+            FLAGS.iterations)
+        pool_request = measure(
+            lambda: infer(*pool.get(model_name, batch, dtype)), FLAGS.iterations)
+        double_request = measure(
+            lambda: infer(*double.get(model_name, batch, dtype, changed=True)), FLAGS.iterations)
+        print(b, round(new_build, 1), round(pool_build, 1), round(new_request, 1),
+              round(pool_request, 1), round(double_request, 1),
+              round(new_request - pool_request, 1))
+    triton_client.close()
@@ -0,0 +1,60 @@
+import numpy as np
+from tritonclient.utils import InferenceServerException, triton_to_np_dtype
+
+
+class ResultSink:
+    """
+    Consumes inference results as they complete instead of keeping them
+    until the end of the run, so the client memory does not grow with the
+    number of requests (and neither do the GC pauses).
+
+    Every result is checked to carry the requested output with the
+    expected number of values per sample (class_count labels with
+    classification, the output sample otherwise); a malformed response
+    raises. With decode, the raw output of the batch is copied into one
+    array preallocated for max_batch_size samples, as a consumer of the
+    embeddings would. The result is not referenced afterwards.
+
+    Results whose outputs live in shared memory have no payload in the
+    response and are only counted.
+    """
+
+    def __init__(self, output_name, output_sample_shape, output_dtype, max_batch_size,
+                 class_count=0, decode=False, validate=True, shared_memory=False):
+        self.output_name = output_name
+        self.batched = max_batch_size > 0
+        self.class_count = class_count
+        self.decode = decode and class_count == 0 and not shared_memory
+        self.validate = validate and not shared_memory
+        self.sample_values = class_count if class_count > 0 else int(np.prod(output_sample_shape))
+        self.output = None
+        if self.decode:
+            self.output = np.empty(
+                [max(max_batch_size, 1)] + list(output_sample_shape),
+                dtype=triton_to_np_dtype(output_dtype))
+        self.consumed = 0
+
+    def _shape(self, result):
+        output = result.get_output(self.output_name)
+        if output is None:
+            raise InferenceServerException(
+                "response has no output '{}'".format(self.output_name))
+        if isinstance(output, dict):
+            return output["shape"]
+        return output.shape
+
+    def consume(self, result):
+        self.consumed += 1
+        if self.validate:
+            shape = [int(d) for d in self._shape(result)]
+            values = int(np.prod(shape[1:] if self.batched else shape))
+            if values != self.sample_values:
+                raise InferenceServerException(
+                    "output '{}' has shape {}, expected {} values per sample".format(
+                        self.output_name, shape, self.sample_values))
+        if self.decode:
+            array = result.as_numpy(self.output_name)
+            if not self.batched:
+                array = array[np.newaxis]
+            count = array.shape[0]
+            np.copyto(self.output[:count], array.reshape((count,) + self.output.shape[1:]))
@@ -0,0 +1,226 @@
+"""
+Real input samples for the client: optical-flow windows stored as .npy
+files, memory-mapped and assembled into batches in a background thread.
+
+    python sample_dataset.py windows/ -b 32 -n 500
+
+benchmarks the loader alone (batches/s and GB/s) with the sample shape
+of the data, to check that it can feed the requests faster than Triton
+answers them.
+"""
+
+import argparse
+import mmap
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class SampleDataset:
+    """
+    Samples of one shape read through np.load(mmap_mode="r"), from a
+    single packed .npy array of shape (N,) + sample_shape or from a
+    directory of .npy files, each holding either one sample or a stack of
+    samples. Nothing is read until a batch touches it.
+
+    A batch of consecutive samples that lie in one file and already have
+    the requested dtype is returned as a view of the mapping (zero copy);
+    any other batch is gathered into the caller's buffer.
+    """
+
+    def __init__(self, path, sample_shape=None, dtype=None):
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                           if name.endswith(".npy"))
+        else:
+            files = [path]
+        if not files:
+            raise Exception("No .npy samples in {}".format(path))
+        self.path = path
+        self.sample_shape = tuple(sample_shape) if sample_shape is not None else None
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        # (mapped array of shape (n,) + sample_shape, index of its first sample)
+        self.arrays = []
+        count = 0
+        for filename in files:
+            array = np.load(filename, mmap_mode="r")
+            if self.sample_shape is None:
+                self.sample_shape = array.shape[1:] if array.ndim > 1 else array.shape
+            if array.shape == self.sample_shape:
+                array = array[np.newaxis]
+            if array.shape[1:] != self.sample_shape:
+                raise Exception("{} has shape {}, expected samples of shape {}".format(
+                    filename, array.shape, self.sample_shape))
+            self.arrays.append((array, count))
+            count += array.shape[0]
+        self.starts = np.array([first for _, first in self.arrays])
+        self.count = count
+        if self.dtype is None:
+            self.dtype = self.arrays[0][0].dtype
+
+    def __len__(self):
+        return self.count
+
+    def _locate(self, index):
+        position = int(np.searchsorted(self.starts, index, side="right")) - 1
+        array, first = self.arrays[position]
+        return array, index - first
+
+    def sample(self, index):
+        array, offset = self._locate(index % self.count)
+        return array[offset]
+
+    def batch(self, start, batch_size, out=None):
+        """
+        Samples start, start + 1, ... (wrapping around the end) as one
+        batch: a view of the mapping when possible, else out (or a new
+        array) filled with them.
+        """
+        start %= self.count
+        array, offset = self._locate(start)
+        if offset + batch_size <= array.shape[0] and array.dtype == self.dtype:
+            return array[offset:offset + batch_size]
+        if out is None:
+            out = np.empty((batch_size,) + self.sample_shape, dtype=self.dtype)
+        filled = 0
+        while filled < batch_size:
+            array, offset = self._locate((start + filled) % self.count)
+            take = min(batch_size - filled, array.shape[0] - offset)
+            out[filled:filled + take] = array[offset:offset + take]
+            filled += take
+        return out[:batch_size]
+
+    def will_need(self, batch):
+        """
+        Asks the kernel to read ahead the pages of a batch that is a view
+        of the mapping, so the sender does not take the page faults.
+        """
+        base = batch
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        handle = getattr(base, "_mmap", None)
+        if handle is None or not hasattr(handle, "madvise"):
+            return
+        address = batch.__array_interface__["data"][0]
+        mapping = np.frombuffer(handle, dtype=np.uint8)
+        offset = address - mapping.__array_interface__["data"][0]
+        aligned = offset - offset % mmap.PAGESIZE
+        try:
+            handle.madvise(mmap.MADV_WILLNEED, aligned, offset - aligned + batch.nbytes)
+        except (OSError, ValueError):
+            pass
+
+
+class BatchPrefetcher(threading.Thread):
+    """
+    Produces the batches of a SampleDataset in order, cycling over it, in
+    a background thread that stays up to depth batches ahead of the
+    sender. Gathered batches are written into a ring of depth + 2
+    preallocated buffers: one being filled, depth queued and one handed
+    out, which the client has serialized by the time it asks for the
+    next batch.
+
+    With batch_size None, batches are single samples without a batch
+    dimension (models without batching). With an encoder (a WireEncoder),
+    every batch is converted to its wire datatype into the ring, in the
+    background thread as well.
+    """
+
+    def __init__(self, dataset, batch_size, depth=4, start=0, encoder=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.unbatched = batch_size is None
+        self.encoder = encoder
+        size = 1 if self.unbatched else batch_size
+        dtype = dataset.dtype if encoder is None else encoder.dtype
+        self.buffers = [np.empty((size,) + dataset.sample_shape, dtype=dtype)
+                        for _ in range(depth + 2)]
+        # Gathered FP32 batch, before it is encoded
+        self.staging = None
+        if encoder is not None:
+            self.staging = np.empty((size,) + dataset.sample_shape, dtype=dataset.dtype)
+        self.position = start % len(dataset)
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop_event = threading.Event()
+        # Batches the sender had to wait for
+        self.stalls = 0
+        self.produced = 0
+
+    def run(self):
+        size = 1 if self.unbatched else self.batch_size
+        slot = 0
+        while not self._stop_event.is_set():
+            if self.encoder is not None:
+                batch = self.encoder.encode(
+                    self.dataset.batch(self.position, size, self.staging), self.buffers[slot])
+            else:
+                batch = self.dataset.batch(self.position, size, self.buffers[slot])
+            if batch is self.buffers[slot] or batch.base is self.buffers[slot]:
+                slot = (slot + 1) % len(self.buffers)
+            else:
+                self.dataset.will_need(batch)
+            if self.unbatched:
+                batch = batch[0]
+            self.position = (self.position + size) % len(self.dataset)
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(batch, timeout=0.1)
+                    self.produced += 1
+                    break
+                except queue.Full:
+                    continue
+
+    def next(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            self.stalls += 1
+            return self._queue.get()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, help="Packed .npy array or directory of .npy samples.")
+    parser.add_argument("-b", "--batch-size", type=int, default=32,
+                        help="Batch size. Default is 32.")
+    parser.add_argument("-n", "--batches", type=int, default=200,
+                        help="Batches read per measurement. Default is 200.")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="Prefetch depth in batches. Default is 4.")
+    FLAGS = parser.parse_args()
+
+    dataset = SampleDataset(FLAGS.path)
+    batch_bytes = FLAGS.batch_size * int(np.prod(dataset.sample_shape)) * dataset.dtype.itemsize
+    print("Samples=", len(dataset), "Sample_shape=", dataset.sample_shape, "Dtype=", dataset.dtype,
+          "Batch(MB)=", round(batch_bytes / 1e6, 2))
+
+    # Batches as the sender sees them: serialized (tobytes is what
+    # set_data_from_numpy does) right after being handed out
+    start = time.monotonic()
+    out = np.empty((FLAGS.batch_size,) + dataset.sample_shape, dtype=dataset.dtype)
+    for i in range(FLAGS.batches):
+        dataset.batch(i * FLAGS.batch_size, FLAGS.batch_size, out).tobytes()
+    direct = time.monotonic() - start
+
+    prefetcher = BatchPrefetcher(dataset, FLAGS.batch_size, FLAGS.depth)
+    prefetcher.start()
+    start = time.monotonic()
+    for _ in range(FLAGS.batches):
+        prefetcher.next().tobytes()
+    prefetched = time.monotonic() - start
+    prefetcher.stop()
+
+    for name, seconds in (("Direct", direct), ("Prefetched", prefetched)):
+        print("   ", name, "Batches/s=", round(FLAGS.batches / seconds, 1),
+              "GB/s=", round(FLAGS.batches * batch_bytes / seconds / 1e9, 3),
+              "Per_batch(ms)=", round(1000.0 * seconds / FLAGS.batches, 3))
+    print("    Prefetch_stalls=", prefetcher.stalls)
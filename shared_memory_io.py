@@ -0,0 +1,131 @@
+import os
+import threading
+
+import numpy as np
+import tritonclient.utils.shared_memory as shm
+from tritonclient.utils import triton_to_np_dtype
+
+
+class SharedMemoryIO:
+    """
+    Input and output tensors of one model placed in Triton system shared
+    memory. The regions are registered once; every request then only
+    carries a reference (region, offset, size) to its slot instead of the
+    serialized tensor.
+
+    Each region is split in `slots` slots sized for max_batch_size samples,
+    one per request in flight, so concurrent requests never share a slot.
+    A slot is taken when the request is built and given back when it
+    completes (release is called from the completion path).
+    """
+
+    def __init__(self, triton_client, client_module, input_name, sample_shape,
+                 input_dtype, output_name, output_sample_shape, output_dtype,
+                 max_batch_size, slots, prefix="gait"):
+        self.triton_client = triton_client
+        self.client_module = client_module
+        self.input_name = input_name
+        self.sample_shape = tuple(sample_shape)
+        self.input_dtype = input_dtype
+        self.input_np_dtype = np.dtype(triton_to_np_dtype(input_dtype))
+        self.output_name = output_name
+        self.output_sample_shape = tuple(output_sample_shape)
+        self.output_np_dtype = np.dtype(triton_to_np_dtype(output_dtype))
+        self.max_batch_size = max(max_batch_size, 1)
+        self.slots = slots
+
+        self.input_slot_bytes = (
+            self.max_batch_size * int(np.prod(self.sample_shape)) * self.input_np_dtype.itemsize
+        )
+        self.output_slot_bytes = (
+            self.max_batch_size * int(np.prod(self.output_sample_shape)) * self.output_np_dtype.itemsize
+        )
+        # Region names and keys include the pid so several clients can
+        # share one server.
+        suffix = "{}_{}".format(prefix, os.getpid())
+        self.input_region = "input_" + suffix
+        self.output_region = "output_" + suffix
+        self.input_handle = shm.create_shared_memory_region(
+            self.input_region, "/" + self.input_region, self.input_slot_bytes * slots)
+        self.output_handle = shm.create_shared_memory_region(
+            self.output_region, "/" + self.output_region, self.output_slot_bytes * slots)
+
+        self._lock = threading.Lock()
+        self._free_slots = list(range(slots))
+        self._slot_of_request = {}
+        self._preloaded = None
+        self._registered = False
+
+    def register(self):
+        # Drop regions left behind by a previous run with the same pid
+        self.triton_client.unregister_system_shared_memory(self.input_region)
+        self.triton_client.unregister_system_shared_memory(self.output_region)
+        self.triton_client.register_system_shared_memory(
+            self.input_region, "/" + self.input_region, self.input_slot_bytes * self.slots)
+        self.triton_client.register_system_shared_memory(
+            self.output_region, "/" + self.output_region, self.output_slot_bytes * self.slots)
+        self._registered = True
+
+    def close(self):
+        if self._registered:
+            self.triton_client.unregister_system_shared_memory(self.input_region)
+            self.triton_client.unregister_system_shared_memory(self.output_region)
+            self._registered = False
+        shm.destroy_shared_memory_region(self.input_handle)
+        shm.destroy_shared_memory_region(self.output_handle)
+
+    def input_view(self, slot, batch_size):
+        """
+        Writable array mapped on the input slot, to build a batch in place.
+        """
+        return shm.get_contents_as_numpy(
+            self.input_handle, self.input_np_dtype,
+            (batch_size,) + self.sample_shape, offset=slot * self.input_slot_bytes)
+
+    def output_view(self, slot, batch_size):
+        return shm.get_contents_as_numpy(
+            self.output_handle, self.output_np_dtype,
+            (batch_size,) + self.output_sample_shape, offset=slot * self.output_slot_bytes)
+
+    def preload(self, batch):
+        """
+        Copies a batch that does not change during the run into every slot,
+        so requests built from it need no copy at all.
+        """
+        for slot in range(self.slots):
+            self.input_view(slot, batch.shape[0])[...] = batch
+        self._preloaded = batch
+
+    def acquire(self, request_id):
+        with self._lock:
+            if not self._free_slots:
+                raise Exception("no free shared memory slot, increase the number of slots")
+            slot = self._free_slots.pop()
+            self._slot_of_request[request_id] = slot
+        return slot
+
+    def release(self, request_id, completion_ns=None):
+        with self._lock:
+            slot = self._slot_of_request.pop(request_id, None)
+            if slot is not None:
+                self._free_slots.append(slot)
+
+    def request_tensors(self, request_id, batch):
+        """
+        Returns (inputs, outputs) of a request whose input and output live
+        in the slot acquired for request_id. batch is copied into the slot
+        unless it is the preloaded batch or already a view of the slot.
+        """
+        slot = self.acquire(request_id)
+        batch_size = batch.shape[0]
+        view = self.input_view(slot, batch_size)
+        if batch is not self._preloaded and not np.shares_memory(view, batch):
+            view[...] = batch
+
+        input_bytes = batch_size * int(np.prod(self.sample_shape)) * self.input_np_dtype.itemsize
+        output_bytes = batch_size * int(np.prod(self.output_sample_shape)) * self.output_np_dtype.itemsize
+        inputs = [self.client_module.InferInput(self.input_name, list(view.shape), self.input_dtype)]
+        inputs[0].set_shared_memory(self.input_region, input_bytes, offset=slot * self.input_slot_bytes)
+        outputs = [self.client_module.InferRequestedOutput(self.output_name)]
+        outputs[0].set_shared_memory(self.output_region, output_bytes, offset=slot * self.output_slot_bytes)
+        return inputs, outputs
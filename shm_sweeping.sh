@@ -0,0 +1,12 @@
+#!/bin/bash
+
+# Copy path vs system shared memory path across the batch sweep.
+# $1: model name, $2: concurrency
+for b in 1 4 8 12 16 20 24 28 32
+do
+	for sm in none system
+	do
+		echo "Shared_memory= $sm"
+		python 3DGait_client_ver2.py -m $1 -a -b $b -conc $2 -iter 300 -c 0 --shared-memory $sm
+	done
+done
@@ -0,0 +1,71 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the top of the repository, next to the client
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def standin(tmp_path_factory):
+    """
+    Stand-in server (HTTP and metrics only) with a small model, on free
+    ports. Yields (HTTP url, metrics url, sysfs root).
+    """
+    pytest.importorskip("gevent")
+    pytest.importorskip("tritonclient.http")
+    requests = pytest.importorskip("requests")
+    sysfs_root = str(tmp_path_factory.mktemp("sysfs"))
+    http_port, metrics_port = free_port(), free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "triton_standin_server.py"),
+         "--http-port", str(http_port), "--metrics-port", str(metrics_port), "--grpc-port", "0",
+         "--sysfs-root", sysfs_root, "--model", "small=4x16x16x2:16"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = "localhost:{}".format(http_port)
+    try:
+        for _ in range(100):
+            try:
+                if requests.get("http://{}/v2/health/ready".format(url), timeout=1).ok:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.1)
+        else:
+            pytest.fail("the stand-in server did not start")
+        yield url, "localhost:{}".format(metrics_port), sysfs_root
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@pytest.fixture
+def run_client(standin):
+    """
+    Runs the client against the stand-in with the given arguments and
+    returns its output.
+    """
+    url, metrics_url, sysfs_root = standin
+
+    def run(*args):
+        output = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "3DGait_client_ver2.py"), "-m", "small",
+             "-u", url, "--metrics-url", metrics_url, "--sysfs-root", sysfs_root,
+             "--idle-baseline", "0", "--warmup-iter", "5"] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, timeout=120)
+        assert output.returncode == 0, output.stdout
+        return output.stdout
+
+    return run
@@ -0,0 +1,64 @@
+import time
+
+from tritonclient.utils import InferenceServerException
+
+from admission import TIMEOUT_MESSAGE, AdmissionController, is_timeout
+
+MS = 1000000
+
+
+def test_admit_passes_the_remaining_budget():
+    admission = AdmissionController(10 * MS)
+    assert admission.admit(0, 4 * MS, count=3) == 6000
+    assert admission.counts() == (3, 0, 0, 0, 0)
+    # Never a zero timeout, which Triton reads as no timeout
+    assert admission.timeout_us(0, 10 * MS - 10) == 1
+
+
+def test_admit_sheds_on_the_prediction():
+    admission = AdmissionController(10 * MS, alpha=0.5)
+    admission.completed(0, 0, 8 * MS, 1)
+    assert admission.predicted_ns == 8 * MS
+    assert admission.admit(0, 1 * MS) == 9000
+    assert admission.admit(0, 3 * MS, count=2) is None
+    assert admission.shed == 2
+    # Every shed decays the prediction until requests are admitted again
+    assert admission.predicted_ns == 4 * MS
+    assert admission.admit(0, 3 * MS) == 7000
+
+
+def test_admit_now_applies_the_prediction_to_the_time_left():
+    admission = AdmissionController(10 * MS)
+    origin_ns = time.monotonic_ns()
+    timeout_us = admission.admit_now(origin_ns, count=2)
+    assert 0 < timeout_us <= 10000
+    assert admission.admitted == 2
+
+    admission.completed(0, 0, 20 * MS, 1)
+    assert admission.admit_now(time.monotonic_ns()) is None
+    assert admission.shed == 1
+    assert admission.admitted == 2
+
+
+def test_admit_now_from_a_spent_origin_is_shed():
+    admission = AdmissionController(10 * MS)
+    assert admission.admit_now(time.monotonic_ns() - 11 * MS) is None
+
+
+def test_completed_counts_on_time_and_late_inferences():
+    admission = AdmissionController(10 * MS)
+    admission.completed(1 * MS, 0, 9 * MS, 4)
+    admission.completed(1 * MS, 0, 12 * MS, 2)
+    admission.record_expired(3)
+    assert admission.counts() == (0, 0, 3, 4, 2)
+    assert admission.slack.total_count == 1
+
+
+def test_is_timeout():
+    # As tritonclient raises it for Triton's UNAVAILABLE answer
+    assert is_timeout(InferenceServerException(TIMEOUT_MESSAGE, status="StatusCode.UNAVAILABLE"))
+    assert is_timeout(InferenceServerException(TIMEOUT_MESSAGE + "\n", status="503"))
+    assert is_timeout(RuntimeError(TIMEOUT_MESSAGE))
+    assert not is_timeout(InferenceServerException("Deadline Exceeded", status="StatusCode.DEADLINE_EXCEEDED"))
+    assert not is_timeout(InferenceServerException(None))
+    assert not is_timeout(TimeoutError("timed out"))
@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from arrival_schedule import (constant_intervals, make_intervals, poisson_intervals, read_trace,
+                              split_intervals, trace_intervals, trace_rate)
+
+
+def take(intervals, count):
+    return list(itertools.islice(intervals, count))
+
+
+def test_constant_intervals():
+    assert take(constant_intervals(200), 3) == [5 * 10**6] * 3
+
+
+def test_poisson_intervals_mean_and_seed():
+    intervals = np.array(take(poisson_intervals(100, seed=1), 20000))
+    # Mean 10 ms, and exponential: the standard deviation equals the mean
+    assert intervals.mean() == pytest.approx(1e7, rel=0.03)
+    assert intervals.std() == pytest.approx(1e7, rel=0.05)
+    assert take(poisson_intervals(100, seed=1), 5) == list(intervals[:5])
+    assert take(poisson_intervals(100, seed=2), 5) != list(intervals[:5])
+
+
+def test_trace_is_read_in_ns_and_repeated(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text("# ms between arrivals\n10\n\n2.5\n7.5\n")
+    assert read_trace(str(trace)) == [10 * 10**6, 2500000, 7500000]
+    assert take(trace_intervals(str(trace)), 5) == [10 * 10**6, 2500000, 7500000, 10 * 10**6, 2500000]
+    # 3 arrivals in 20 ms
+    assert trace_rate(str(trace)) == pytest.approx(150.0)
+
+
+def test_empty_trace(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text("# nothing\n")
+    with pytest.raises(Exception):
+        read_trace(str(trace))
+
+
+def test_make_intervals():
+    assert take(make_intervals("constant", 1000), 2) == [10**6, 10**6]
+    assert take(make_intervals("poisson", 50, seed=3), 4) == take(poisson_intervals(50, seed=3), 4)
+    with pytest.raises(Exception):
+        make_intervals("trace", 10)
+    with pytest.raises(Exception):
+        make_intervals("bursty", 10)
+
+
+@pytest.mark.parametrize("parts", [1, 2, 3, 5])
+def test_split_intervals_replay_the_whole_schedule(parts):
+    intervals = take(poisson_intervals(100, seed=4), 60)
+    arrivals = np.cumsum(intervals)
+    senders = []
+    for index in range(parts):
+        own = np.cumsum(list(split_intervals(iter(intervals), parts, index)))
+        # Sender index takes arrivals index, index + parts, ... at the
+        # same times as the whole schedule
+        np.testing.assert_array_equal(own, arrivals[index::parts])
+        senders.extend(own)
+    assert sorted(senders) == sorted(arrivals)
@@ -0,0 +1,119 @@
+import math
+
+import pytest
+
+from autotuner import (DEFAULT_GRID, coarse_indices, initial_stride, pareto_front, pareto_ranks,
+                       search_cost, tune)
+
+
+def point(throughput, energy):
+    return {"throughput": throughput, "energy_per_inference_mJ": energy}
+
+
+def test_pareto_ranks():
+    results = [point(100, 10), point(200, 20), point(150, 10), point(100, 20), point(50, 5),
+               point(150, 10)]
+    ranks = pareto_ranks(results, "throughput", "energy_per_inference_mJ")
+    # (100, 10) is dominated by (150, 10), (100, 20) by every other point
+    # but (50, 5); equal points do not dominate each other
+    assert ranks == [1, 0, 0, 2, 0, 0]
+    front = pareto_front(results, "throughput", "energy_per_inference_mJ")
+    assert [r["throughput"] for r in front] == [50, 150, 150, 200]
+
+
+def test_coarse_grid():
+    assert initial_stride(9, 3) == 3
+    assert initial_stride(10, 3) == 9
+    assert initial_stride(3, 3) == 1
+    assert coarse_indices(9, 3) == [0, 3, 6, 8]
+    assert coarse_indices(10, 9) == [0, 9]
+
+
+class Synthetic:
+    """
+    Latency grows with batch and concurrency, throughput with both until
+    the latency catches up, and large batches save energy.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, batch, conc, iterations):
+        self.calls.append((batch, conc, iterations))
+        latency = 1.0 + 0.5 * batch + 2.0 * conc + 0.05 * batch * conc
+        return {"batch": batch, "conc": conc, "latency_p99_ms": latency,
+                "throughput": batch * conc / latency * 1000.0,
+                "energy_per_inference_mJ": 5.0 + 20.0 / batch + 0.1 * conc}
+
+
+def run(slo_ms=40.0, max_iter=300, eta=3):
+    measure = Synthetic()
+    trials, front, chosen = tune(measure, DEFAULT_GRID, DEFAULT_GRID, slo_ms, max_iter, eta=eta)
+    return measure, trials, front, chosen
+
+
+def test_slo_misses_prune_the_dominated_configurations():
+    measure, trials, _, _ = run()
+    failed = []
+    for trial in trials:
+        b, c = trial["batch"], trial["conc"]
+        dominated = any(b >= fb and c >= fc for fb, fc in failed)
+        # Skipped exactly when a configuration no larger already missed
+        assert trial["skipped"] == dominated, trial
+        if not trial["skipped"] and not trial["meets_slo"]:
+            failed.append((b, c))
+    assert failed
+    assert any(trial["skipped"] for trial in trials)
+    assert len(measure.calls) == sum(1 for trial in trials if not trial["skipped"])
+    assert all(trial["latency_p99_ms"] <= 40.0
+               for trial in trials if not trial["skipped"] and trial["meets_slo"])
+
+
+def test_successive_halving_keeps_the_best_of_every_rung():
+    eta, max_iter = 3, 300
+    measure, trials, front, chosen = run(eta=eta, max_iter=max_iter)
+    rungs = max(trial["rung"] for trial in trials) + 1
+    assert rungs > 1
+    for rung in range(rungs):
+        runs = [t for t in trials if t["rung"] == rung and not t["skipped"]]
+        # Every rung runs eta times longer, the last one max_iter
+        assert {t["iter"] for t in runs} == {max(max_iter // eta ** (rungs - 1 - rung), 20)}
+        if rung == rungs - 1:
+            break
+        passed = [t for t in runs if t["meets_slo"]]
+        ranks = pareto_ranks(passed, "throughput", "energy_per_inference_mJ")
+        order = sorted(range(len(passed)), key=lambda k: (ranks[k], -passed[k]["throughput"]))
+        survivors = {(passed[k]["batch"], passed[k]["conc"])
+                     for k in order[:math.ceil(len(passed) / eta)]}
+        following = {(t["batch"], t["conc"]) for t in trials if t["rung"] == rung + 1}
+        assert survivors <= following
+
+    last = [t for t in trials if t["rung"] == rungs - 1 and t["meets_slo"]]
+    assert front == pareto_front(last, "throughput", "energy_per_inference_mJ")
+    assert chosen is front[-1]
+    assert chosen["meets_slo"] and chosen["iter"] == max_iter
+
+
+def test_search_measures_a_fraction_of_the_grid():
+    _, trials, _, _ = run()
+    grid_size = len(DEFAULT_GRID) ** 2
+    points, avoided, spent = search_cost(trials, grid_size, 300)
+    assert points == len({(t["batch"], t["conc"]) for t in trials if not t["skipped"]})
+    assert avoided == grid_size - sum(1 for t in trials if not t["skipped"])
+    assert 0 < spent < 0.25
+
+
+def test_nothing_meets_the_slo():
+    measure, trials, front, chosen = run(slo_ms=1.0)
+    assert (front, chosen) == ([], None)
+    # (1, 1) misses it, so it is the only configuration measured
+    assert measure.calls == [(1, 1, measure.calls[0][2])]
+    assert sum(1 for t in trials if t["skipped"]) == len(trials) - 1
+
+
+def test_grid_of_one():
+    measure = Synthetic()
+    trials, front, chosen = tune(measure, [4], [2], 100.0, 50)
+    assert measure.calls == [(4, 2, 50)]
+    assert chosen["batch"] == 4 and front == [chosen]
+    assert pytest.approx(chosen["throughput"]) == Synthetic()(4, 2, 1)["throughput"]
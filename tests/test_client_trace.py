@@ -0,0 +1,46 @@
+import json
+from collections import defaultdict
+
+import pytest
+
+
+def request_spans(trace_file):
+    """
+    (pid, request id) -> [(stage, begin ts, end ts), ...] of a Chrome
+    trace, checking that every begin event is closed by its end.
+    """
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    open_spans = {}
+    spans = defaultdict(list)
+    for event in events:
+        if event.get("cat") != "request":
+            continue
+        key = (event["pid"], event["id"], event["name"])
+        if event["ph"] == "b":
+            # A second begin of the same stage of a request before its end
+            # means two requests shared the id
+            assert key not in open_spans, key
+            open_spans[key] = event["ts"]
+        else:
+            assert event["ph"] == "e"
+            begin = open_spans.pop(key)
+            assert begin <= event["ts"]
+            spans[key[:2]].append((key[2], begin, event["ts"]))
+    assert not open_spans
+    return spans
+
+
+@pytest.mark.parametrize("mode", [[], ["--asyncio"]])
+def test_trace_spans_pair_up_across_windows(run_client, tmp_path, mode):
+    trace_file = str(tmp_path / "trace.json")
+    # The warm-up and every stability window send requests of the run
+    run_client("-a", "-b", "1", "-conc", "4", "-iter", "10", "--stability-windows", "3",
+               "--max-windows", "3", "--trace", trace_file, *mode)
+    spans = request_spans(trace_file)
+    # 4 slots * 10 launches, per window
+    assert len(spans) >= 3 * 40
+    for request, stages in spans.items():
+        names = [stage for stage, _, _ in stages]
+        assert names.count("build") == 1, (request, names)
+        assert names.count("in_flight") == 1, (request, names)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from energy_attribution import attribute_energy, integrate_energy
+
+RAILS = ["GPU", "CPU"]
+MS = 10**6
+
+
+def trace(power, step_ms=1, samples=1001):
+    """
+    Samples every step_ms of constant power (mW per rail).
+    """
+    times = np.arange(samples, dtype=np.int64) * step_ms * MS
+    return times, np.tile(np.asarray(power, dtype=np.float64), (samples, 1))
+
+
+def test_integrate_energy_matches_trapezoid():
+    times = np.array([0, 10, 15, 40, 100], dtype=np.int64) * MS
+    power = np.array([[100.0, 10.0], [200.0, 10.0], [200.0, 20.0], [50.0, 20.0], [0.0, 0.0]])
+    # GPU: 1.5 + 1.0 + 3.125 + 1.5 mJ, CPU: 0.1 + 0.075 + 0.5 + 0.6 mJ
+    assert integrate_energy(times, power) == pytest.approx([7.125, 1.275])
+
+
+def test_integrate_energy_needs_two_samples():
+    assert np.all(integrate_energy(np.array([0]), np.ones((1, 2))) == 0)
+
+
+def test_single_request_gets_the_dynamic_energy():
+    times, power = trace([3000.0, 1500.0])
+    baseline = {"GPU": 1000.0, "CPU": 500.0}
+    # One request in flight for the whole second
+    per_request, unattributed = attribute_energy(times, power, RAILS, baseline, [(0, 1000 * MS, 1)])
+    assert per_request[0] == pytest.approx([2000.0, 1000.0])
+    assert unattributed == pytest.approx([0.0, 0.0])
+
+
+def test_energy_is_shared_by_batch_size():
+    times, power = trace([3000.0, 0.0])
+    spans = [(0, 1000 * MS, 3), (0, 1000 * MS, 1)]
+    per_request, unattributed = attribute_energy(times, power, RAILS, {}, spans)
+    assert per_request[:, 0] == pytest.approx([2250.0, 750.0])
+    assert unattributed[0] == pytest.approx(0.0)
+
+
+def test_overlapping_requests_and_idle_gaps():
+    times, power = trace([1000.0, 0.0])
+    # 0-400 ms A alone, 200-600 ms B (overlaps A 200-400 ms), idle after
+    spans = [(0, 400 * MS, 1), (200 * MS, 600 * MS, 1)]
+    per_request, unattributed = attribute_energy(times, power, RAILS, {}, spans)
+    assert per_request[:, 0] == pytest.approx([300.0, 300.0])
+    assert unattributed[0] == pytest.approx(400.0)
+    # Nothing is lost or counted twice
+    total = integrate_energy(times, power)[0]
+    assert per_request[:, 0].sum() + unattributed[0] == pytest.approx(total)
+
+
+def test_no_requests():
+    times, power = trace([1000.0, 0.0])
+    per_request, unattributed = attribute_energy(times, power, RAILS, {}, [])
+    assert per_request.shape == (0, 2)
+    assert np.all(unattributed == 0)
+
+
+def test_nanosecond_spans_of_a_late_clock():
+    # 2**60 ns into the monotonic clock, float64 timestamps are 256 ns
+    # apart: a request sent 1 ns before a sample midpoint must still share
+    # the interval of that midpoint
+    base = 2**60
+    times = base + np.array([0, 1000, 2000], dtype=np.int64)
+    power = np.full((3, 2), 1000.0)
+    spans = [(base + 499, base + 1600, 1), (base + 1400, base + 2000, 1)]
+    per_request, unattributed = attribute_energy(times, power, RAILS, {}, spans)
+    # Every interval holds 1e-3 mJ; the second one is shared by both
+    assert per_request[:, 0] == pytest.approx([1.5e-3, 0.5e-3])
+    assert unattributed == pytest.approx([0.0, 0.0])
@@ -0,0 +1,170 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import energy_meter_siroco
+from energy_meter_siroco import EnergyMeter, create_fake_sysfs, load_sensor_map
+
+
+class FakeClock:
+    """
+    time.monotonic_ns() advancing by step_ns on every call.
+    """
+
+    def __init__(self, step_ns):
+        self.now = 10**9
+        self.step_ns = step_ns
+
+    def __call__(self):
+        self.now += self.step_ns
+        return self.now
+
+
+def write(path, value):
+    with open(path, "w") as f:
+        f.write("{}\n".format(value))
+
+
+def close(meter):
+    # For meters sampled by hand, whose thread never started
+    for fds in meter.sensors.values():
+        for fd in fds or ():
+            os.close(fd)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock(10 * 10**6)
+    monkeypatch.setattr(energy_meter_siroco.time, "monotonic_ns", fake)
+    return fake
+
+
+def test_constant_power_energy(tmp_path, clock):
+    create_fake_sysfs(str(tmp_path), "orin", current=1000, voltage=5000)
+    meter = EnergyMeter("orin", 10, "GPU", 0, sysfs_root=str(tmp_path))
+    meter.start_measuring()
+    for _ in range(101):
+        meter.sample()
+    meter.stop_measuring()
+    # 5000 mW for 100 intervals of 10 ms
+    assert meter.steps == 101
+    assert meter.time == pytest.approx(1.0)
+    assert meter.total_energy == pytest.approx(5000.0)
+    close(meter)
+
+
+def test_trapezoidal_rule_follows_real_timestamps(tmp_path, clock):
+    files = create_fake_sysfs(str(tmp_path), "orin", current=0, voltage=1000)
+    meter = EnergyMeter("orin", 10, "GPU", 0, sysfs_root=str(tmp_path))
+    meter.start_measuring()
+    expected = 0.0
+    previous = None
+    # A current ramp sampled at irregular intervals: the trapezoidal rule
+    # over the real timestamps is exact for it
+    for i, step_ms in enumerate([10, 3, 25, 7, 10, 40, 1]):
+        clock.step_ns = step_ms * 10**6
+        write(files["GPU"][0], 100 * i)
+        meter.sample()
+        if previous is not None:
+            expected += 0.5 * (100 * i + previous) * step_ms / 1000.0
+        previous = 100 * i
+    meter.stop_measuring()
+    assert meter.total_energy == pytest.approx(expected)
+    close(meter)
+
+
+def test_discarded_samples_and_ring_buffer(tmp_path, clock):
+    create_fake_sysfs(str(tmp_path), "orin", current=1000, voltage=1000)
+    meter = EnergyMeter("orin", 10, "GPU", 3, sysfs_root=str(tmp_path), capacity=8)
+    meter.start_measuring()
+    for _ in range(3 + 20):
+        meter.sample()
+    meter.stop_measuring()
+    assert meter.steps == 20
+    assert meter.total_energy == pytest.approx(1000.0 * 19 * 0.01)
+    times, power = meter.samples()
+    # Only the last capacity samples are kept, oldest first
+    assert len(times) == 8
+    assert np.all(np.diff(times) == clock.step_ns)
+    assert times[-1] == clock.now
+    assert np.all(power == 1000.0)
+    close(meter)
+
+
+def test_samples_only_while_measuring(tmp_path):
+    create_fake_sysfs(str(tmp_path), "orin", current=1000, voltage=5000)
+    meter = EnergyMeter("orin", 2, "GPU", 0, sysfs_root=str(tmp_path))
+    meter.start()
+    meter.start_measuring()
+    time.sleep(0.3)
+    meter.stop_measuring()
+    time.sleep(0.05)
+    steps = meter.steps
+    assert steps > 10
+    assert meter.total_energy == pytest.approx(5000.0 * meter.time)
+    # Stopped, the thread blocks instead of sampling
+    time.sleep(0.1)
+    assert meter.steps == steps
+    meter.finish()
+    assert not meter.is_alive()
+
+
+@pytest.mark.parametrize("device", ["orin", "orin2"])
+def test_rails_have_their_own_channels(device):
+    sensor_map = load_sensor_map(device)
+    assert set(sensor_map) == {"GPU", "CPU", "SOC", "CV", "VDDRQ", "SYS5V"}
+    paths = [sensor[kind] for sensor in sensor_map.values() for kind in ("current", "voltage")]
+    assert len(set(paths)) == len(paths)
+
+
+def test_energy_per_rail(tmp_path, clock):
+    rails = list(load_sensor_map("orin2"))
+    currents = dict((rail, 100 * (i + 1)) for i, rail in enumerate(rails))
+    voltages = dict((rail, 1000 * (i + 1)) for i, rail in enumerate(rails))
+    create_fake_sysfs(str(tmp_path), "orin2", currents, voltages)
+    meter = EnergyMeter("orin2", 10, "CPU", 0, sysfs_root=str(tmp_path))
+    meter.start_measuring()
+    for _ in range(11):
+        meter.sample()
+    meter.stop_measuring()
+    assert not meter.unavailable
+    for rail in rails:
+        # 0.1 s at current x voltage / 1000 mW
+        assert meter.rail_energy[rail] == pytest.approx(currents[rail] * voltages[rail] / 1e4)
+    assert meter.total_energy == meter.rail_energy["CPU"]
+    times, power = meter.samples(rail="all")
+    assert power.shape == (11, len(rails))
+    close(meter)
+
+
+def test_hwmon_index_is_resolved(tmp_path, clock):
+    create_fake_sysfs(str(tmp_path), "orin", current=1000, voltage=1000)
+    chip = tmp_path / "bus/i2c/drivers/ina3221/1-0040/hwmon"
+    (chip / "hwmon1").rename(chip / "hwmon4")
+    meter = EnergyMeter("orin", 10, "GPU", 0, sysfs_root=str(tmp_path))
+    assert not meter.unavailable
+    meter.start_measuring()
+    meter.sample()
+    meter.sample()
+    assert meter.total_energy == pytest.approx(10.0)
+    close(meter)
+
+
+def test_missing_rails_are_nan(tmp_path, clock):
+    files = create_fake_sysfs(str(tmp_path), "orin2", current=1000, voltage=1000)
+    for rail in ("CV", "VDDRQ", "SYS5V"):
+        os.remove(files[rail][0])
+    meter = EnergyMeter("orin2", 10, "GPU", 0, sysfs_root=str(tmp_path))
+    assert meter.unavailable == ["CV", "VDDRQ", "SYS5V"]
+    meter.start_measuring()
+    for _ in range(3):
+        meter.sample()
+    assert meter.total_energy == pytest.approx(20.0)
+    assert np.isnan(meter.rail_energy["CV"])
+    assert not np.isnan(meter.rail_energy["SOC"])
+    close(meter)
+    # Without the measured rail the meter cannot work at all
+    with pytest.raises(Exception):
+        EnergyMeter("orin2", 10, "CV", 0, sysfs_root=str(tmp_path))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from flow_stacker import FlowStacker
+
+
+def expected_window(frames, sample_shape, layout):
+    stacked = np.stack(frames)
+    if layout == "tchw":
+        return stacked.transpose(0, 3, 1, 2).reshape(sample_shape)
+    if layout == "cthw":
+        return stacked.transpose(3, 0, 1, 2)
+    return stacked
+
+
+@pytest.mark.parametrize("sample_shape,layout", [
+    ((5, 4, 3, 2), "thwc"),
+    ((10, 4, 3), "tchw"),
+    ((2, 5, 4, 3), "cthw"),
+])
+def test_flow_stacker_layouts(sample_shape, layout):
+    stacker = FlowStacker(sample_shape, np.float32, frames=5)
+    assert stacker.layout == layout
+    assert stacker.frame_shape == (4, 3, 2)
+    rng = np.random.RandomState(0)
+    frames = rng.rand(13, 4, 3, 2).astype(np.float32)
+    for i, frame in enumerate(frames):
+        ready = stacker.push(frame)
+        assert ready == (i >= 4)
+        if ready:
+            window = stacker.window()
+            assert window.shape == sample_shape
+            np.testing.assert_array_equal(window, expected_window(frames[i - 4:i + 1], sample_shape, layout))
+    # split() gives back the frames of a window
+    np.testing.assert_array_equal(stacker.split(stacker.window()), frames[-5:])
+
+
+def test_flow_stacker_stride():
+    stacker = FlowStacker((4, 2, 2, 2), np.float32, frames=4, stride=3)
+    ready = [stacker.push(np.zeros((2, 2, 2), dtype=np.float32)) for _ in range(12)]
+    assert [i for i, r in enumerate(ready) if r] == [3, 6, 9]
+
+
+def test_flow_stacker_rejects_other_shapes():
+    with pytest.raises(Exception):
+        FlowStacker((7, 4, 3), np.float32, frames=5)
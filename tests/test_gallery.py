@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from gallery import Gallery, normalize, top_k
+
+
+def brute_force(gallery, queries, k):
+    # Every score, fully sorted
+    scores = normalize(queries) @ gallery.embeddings.T
+    rows = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return gallery.labels[rows], np.take_along_axis(scores, rows, axis=1)
+
+
+def test_top_k_is_sorted_and_clamped():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [0.4, 0.2, 0.8, 0.6]], dtype=np.float32)
+    columns, values = top_k(scores, 2)
+    np.testing.assert_array_equal(columns, [[1, 3], [2, 3]])
+    np.testing.assert_allclose(values, [[0.9, 0.7], [0.8, 0.6]])
+    columns, values = top_k(scores, 10)
+    np.testing.assert_array_equal(columns, [[1, 3, 2, 0], [2, 3, 0, 1]])
+
+
+@pytest.mark.parametrize("k", [1, 5])
+def test_exact_match_equals_brute_force(k):
+    rng = np.random.default_rng(0)
+    gallery = Gallery(rng.standard_normal((2000, 32)), labels=np.arange(2000) * 10)
+    queries = rng.standard_normal((16, 32))
+    labels, scores = gallery.match(queries, k)
+    expected_labels, expected_scores = brute_force(gallery, queries, k)
+    assert labels.shape == scores.shape == (16, k)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_single_embedding_and_row_labels():
+    rng = np.random.default_rng(1)
+    embeddings = rng.standard_normal((50, 8))
+    gallery = Gallery(embeddings)
+    # Scaling a query does not change its cosine similarities
+    labels, scores = gallery.match(3.0 * embeddings[7], k=3)
+    assert labels.shape == (1, 3)
+    assert labels[0, 0] == 7
+    assert scores[0, 0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_index_recall_and_full_probe():
+    rng = np.random.default_rng(2)
+    gallery = Gallery(rng.standard_normal((5000, 32)))
+    truth = rng.integers(0, len(gallery), 64)
+    queries = gallery.embeddings[truth] + 0.05 * rng.standard_normal((64, 32))
+    exact, _ = gallery.match(queries, 5)
+
+    recalls = []
+    for nprobe in (4, 20):
+        gallery.build_index(nlist=50, nprobe=nprobe)
+        index = gallery.index
+        # Every row lands in exactly one cluster slice
+        assert index.bounds[-1] == len(gallery)
+        np.testing.assert_array_equal(np.sort(index.order), np.arange(len(gallery)))
+        labels, scores = gallery.match(queries, 5)
+        recalls.append(np.mean([len(set(a) & set(e)) / 5.0 for a, e in zip(labels, exact)]))
+        # The enrolled signature is in the probed clusters of its query
+        assert np.mean(labels[:, 0] == truth) >= 0.95
+        assert (np.diff(scores, axis=1) <= 0).all()
+    # Random 32-d signatures have no close neighbours beyond the first
+    assert recalls[0] >= 0.5
+    assert recalls[1] >= 0.9
+
+    # Probing every cluster is exact
+    gallery.build_index(nlist=50, nprobe=50)
+    labels, _ = gallery.match(queries, 5)
+    np.testing.assert_array_equal(labels, exact)
+
+
+def test_load_npz_and_npy(tmp_path):
+    embeddings = np.eye(4, dtype=np.float32)
+    np.savez(str(tmp_path / "gallery.npz"), embeddings=embeddings, labels=np.array([5, 6, 7, 8]))
+    np.save(str(tmp_path / "gallery.npy"), embeddings)
+    assert Gallery.load(str(tmp_path / "gallery.npz")).match(embeddings[2])[0][0, 0] == 7
+    gallery = Gallery.load(str(tmp_path / "gallery.npy"))
+    assert (len(gallery), gallery.dimension) == (4, 4)
+    assert gallery.match(embeddings[2])[0][0, 0] == 2
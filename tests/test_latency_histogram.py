@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from latency_histogram import LatencyHistogram
+
+PERCENTILES = [0, 1, 25, 50, 90, 99, 99.9, 100]
+
+
+def check_percentiles(histogram, values):
+    # The histogram reports the top of the bucket of the nearest-rank
+    # percentile: never below it and at most one sub-bucket above
+    error = 2.0 ** -(histogram.sub_bucket_bits - 1)
+    for p in PERCENTILES:
+        exact = np.percentile(values, p, method="inverted_cdf")
+        reported = histogram.percentile(p)
+        assert exact <= reported <= exact * (1 + error), p
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_percentiles_match_numpy(seed):
+    rng = np.random.RandomState(seed)
+    # Latencies from tens of microseconds to seconds
+    values = np.exp(rng.uniform(np.log(1e4), np.log(3e9), 20000)).astype(np.int64)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    check_percentiles(histogram, values)
+    assert histogram.total_count == len(values)
+    assert histogram.min_ns == values.min()
+    assert histogram.max_ns == values.max()
+    assert histogram.mean() == pytest.approx(values.mean())
+
+
+def test_small_values_are_exact():
+    values = np.arange(200)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for p in PERCENTILES:
+        assert histogram.percentile(p) == np.percentile(values, p, method="inverted_cdf")
+
+
+def test_merge_equals_recording_everything():
+    rng = np.random.RandomState(3)
+    values = rng.lognormal(16, 1, 5000).astype(np.int64)
+    merged = LatencyHistogram()
+    for part in np.array_split(values, 4):
+        histogram = LatencyHistogram()
+        for value in part:
+            histogram.record(value)
+        merged.merge(histogram)
+    check_percentiles(merged, values)
+    assert merged.total_count == len(values)
+    assert merged.max_ns == values.max()
+
+
+def test_summary_in_milliseconds():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0
+    for value in (10**6, 2 * 10**6, 3 * 10**6):
+        histogram.record(value)
+    summary = histogram.summary()
+    assert summary["count"] == 3
+    assert summary["mean"] == pytest.approx(2.0)
+    assert summary["max"] == pytest.approx(3.0)
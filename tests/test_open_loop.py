@@ -0,0 +1,16 @@
+import re
+
+import pytest
+
+
+@pytest.mark.parametrize("mode", [[], ["--asyncio"]])
+def test_http_open_loop_holds_the_offered_rate(run_client, mode):
+    # A rate the server sustains easily, above the 100 requests/s that
+    # a 10 ms sleep per send would allow: every request must be sent on
+    # schedule, whatever the HTTP path
+    output = run_client("-a", "-b", "1", "-iter", "300", "--request-rate", "150",
+                        "--arrival", "constant", *mode)
+    achieved = float(re.search(r"Achieved_rate\(req/s\)= ([\d.]+)", output).group(1))
+    sent = int(re.search(r"Sent= (\d+)", output).group(1))
+    assert sent == 300
+    assert achieved == pytest.approx(150.0, rel=0.05)
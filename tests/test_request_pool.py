@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import tritonclient.grpc as grpcclient
+import tritonclient.http as httpclient
+
+from request_pool import RequestPool
+
+
+def batch(size, value=0.0):
+    return np.full((size, 2, 3), value, dtype=np.float32)
+
+
+def sent(inputs):
+    # The tensor the HTTP client would put on the wire
+    body, json_size = httpclient.InferenceServerClient.generate_request_body(inputs)
+    return np.frombuffer(body[json_size:], dtype=np.float32)
+
+
+@pytest.mark.parametrize("client", [httpclient, grpcclient])
+def test_objects_are_reused_per_model_batch_size_and_dtype(client):
+    pool = RequestPool(client, "input", "output", class_count=3)
+    inputs, outputs = pool.get("a", batch(4), "FP32")
+    assert inputs[0].shape() == [4, 2, 3]
+    assert inputs[0].name() == "input" and outputs[0].name() == "output"
+    assert pool.get("a", batch(4, 1.0), "FP32")[0] is inputs
+
+    assert pool.get("b", batch(4), "FP32")[0] is not inputs
+    assert pool.get("a", batch(8), "FP32")[0] is not inputs
+    assert pool.get("a", batch(4).astype(np.float16), "FP16")[0] is not inputs
+    assert (pool.builds, pool.hits) == (4, 1)
+
+
+def test_changed_batches_are_serialized_again():
+    pool = RequestPool(httpclient, "input", "output")
+    inputs, _ = pool.get("a", batch(2), "FP32")
+    # Without changed the cached batch is sent as it was built
+    assert pool.get("a", batch(2, 1.0), "FP32")[0] is inputs
+    assert (sent(inputs) == 0.0).all()
+    assert pool.get("a", batch(2, 5.0), "FP32", changed=True)[0] is inputs
+    assert (sent(inputs) == 5.0).all()
+    assert pool.builds == 1
+
+
+def test_double_buffering_alternates_two_sets():
+    pool = RequestPool(httpclient, "input", "output", double_buffered=True)
+    first, _ = pool.get("a", batch(2, 1.0), "FP32")
+    assert pool.builds == 2
+    second, _ = pool.get("a", batch(2, 2.0), "FP32", changed=True)
+    assert second is not first
+    # The set handed out before keeps its batch until it comes round again
+    assert (sent(first) == 1.0).all()
+    assert (sent(second) == 2.0).all()
+    third, _ = pool.get("a", batch(2, 3.0), "FP32", changed=True)
+    assert third is first
+    assert (sent(first) == 3.0).all()
+    assert (sent(second) == 2.0).all()
@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+import pytest
+import tritonclient.grpc as grpcclient
+import tritonclient.http as httpclient
+from tritonclient.grpc import service_pb2
+from tritonclient.utils import InferenceServerException
+
+from result_sink import ResultSink
+
+
+def http_result(array, name="output"):
+    header = json.dumps({"model_name": "m", "outputs": [{
+        "name": name, "datatype": "FP32", "shape": list(array.shape),
+        "parameters": {"binary_data_size": array.nbytes}}]}).encode()
+    return httpclient.InferResult.from_response_body(
+        header + array.tobytes(), header_length=len(header))
+
+
+def grpc_result(array, name="output"):
+    response = service_pb2.ModelInferResponse(model_name="m")
+    response.outputs.add(name=name, datatype="FP32", shape=list(array.shape))
+    response.raw_output_contents.append(array.tobytes())
+    return grpcclient.InferResult(response)
+
+
+def http_classification(labels_per_sample, batch):
+    # Classification outputs are "score:index" strings
+    header = json.dumps({"model_name": "m", "outputs": [{
+        "name": "output", "datatype": "BYTES", "shape": [batch, labels_per_sample],
+        "data": ["0.5:1"] * (batch * labels_per_sample)}]}).encode()
+    return httpclient.InferResult.from_response_body(header)
+
+
+@pytest.mark.parametrize("result", [http_result, grpc_result])
+def test_decode_copies_the_batch_into_the_preallocated_output(result):
+    sink = ResultSink("output", [4, 2], "FP32", max_batch_size=8, decode=True)
+    assert sink.output.shape == (8, 4, 2)
+    array = np.arange(3 * 8, dtype=np.float32).reshape(3, 4, 2)
+    sink.consume(result(array))
+    np.testing.assert_array_equal(sink.output[:3], array)
+    # Flattened outputs are reshaped to the sample shape
+    sink.consume(result(np.ones((2, 8), dtype=np.float32)))
+    assert (sink.output[:2] == 1).all()
+    np.testing.assert_array_equal(sink.output[2], array[2])
+    assert sink.consumed == 2
+
+
+def test_unbatched_model_output():
+    sink = ResultSink("output", [4, 2], "FP32", max_batch_size=0, decode=True)
+    assert sink.output.shape == (1, 4, 2)
+    array = np.full((4, 2), 3.0, dtype=np.float32)
+    sink.consume(http_result(array))
+    np.testing.assert_array_equal(sink.output[0], array)
+    with pytest.raises(InferenceServerException, match="expected 8 values per sample"):
+        sink.consume(http_result(np.zeros((2, 4, 2), dtype=np.float32)))
+
+
+@pytest.mark.parametrize("result", [http_result, grpc_result])
+def test_malformed_outputs_raise(result):
+    sink = ResultSink("output", [4, 2], "FP32", max_batch_size=8)
+    sink.consume(result(np.zeros((5, 8), dtype=np.float32)))
+    with pytest.raises(InferenceServerException, match="has shape \\[5, 4\\], expected 8 values"):
+        sink.consume(result(np.zeros((5, 4), dtype=np.float32)))
+    with pytest.raises(InferenceServerException, match="no output 'output'"):
+        sink.consume(result(np.zeros((5, 8), dtype=np.float32), name="other"))
+
+
+def test_class_count_is_validated():
+    sink = ResultSink("output", [4, 2], "FP32", max_batch_size=8, class_count=3, decode=True)
+    # Classification results are not decoded into an embedding buffer
+    assert sink.output is None
+    sink.consume(http_classification(3, batch=2))
+    with pytest.raises(InferenceServerException, match="expected 3 values per sample"):
+        sink.consume(http_classification(5, batch=2))
+
+
+def test_shared_memory_results_are_only_counted():
+    sink = ResultSink("output", [4, 2], "FP32", max_batch_size=8, decode=True, shared_memory=True)
+    assert sink.output is None
+    sink.consume(http_result(np.zeros((1, 1), dtype=np.float32), name="other"))
+    assert sink.consumed == 1
@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+import pytest
+
+from sample_dataset import BatchPrefetcher, SampleDataset
+
+SHAPE = (3, 4, 2)
+
+
+def samples(count, first=0):
+    # Sample i is filled with the value i
+    return np.arange(first, first + count, dtype=np.float32)[:, None, None, None] * np.ones(SHAPE, np.float32)
+
+
+def mapped(batch):
+    base = batch
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    return base is not None
+
+
+@pytest.fixture
+def packed(tmp_path):
+    path = str(tmp_path / "windows.npy")
+    np.save(path, samples(10))
+    return SampleDataset(path)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    # One stack of 4, a single sample and a stack of 3
+    np.save(str(tmp_path / "a.npy"), samples(4))
+    np.save(str(tmp_path / "b.npy"), samples(1, 4)[0])
+    np.save(str(tmp_path / "c.npy"), samples(3, 5))
+    (tmp_path / "notes.txt").write_text("not a sample")
+    return SampleDataset(str(tmp_path))
+
+
+def values(batch):
+    return batch[:, 0, 0, 0].tolist()
+
+
+def test_batch_inside_one_file_is_a_view(packed):
+    assert (len(packed), packed.sample_shape, packed.dtype) == (10, SHAPE, np.float32)
+    batch = packed.batch(2, 4)
+    assert mapped(batch)
+    assert values(batch) == [2, 3, 4, 5]
+
+
+def test_wrapping_batch_is_gathered_into_out(packed):
+    out = np.empty((4,) + SHAPE, dtype=np.float32)
+    batch = packed.batch(18, 4, out)
+    assert np.shares_memory(batch, out)
+    assert values(batch) == [8, 9, 0, 1]
+
+
+def test_batches_across_files(folder):
+    assert len(folder) == 8
+    assert values(folder.batch(0, 3)) == [0, 1, 2]
+    assert mapped(folder.batch(5, 3))
+    gathered = folder.batch(3, 4)
+    assert not mapped(gathered)
+    assert values(gathered) == [3, 4, 5, 6]
+    assert folder.sample(12)[0, 0, 0] == 4
+
+
+def test_other_dtype_is_gathered(tmp_path):
+    path = str(tmp_path / "windows.npy")
+    np.save(path, samples(6))
+    dataset = SampleDataset(path, dtype=np.float16)
+    batch = dataset.batch(1, 2)
+    assert batch.dtype == np.float16 and not mapped(batch)
+    assert values(batch) == [1, 2]
+
+
+def test_mismatched_shapes_are_rejected(tmp_path):
+    np.save(str(tmp_path / "a.npy"), samples(2))
+    np.save(str(tmp_path / "b.npy"), np.zeros((2, 5, 5, 2), np.float32))
+    with pytest.raises(Exception, match="expected samples of shape"):
+        SampleDataset(str(tmp_path))
+    (tmp_path / "empty").mkdir()
+    with pytest.raises(Exception, match="No .npy samples"):
+        SampleDataset(str(tmp_path / "empty"))
+
+
+def take(prefetcher, count):
+    taken = []
+    for _ in range(count):
+        batch = prefetcher.next()
+        taken.append((batch, batch.copy()))
+    return taken
+
+
+def test_prefetcher_views_cycle_over_the_dataset(packed):
+    prefetcher = BatchPrefetcher(packed, 4, depth=2, start=4)
+    prefetcher.start()
+    try:
+        taken = take(prefetcher, 5)
+    finally:
+        prefetcher.stop()
+    # 4-7 and 0-3 are views, 8-1 wraps and is gathered into the ring
+    assert [values(copy) for _, copy in taken] == [
+        [4, 5, 6, 7], [8, 9, 0, 1], [2, 3, 4, 5], [6, 7, 8, 9], [0, 1, 2, 3]]
+    assert [mapped(batch) for batch, _ in taken] == [True, False, True, True, True]
+
+
+def test_prefetcher_ring_wraps_without_overwriting_the_batch_handed_out(folder):
+    # Converted to another dtype, every batch is gathered into the ring
+    prefetcher = BatchPrefetcher(SampleDataset(folder.path, dtype=np.float16), 3, depth=1)
+    assert len(prefetcher.buffers) == 3
+    prefetcher.start()
+    try:
+        taken = []
+        for _ in range(8):
+            batch = prefetcher.next()
+            # Let the thread fill the queue and the buffer after it
+            time.sleep(0.02)
+            assert values(batch) == [(len(taken) * 3 + i) % 8 for i in range(3)]
+            taken.append(batch)
+    finally:
+        prefetcher.stop()
+    # The ring of depth + 2 buffers was reused in turn
+    buffers = [id(batch.base if batch.base is not None else batch) for batch in taken]
+    assert set(buffers) <= {id(buffer) for buffer in prefetcher.buffers}
+    assert buffers[:3] == buffers[3:6]
+    assert prefetcher.produced >= 8
+
+
+def test_prefetcher_of_single_samples(packed):
+    prefetcher = BatchPrefetcher(packed, None, depth=2, start=9)
+    prefetcher.start()
+    try:
+        first, second = prefetcher.next(), prefetcher.next()
+    finally:
+        prefetcher.stop()
+    assert first.shape == second.shape == SHAPE
+    assert (first[0, 0, 0], second[0, 0, 0]) == (9, 0)
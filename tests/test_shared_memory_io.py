@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+import tritonclient.http as httpclient
+
+from shared_memory_io import SharedMemoryIO
+
+
+class FakeClient:
+    def __init__(self):
+        self.registered = {}
+
+    def register_system_shared_memory(self, name, key, byte_size):
+        self.registered[name] = (key, byte_size)
+
+    def unregister_system_shared_memory(self, name):
+        self.registered.pop(name, None)
+
+
+@pytest.fixture
+def io():
+    client = FakeClient()
+    io = SharedMemoryIO(client, httpclient, "input", (3, 2), "FP32", "output", (4,), "FP32",
+                        max_batch_size=2, slots=3, prefix="test")
+    io.register()
+    yield io
+    io.close()
+    assert client.registered == {}
+
+
+def test_register_sizes_the_regions_for_every_slot(io):
+    assert io.triton_client.registered == {
+        io.input_region: ("/" + io.input_region, 3 * 2 * 6 * 4),
+        io.output_region: ("/" + io.output_region, 3 * 2 * 4 * 4),
+    }
+
+
+def test_request_tensors_reference_the_slot_of_the_request(io):
+    batch = np.arange(12, dtype=np.float32).reshape(2, 3, 2)
+    inputs, outputs = io.request_tensors("a", batch)
+    slot = io._slot_of_request["a"]
+    np.testing.assert_array_equal(io.input_view(slot, 2), batch)
+    assert inputs[0].shape() == [2, 3, 2]
+    assert inputs[0]._parameters == {
+        "shared_memory_region": io.input_region,
+        "shared_memory_byte_size": 48,
+        "shared_memory_offset": slot * io.input_slot_bytes,
+    }
+    assert outputs[0]._parameters["shared_memory_byte_size"] == 32
+    assert outputs[0]._parameters["shared_memory_offset"] == slot * io.output_slot_bytes
+
+
+def test_slots_are_exclusive_until_released(io):
+    batch = np.zeros((1, 3, 2), dtype=np.float32)
+    for request_id in "abc":
+        io.request_tensors(request_id, batch)
+    assert sorted(io._slot_of_request.values()) == [0, 1, 2]
+    with pytest.raises(Exception, match="no free shared memory slot"):
+        io.request_tensors("d", batch)
+
+    slot = io._slot_of_request["b"]
+    io.release("b", 0)
+    # Releasing twice, or a request without a slot, frees nothing more
+    io.release("b")
+    io.release("unknown")
+    assert io._free_slots == [slot]
+    io.request_tensors("d", batch)
+    assert io._slot_of_request["d"] == slot
+
+
+def test_preloaded_and_in_place_batches_are_not_copied(io):
+    preloaded = np.full((2, 3, 2), 7, dtype=np.float32)
+    io.preload(preloaded)
+    for slot in range(io.slots):
+        np.testing.assert_array_equal(io.input_view(slot, 2), preloaded)
+    # Changing the preloaded batch does not reach the slots
+    preloaded[...] = 0
+    io.request_tensors("a", preloaded)
+    assert (io.input_view(io._slot_of_request["a"], 2) == 7).all()
+
+    slot = io.acquire("b")
+    view = io.input_view(slot, 2)
+    view[...] = 5
+    io.release("b")
+    io.request_tensors("c", view)
+    assert io._slot_of_request["c"] == slot
+    assert (io.input_view(slot, 2) == 5).all()
@@ -0,0 +1,86 @@
+import pytest
+
+from track_identity import AdaptiveRate, TrackIdentity
+
+
+def test_track_identity_fuses_decayed_scores():
+    track = TrackIdentity(decay=0.5)
+    assert track.decision() == (None, 0.0)
+    track.update([3, 7], [0.8, 0.4])
+    track.update([7, 3], [0.9, -0.2])
+    # 3: 0.8 * 0.5 + 0 (negative scores add nothing), 7: 0.4 * 0.5 + 0.9
+    assert track.scores == pytest.approx({3: 0.4, 7: 1.1})
+    label, confidence = track.decision()
+    assert label == 7
+    assert confidence == pytest.approx((1.1 - 0.4) / 1.1)
+    assert track.updates == 2
+
+
+def infer(adaptive, track_id, request_id, labels, scores):
+    assert adaptive.should_infer(track_id)
+    adaptive.record_batch(request_id, [track_id])
+    adaptive.matched(request_id, [labels], [scores])
+
+
+def test_stable_track_is_inferred_once_per_stride():
+    adaptive = AdaptiveRate(1, threshold=0.5, confirmations=2, stable_stride=3, subjects=[1])
+    infer(adaptive, 0, "0", [1, 2], [0.9, 0.1])
+    infer(adaptive, 0, "1", [1, 2], [0.9, 0.1])
+    assert adaptive.stable_tracks() == 1
+    decisions = [adaptive.should_infer(0) for _ in range(6)]
+    assert decisions == [False, False, True, False, False, True]
+    assert (adaptive.inferred, adaptive.skipped, adaptive.missed) == (2, 4, 0)
+    # Skipped windows are answered with the fused identity
+    assert adaptive.tracks[0].reported == [1, 1, 1, 1, 1, 1]
+    assert adaptive.accuracy() == 1.0
+
+
+def test_unstable_track_goes_back_to_full_rate():
+    adaptive = AdaptiveRate(1, threshold=0.5, confirmations=1, stable_stride=4)
+    infer(adaptive, 0, "0", [1, 2], [0.9, 0.1])
+    assert not adaptive.should_infer(0)
+    # A window still in flight when the track became stable disagrees
+    adaptive.record_batch("1", [0])
+    adaptive.matched("1", [[2, 1]], [[1.0, 0.9]])
+    assert adaptive.stable_tracks() == 0
+    assert all(adaptive.should_infer(0) for _ in range(3))
+
+
+def test_disabled_infers_every_window():
+    adaptive = AdaptiveRate(1, threshold=0.0, confirmations=0, stable_stride=10, enabled=False)
+    infer(adaptive, 0, "0", [1], [1.0])
+    assert all(adaptive.should_infer(0) for _ in range(5))
+    assert adaptive.skipped == 0
+
+
+def test_inferences_are_counted_on_completion():
+    adaptive = AdaptiveRate(2, threshold=0.5, confirmations=1, stable_stride=2)
+    assert adaptive.should_infer(0) and adaptive.should_infer(1)
+    adaptive.record_batch("0", [0, 1])
+    assert adaptive.inferred == 0
+    adaptive.matched("0", [[4], [5]], [[0.9], [0.8]])
+    assert adaptive.inferred == 2
+    # A match for an unknown or already answered request is ignored
+    adaptive.matched("0", [[4], [5]], [[0.9], [0.8]])
+    assert adaptive.inferred == 2
+
+
+def test_shed_and_expired_windows_count_as_misses():
+    adaptive = AdaptiveRate(2, threshold=0.5, confirmations=1, stable_stride=2, subjects=[4, 5])
+    adaptive.record_batch("0", [0, 1])
+    adaptive.matched("0", [[4], [5]], [[0.9], [0.8]])
+    adaptive.record_batch("1", [0, 1])
+    adaptive.expired("1")
+    adaptive.shed([1])
+    assert (adaptive.inferred, adaptive.skipped, adaptive.missed) == (2, 0, 3)
+    assert adaptive.emitted() == 5
+    assert adaptive.tracks[1].reported == [5, None, None]
+    assert adaptive.accuracy() == pytest.approx(2 / 5.0)
+    # Expiring an unknown request misses nothing
+    adaptive.expired("1")
+    assert adaptive.missed == 3
+
+
+def test_accuracy_without_subjects():
+    assert AdaptiveRate(1, 0.5, 1, 2).accuracy() is None
+    assert AdaptiveRate(1, 0.5, 1, 2, subjects=[0]).accuracy() == 0.0
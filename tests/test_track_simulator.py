@@ -0,0 +1,60 @@
+import numpy as np
+
+from track_simulator import DynamicBatcher
+
+SAMPLE_SHAPE = (2, 3, 3)
+MS = 10**6
+
+
+def window(value):
+    return np.full(SAMPLE_SHAPE, value, dtype=np.float32)
+
+
+def test_batch_released_when_full_or_late():
+    batcher = DynamicBatcher(3, 5 * MS, SAMPLE_SHAPE, np.float32)
+    assert not batcher.ready(0)
+    assert batcher.deadline() is None
+    batcher.add(0, 10 * MS, window(0))
+    batcher.add(1, 11 * MS, window(1))
+    assert batcher.deadline() == 15 * MS
+    assert not batcher.ready(14 * MS)
+    assert batcher.ready(15 * MS)
+    batcher.add(2, 12 * MS, window(2))
+    batcher.add(3, 13 * MS, window(3))
+    assert batcher.ready(12 * MS)
+    batch, members = batcher.pop_batch()
+    assert members == [(0, 10 * MS), (1, 11 * MS), (2, 12 * MS)]
+    assert batch.shape == (3,) + SAMPLE_SHAPE
+    assert [int(sample[0, 0, 0]) for sample in batch] == [0, 1, 2]
+    # The leftover window starts the next batch
+    assert batcher.deadline() == 18 * MS
+    batch, members = batcher.pop_batch()
+    assert members == [(3, 13 * MS)]
+    assert batch.shape == (1,) + SAMPLE_SHAPE
+
+
+def test_shed_superseded_and_late_windows():
+    batcher = DynamicBatcher(8, 5 * MS, SAMPLE_SHAPE, np.float32)
+    batcher.add(0, 1 * MS, window(0))
+    batcher.add(1, 2 * MS, window(1))
+    batcher.add(0, 3 * MS, window(2))
+    batcher.add(2, 4 * MS, window(3))
+    batcher.add(3, 9 * MS, window(4))
+    # Windows emitted before 4 ms would miss their deadline
+    dropped = batcher.shed(lambda emit_ns: emit_ns < 4 * MS)
+    assert dropped == [(0, 1 * MS), (1, 2 * MS), (0, 3 * MS)]
+    assert [(t, e) for t, e, _ in batcher.pending] == [(2, 4 * MS), (3, 9 * MS)]
+    # Without a deadline only the superseded windows go
+    batcher.add(2, 10 * MS, window(5))
+    assert batcher.shed(lambda emit_ns: False) == [(2, 4 * MS)]
+    assert [(t, e) for t, e, _ in batcher.pending] == [(3, 9 * MS), (2, 10 * MS)]
+
+
+def test_detach_copies_the_pending_windows_of_a_track():
+    batcher = DynamicBatcher(4, MS, SAMPLE_SHAPE, np.float32)
+    view = window(1)
+    batcher.add(0, 0, view)
+    batcher.detach(0)
+    view[:] = 7
+    batch, _ = batcher.pop_batch()
+    assert np.all(batch[0] == 1)
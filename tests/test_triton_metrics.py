@@ -0,0 +1,54 @@
+import math
+
+from triton_metrics import MODEL_COUNTERS, MetricsClient, metric_value, parse_metrics
+
+METRICS = """\
+# HELP nv_inference_request_success Number of successful inference requests, all batch sizes
+# TYPE nv_inference_request_success counter
+nv_inference_request_success{model="3D_best_0_batchd",version="1"} 3196
+nv_inference_request_success{model="3D_best_0_batchd",version="2"} 4
+nv_inference_request_success{model="3D_best_0_batchd_v2",version="1"} 7
+nv_inference_count{model="3D_best_0_batchd",version="1"} 25154 1700000000000
+nv_inference_queue_duration_us{version="1",model="3D_best_0_batchd"} 1.5e3
+nv_gpu_utilization{gpu_uuid="GPU-0"} 0.25
+nv_gpu_utilization{gpu_uuid="GPU-1"} 0.75
+nv_energy_consumption +Inf
+weird{label="a \\"quoted\\" value, with a comma"} 1
+this line is not a sample
+broken{model="x" 3
+"""
+
+
+def test_parse_names_labels_and_values():
+    metrics = parse_metrics(METRICS)
+    success = metrics["nv_inference_request_success"]
+    assert success[(("model", "3D_best_0_batchd"), ("version", "1"))] == 3196
+    # Timestamps are ignored and label order does not matter
+    assert metrics["nv_inference_count"][(("model", "3D_best_0_batchd"), ("version", "1"))] == 25154
+    assert metrics["nv_inference_queue_duration_us"][(("model", "3D_best_0_batchd"), ("version", "1"))] == 1500
+    assert metrics["nv_energy_consumption"][()] == math.inf
+    assert metrics["weird"][(("label", 'a "quoted" value, with a comma'),)] == 1
+    assert "broken" not in metrics
+    assert "this" not in metrics
+
+
+def test_metric_value_matches_labels_exactly():
+    metrics = parse_metrics(METRICS)
+    # Every version of the model, and not the model with a longer name
+    assert metric_value(metrics, "nv_inference_request_success", model="3D_best_0_batchd") == 3200
+    assert metric_value(metrics, "nv_inference_request_success",
+                        model="3D_best_0_batchd", version="2") == 4
+    assert metric_value(metrics, "nv_gpu_utilization") == 1.0
+    assert metric_value(metrics, "nv_inference_request_success", model="missing") is None
+    assert metric_value(metrics, "missing") is None
+
+
+def test_model_counters_default_to_zero():
+    client = MetricsClient("localhost:8002")
+    assert client.url == "http://localhost:8002/metrics"
+    counters = client.model_counters("3D_best_0_batchd", parse_metrics(METRICS))
+    client.close()
+    assert set(counters) == set(MODEL_COUNTERS)
+    assert counters["nv_inference_request_success"] == 3200
+    assert counters["nv_inference_count"] == 25154
+    assert counters["nv_inference_request_failure"] == 0
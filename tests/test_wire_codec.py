@@ -0,0 +1,71 @@
+import gzip
+import zlib
+
+import numpy as np
+import pytest
+
+from wire_codec import COMPRESSORS, WireEncoder, request_bytes
+
+
+@pytest.fixture
+def batch():
+    return np.random.RandomState(0).uniform(-2.0, 2.0, (8, 5, 6, 6, 2)).astype(np.float32)
+
+
+def test_fp32_is_passed_through(batch):
+    encoder = WireEncoder("FP32")
+    assert encoder.encode(batch) is batch
+    np.testing.assert_array_equal(encoder.decode(batch), batch)
+
+
+def test_fp16_round_trip(batch):
+    encoder = WireEncoder("FP16")
+    encoded = encoder.encode(batch)
+    assert encoded.dtype == np.float16
+    assert encoded.nbytes == batch.nbytes // 2
+    np.testing.assert_allclose(encoder.decode(encoded), batch, rtol=2 ** -11, atol=1e-7)
+
+
+def test_int8_round_trip_within_half_a_step(batch):
+    encoder = WireEncoder("INT8")
+    encoded = encoder.encode(batch)
+    assert encoded.dtype == np.int8
+    assert encoded.nbytes == batch.nbytes // 4
+    # Calibrated on the first batch: max |x| maps to 127
+    assert encoder.scale == pytest.approx(np.abs(batch).max() / 127.0)
+    assert np.abs(encoded).max() == 127
+    error = np.abs(encoder.decode(encoded) - batch).max()
+    assert error <= encoder.scale / 2 + 1e-6
+
+
+def test_int8_zero_point_and_clipping():
+    encoder = WireEncoder("INT8", scale=0.5, zero_point=10)
+    values = np.array([[-100.0, -1.0, 0.0, 1.0, 100.0]], dtype=np.float32)
+    encoded = encoder.encode(values)
+    np.testing.assert_array_equal(encoded, [[-128, 8, 10, 12, 127]])
+    np.testing.assert_allclose(encoder.decode(encoded), [[-69.0, -1.0, 0.0, 1.0, 58.5]])
+
+
+def test_buffers_are_reused(batch):
+    encoder = WireEncoder("FP16")
+    first = encoder.encode(batch)
+    second = encoder.encode(batch[:3])
+    assert second.shape == (3,) + batch.shape[1:]
+    assert np.shares_memory(first, second)
+    out = np.empty(batch.shape, dtype=np.float16)
+    assert encoder.encode(batch, out=out) is out
+    assert encoder.encoded == 3
+
+
+def test_unsupported_datatype():
+    with pytest.raises(Exception):
+        WireEncoder("BF16")
+
+
+def test_request_bytes_of_compressed_tensors(batch):
+    encoded = WireEncoder("INT8").encode(batch)
+    raw = encoded.tobytes()
+    assert request_bytes(encoded) == len(raw)
+    assert gzip.decompress(COMPRESSORS["gzip"](raw)) == raw
+    assert zlib.decompress(COMPRESSORS["deflate"](raw)) == raw
+    assert request_bytes(encoded, "gzip") == len(gzip.compress(raw))
@@ -0,0 +1,145 @@
+import threading
+
+
+class TrackIdentity:
+    """
+    Identity of one track fused over time: the top-k gallery scores of
+    every inferred window are added to per-identity scores that decay by
+    `decay` per window. The confidence of the decision is the margin of
+    the best identity over the second one, relative to the best score.
+    """
+
+    def __init__(self, decay):
+        self.decay = decay
+        self.scores = {}
+        self.updates = 0
+        # Windows since the last inference once the track is stable
+        self.skipped_in_row = 0
+        # Identity reported for every window of the track, in order
+        self.reported = []
+
+    def update(self, labels, scores):
+        self.scores = dict((label, score * self.decay) for label, score in self.scores.items())
+        for label, score in zip(labels, scores):
+            self.scores[label] = self.scores.get(label, 0.0) + max(float(score), 0.0)
+        self.updates += 1
+
+    def decision(self):
+        """
+        (identity, confidence), or (None, 0.0) before the first window.
+        """
+        if not self.scores:
+            return None, 0.0
+        ranked = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)
+        label, best = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        return label, (best - second) / best if best > 0 else 0.0
+
+
+class AdaptiveRate:
+    """
+    Per-track identity fusion and inference rate control for the
+    multi-person mode. New and ambiguous tracks are inferred on every
+    window; once a track has fused `confirmations` windows and its
+    confidence reaches `threshold`, only one window in `stable_stride` is
+    sent and the others are answered with the fused identity. A stable
+    track whose confidence drops below the threshold goes back to full
+    rate.
+
+    With enabled=False every window is inferred and the identities are
+    only fused and reported, which gives the full-rate baseline.
+
+    subjects, if given, is the true identity (gallery label) of every
+    track, against which accuracy() scores the reported identities.
+
+    A window sent for inference counts as inferred once its match
+    arrives. One that never gets an answer (shed before sending, or
+    expired in the server) is missed: it is reported with no identity, so
+    it counts as wrong in accuracy().
+    """
+
+    def __init__(self, num_tracks, threshold, confirmations, stable_stride, decay=0.8, enabled=True,
+                 subjects=None):
+        self.threshold = threshold
+        self.confirmations = confirmations
+        self.stable_stride = max(stable_stride, 1)
+        self.enabled = enabled
+        self.tracks = [TrackIdentity(decay) for _ in range(num_tracks)]
+        self.subjects = list(subjects) if subjects is not None else None
+        self.inferred = 0
+        self.skipped = 0
+        self.missed = 0
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def stable(self, track):
+        return track.updates >= self.confirmations and track.decision()[1] >= self.threshold
+
+    def should_infer(self, track_id):
+        """
+        Called for every emitted window: True if it must be sent, else it
+        is counted as skipped and reported with the fused identity.
+        """
+        with self._lock:
+            track = self.tracks[track_id]
+            if not self.enabled or not self.stable(track) or track.skipped_in_row + 1 >= self.stable_stride:
+                track.skipped_in_row = 0
+                return True
+            track.skipped_in_row += 1
+            track.reported.append(track.decision()[0])
+            self.skipped += 1
+            return False
+
+    def record_batch(self, request_id, track_ids):
+        with self._lock:
+            self._members[request_id] = track_ids
+
+    def matched(self, request_id, labels, scores):
+        """
+        Gallery matches (top-k labels and scores per sample) of a request.
+        """
+        with self._lock:
+            track_ids = self._members.pop(request_id, None)
+            if track_ids is None:
+                return
+            for track_id, window_labels, window_scores in zip(track_ids, labels, scores):
+                track = self.tracks[track_id]
+                track.update(window_labels, window_scores)
+                track.reported.append(window_labels[0])
+                self.inferred += 1
+
+    def shed(self, track_ids):
+        """
+        Windows that were to be inferred but were never sent.
+        """
+        with self._lock:
+            self._miss(track_ids)
+
+    def expired(self, request_id, completion_ns=None):
+        with self._lock:
+            self._miss(self._members.pop(request_id, ()))
+
+    def _miss(self, track_ids):
+        for track_id in track_ids:
+            self.tracks[track_id].reported.append(None)
+            self.missed += 1
+
+    def emitted(self):
+        return self.inferred + self.skipped + self.missed
+
+    def stable_tracks(self):
+        return sum(1 for track in self.tracks if self.stable(track))
+
+    def accuracy(self):
+        """
+        Share of the windows (inferred, skipped or missed) whose reported
+        identity is the true subject of their track, or None without
+        subjects.
+        """
+        if self.subjects is None:
+            return None
+        correct = total = 0
+        for track, subject in zip(self.tracks, self.subjects):
+            correct += sum(1 for label in track.reported if label == subject)
+            total += len(track.reported)
+        return correct / float(total) if total else 0.0
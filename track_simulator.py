@@ -0,0 +1,201 @@
+import random
+import threading
+
+import numpy as np
+
+from flow_stacker import FlowStacker
+from latency_histogram import LatencyHistogram
+
+
+class Track:
+    """
+    One simulated person. Every 1/rate seconds it emits an optical-flow
+    window (e.g. 25x60x60x2) to be identified. The first emission is at a
+    random phase so the tracks are not synchronised.
+
+    With a FlowStacker the track is a live stream: it replays the frames
+    of its window in a loop, pushing stride new frames into the stacker
+    per emission, and window is the stacker view of the last frames
+    (valid until the next emission).
+    """
+
+    def __init__(self, track_id, rate, window, start_ns, rng, stacker=None):
+        self.track_id = track_id
+        self.period_ns = int(1e9 / rate)
+        self.window = window
+        self.next_emit_ns = start_ns + int(rng.random() * self.period_ns)
+        self.emitted = 0
+        self.stacker = stacker
+        if stacker is not None:
+            self.frames = stacker.split(window)
+            self.next_frame = 0
+
+    def emit(self):
+        emit_ns = self.next_emit_ns
+        self.next_emit_ns += self.period_ns
+        self.emitted += 1
+        if self.stacker is not None:
+            while True:
+                ready = self.stacker.push(self.frames[self.next_frame])
+                self.next_frame = (self.next_frame + 1) % len(self.frames)
+                if ready:
+                    break
+            self.window = self.stacker.window()
+        return emit_ns
+
+
+def make_tracks(num_tracks, rate, sample_shape, dtype, start_ns, seed=None, dataset=None,
+                frames=0, stride=1):
+    """
+    Creates the tracks, each with a random window or, given a
+    SampleDataset, with a real sample of it (track i gets sample i). With
+    frames > 0 every track streams the frames of its window through a
+    FlowStacker of that many frames, emitting a window every stride
+    frames.
+    """
+    rng = random.Random(seed)
+    if dataset is not None:
+        windows = [dataset.sample(i) for i in range(num_tracks)]
+    else:
+        windows = [np.random.rand(*sample_shape).astype(dtype) for _ in range(num_tracks)]
+    tracks = []
+    for i, window in enumerate(windows):
+        stacker = FlowStacker(sample_shape, dtype, frames, stride) if frames > 0 else None
+        tracks.append(Track(i, rate, window, start_ns, rng, stacker))
+    return tracks
+
+
+class DynamicBatcher:
+    """
+    Client-side dynamic batcher. Pending windows are packed into batches
+    of up to max_batch_size; a batch is released as soon as it is full or
+    when its oldest window has waited max_wait_ns.
+    """
+
+    def __init__(self, max_batch_size, max_wait_ns, sample_shape, dtype):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ns = max_wait_ns
+        # (track_id, emit_ns, window)
+        self.pending = []
+        # Requests serialize the input when they are created, so a single
+        # staging buffer can be reused for every batch.
+        self.buffer = np.empty((max_batch_size,) + tuple(sample_shape), dtype=dtype)
+
+    def add(self, track_id, emit_ns, window):
+        self.pending.append((track_id, emit_ns, window))
+
+    def shed(self, would_miss):
+        """
+        Drops the pending windows that are superseded by a newer window of
+        the same track, and those for which would_miss(emit_ns) is True.
+        Returns the dropped [(track_id, emit_ns), ...].
+        """
+        newest = {}
+        for track_id, emit_ns, _ in self.pending:
+            newest[track_id] = max(newest.get(track_id, emit_ns), emit_ns)
+        kept = []
+        dropped = []
+        for track_id, emit_ns, window in self.pending:
+            if emit_ns < newest[track_id] or would_miss(emit_ns):
+                dropped.append((track_id, emit_ns))
+            else:
+                kept.append((track_id, emit_ns, window))
+        self.pending = kept
+        return dropped
+
+    def detach(self, track_id):
+        """
+        Copies the pending windows of a track, for when they are views
+        that the track is about to overwrite (FlowStacker).
+        """
+        for i, (pending_id, emit_ns, window) in enumerate(self.pending):
+            if pending_id == track_id:
+                self.pending[i] = (pending_id, emit_ns, window.copy())
+
+    def deadline(self):
+        """
+        Time (ns) at which the oldest pending window must be dispatched,
+        or None if nothing is pending.
+        """
+        if not self.pending:
+            return None
+        return self.pending[0][1] + self.max_wait_ns
+
+    def ready(self, now_ns):
+        return len(self.pending) >= self.max_batch_size or (
+            self.pending and now_ns >= self.deadline()
+        )
+
+    def pop_batch(self):
+        """
+        Packs up to max_batch_size pending windows into the staging buffer
+        and returns (batch view, [(track_id, emit_ns), ...]).
+        """
+        members = self.pending[: self.max_batch_size]
+        del self.pending[: self.max_batch_size]
+        for i, (_, _, window) in enumerate(members):
+            self.buffer[i] = window
+        return self.buffer[: len(members)], [(t, e) for t, e, _ in members]
+
+
+class TrackStats:
+    """
+    Per-track window latency (emission to response) and batch fill
+    statistics of a track simulation. record_completion is called from
+    the client completion path, possibly from another thread.
+    """
+
+    def __init__(self, num_tracks, max_batch_size, frame_budget_ns):
+        self.max_batch_size = max_batch_size
+        self.frame_budget_ns = frame_budget_ns
+        self.track_latencies = [LatencyHistogram() for _ in range(num_tracks)]
+        self.window_latencies = LatencyHistogram()
+        self.batches = 0
+        self.windows = 0
+        self.late_windows = 0
+        self.expired_windows = 0
+        self._members = {}
+        self._lock = threading.Lock()
+
+    def record_batch(self, request_id, members):
+        with self._lock:
+            self._members[request_id] = members
+            self.batches += 1
+            self.windows += len(members)
+
+    def record_completion(self, request_id, completion_ns):
+        with self._lock:
+            members = self._members.pop(request_id, None)
+            if members is None:
+                return
+            for track_id, emit_ns in members:
+                latency_ns = completion_ns - emit_ns
+                self.track_latencies[track_id].record(latency_ns)
+                self.window_latencies.record(latency_ns)
+                if latency_ns > self.frame_budget_ns:
+                    self.late_windows += 1
+
+    def record_expired(self, request_id, completion_ns=None):
+        """
+        Forgets a request the server dropped when its timeout expired.
+        """
+        with self._lock:
+            members = self._members.pop(request_id, None)
+            if members is not None:
+                self.expired_windows += len(members)
+
+    def fill_ratio(self):
+        if self.batches == 0:
+            return 0.0
+        return self.windows / float(self.batches * self.max_batch_size)
+
+    def mean_batch_size(self):
+        if self.batches == 0:
+            return 0.0
+        return self.windows / float(self.batches)
+
+    def worst_track_p99(self):
+        """
+        p99 latency (ms) of the slowest track.
+        """
+        return max(h.percentile(99) for h in self.track_latencies) / 1e6
@@ -0,0 +1,205 @@
+import math
+import re
+import threading
+import time
+
+import requests
+
+# Per-model counters of Triton sampled by MetricsScraper
+MODEL_COUNTERS = [
+    "nv_inference_request_success",
+    "nv_inference_request_failure",
+    "nv_inference_count",
+    "nv_inference_exec_count",
+    "nv_inference_request_duration_us",
+    "nv_inference_queue_duration_us",
+    "nv_inference_compute_input_duration_us",
+    "nv_inference_compute_infer_duration_us",
+    "nv_inference_compute_output_duration_us",
+]
+# Device gauges, averaged over every GPU that exports them
+GPU_GAUGES = [
+    "nv_gpu_utilization",
+    "nv_gpu_power_usage",
+]
+
+_sample_re = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)(?:\s+\S+)?$")
+_label_re = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"\s*(?:,|$)')
+_escapes = {"\\\\": "\\", '\\"': '"', "\\n": "\n"}
+
+
+def _parse_value(text):
+    if text in ("+Inf", "Inf"):
+        return math.inf
+    if text == "-Inf":
+        return -math.inf
+    return float(text)
+
+
+def _parse_labels(text):
+    labels = []
+    position = 0
+    while position < len(text):
+        match = _label_re.match(text, position)
+        if match is None:
+            if text[position:].strip(" ,"):
+                raise ValueError("Malformed labels: {}".format(text))
+            break
+        value = re.sub(r"\\[\\\"n]", lambda m: _escapes[m.group(0)], match.group(2))
+        labels.append((match.group(1), value))
+        position = match.end()
+    return tuple(sorted(labels))
+
+
+def parse_metrics(text):
+    """
+    Parses the Prometheus text exposition format. Returns
+    {metric name: {labels: value}} where labels is a sorted tuple of
+    (label, value) pairs. Comments, timestamps and malformed lines are
+    skipped.
+    """
+    metrics = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _sample_re.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        try:
+            metrics.setdefault(name, {})[_parse_labels(labels or "")] = _parse_value(value)
+        except ValueError:
+            continue
+    return metrics
+
+
+def metric_value(metrics, name, **labels):
+    """
+    Sum of the samples of metric name whose labels include all the given
+    ones (model="x" matches every version of x, and only x). Returns None
+    if there is no such sample.
+    """
+    wanted = set(labels.items())
+    values = [value for sample_labels, value in metrics.get(name, {}).items()
+              if wanted.issubset(sample_labels)]
+    return sum(values) if values else None
+
+
+class MetricsClient:
+    """
+    Reads the Triton metrics endpoint over one pooled HTTP session.
+    """
+
+    def __init__(self, url="localhost:8002", timeout=5.0):
+        if "://" not in url:
+            url = "http://" + url
+        if not url.rstrip("/").endswith("/metrics"):
+            url = url.rstrip("/") + "/metrics"
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def scrape(self):
+        """
+        Returns (time.monotonic_ns() of the response, parsed metrics).
+        """
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return time.monotonic_ns(), parse_metrics(response.text)
+
+    def model_counters(self, model_name, metrics=None, version=None):
+        """
+        Returns {counter: value} of MODEL_COUNTERS for model_name (one name,
+        or a list of names whose counters are added up), of one version if
+        given, with 0 for the counters the server does not export.
+        """
+        if metrics is None:
+            metrics = self.scrape()[1]
+        names = [model_name] if isinstance(model_name, str) else model_name
+        labels = {"version": str(version)} if version else {}
+        return dict((counter, sum(metric_value(metrics, counter, model=name, **labels) or 0.0
+                                  for name in names))
+                    for counter in MODEL_COUNTERS)
+
+    def close(self):
+        self.session.close()
+
+
+class MetricsScraper(threading.Thread):
+    """
+    Scrapes the counters of a model (or the sum of a list of models) and
+    the GPU gauges every interval seconds in a background thread, building
+    a time series of (time.monotonic_ns(), {metric: value}) while running.
+    The thread sleeps on an event between scrapes, so stop() returns at
+    once.
+    """
+
+    def __init__(self, client, model_name, interval):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.client = client
+        self.model_name = model_name
+        self.interval = interval
+        self.series = []
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def _sample(self):
+        try:
+            t, metrics = self.client.scrape()
+        except requests.RequestException:
+            self.errors += 1
+            return
+        values = self.client.model_counters(self.model_name, metrics)
+        for name in GPU_GAUGES:
+            samples = list(metrics.get(name, {}).values())
+            values[name] = sum(samples) / len(samples) if samples else None
+        self.series.append((t, values))
+
+    def run(self):
+        next_t = time.monotonic()
+        while not self._stop_event.is_set():
+            self._sample()
+            next_t += self.interval
+            self._stop_event.wait(max(next_t - time.monotonic(), 0.0))
+        # Closing sample, so the last interval ends with the run
+        self._sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def intervals(self):
+        """
+        Derives per-interval rates from the time series: throughput
+        (inferences/s), requests/s, mean queue, compute-infer and request
+        time per request (ms), mean batch per execution and the GPU
+        gauges at the end of the interval.
+        """
+        rows = []
+        for (t0, v0), (t1, v1) in zip(self.series, self.series[1:]):
+            seconds = (t1 - t0) / 1e9
+            if seconds <= 0:
+                continue
+
+            def delta(name):
+                return v1[name] - v0[name]
+
+            requests_done = delta("nv_inference_request_success")
+            executions = delta("nv_inference_exec_count")
+            row = {
+                "time_s": (t1 - self.series[0][0]) / 1e9,
+                "throughput": delta("nv_inference_count") / seconds,
+                "request_rate": requests_done / seconds,
+                "failures": delta("nv_inference_request_failure"),
+                "mean_batch": delta("nv_inference_count") / executions if executions > 0 else 0.0,
+            }
+            for key, name in (("queue_ms", "nv_inference_queue_duration_us"),
+                              ("compute_infer_ms", "nv_inference_compute_infer_duration_us"),
+                              ("request_ms", "nv_inference_request_duration_us")):
+                row[key] = delta(name) / requests_done / 1000.0 if requests_done > 0 else 0.0
+            for name in GPU_GAUGES:
+                row[name] = v1[name]
+            rows.append(row)
+        return rows
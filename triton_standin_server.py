@@ -0,0 +1,884 @@
+"""
+Stand-in for the Triton inference server, for exercising the clients in
+this repository on machines without a Jetson.
+
+It implements the subset of the KServe v2 HTTP and gRPC protocols used
+by 3DGait_client_ver2.py (model metadata/config, inference with the
+binary tensor extension and gzip/deflate request bodies, gRPC streaming
+and system shared-memory registration) plus the Prometheus /metrics
+endpoint with the nv_inference_* counters and nv_gpu_* gauges. Inference
+is simulated on a single device: every execution holds it for base +
+per_sample * batch milliseconds and returns a deterministic output
+computed from the input. With --max-queue-delay, queued requests of a
+model are merged into one execution as by Triton's dynamic batcher.
+
+With --sysfs-root the server also keeps a fake sysfs tree of INA3221
+sensors, the files EnergyMeter reads, whose currents follow the device
+utilization, so the client can be benchmarked end to end:
+
+    python triton_standin_server.py --sysfs-root /tmp/standin_sys
+    python 3DGait_client_ver2.py -m 3D_best_0_batchd -a -b 8 -conc 4 --sysfs-root /tmp/standin_sys
+"""
+
+import argparse
+import gzip
+import json
+import os
+import queue
+import re
+import socket
+import struct
+import threading
+import time
+import zlib
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory as mpshm
+
+import numpy as np
+from tritonclient.utils import np_to_triton_dtype, triton_to_np_dtype
+
+from energy_meter_siroco import create_fake_sysfs, load_sensor_map
+
+# name=INPUTxSHAPE:OUTPUTxSHAPE (shapes without the batch dimension)
+DEFAULT_MODELS = [
+    "3D_best_0_batchd=25x60x60x2:256",
+    "2D_int8_40_batchd=50x60x60:256",
+]
+
+# Power (mW) of every rail when the device is idle and added at full
+# utilization; rails not listed draw RAIL_POWER_DEFAULT
+RAIL_POWER = {
+    "GPU": (1000, 9000),
+    "CPU": (1500, 1500),
+    "SOC": (2000, 2000),
+    "VDDRQ": (500, 800),
+    "SYS5V": (3000, 1000),
+}
+RAIL_POWER_DEFAULT = (500, 0)
+
+
+def parse_model_spec(spec):
+    name, shapes = spec.split("=")
+    input_shape, output_shape, *datatype = shapes.split(":")
+    return (
+        name,
+        [int(d) for d in input_shape.split("x")],
+        [int(d) for d in output_shape.split("x")],
+        datatype[0] if datatype else "FP32",
+    )
+
+
+def parse_rail_power(specs):
+    """
+    Parses RAIL=IDLE:LOAD (mW) entries over the RAIL_POWER defaults.
+    """
+    rail_power = dict(RAIL_POWER)
+    for spec in specs or []:
+        rail, powers = spec.split("=")
+        idle, load = powers.split(":")
+        rail_power[rail] = (float(idle), float(load))
+    return rail_power
+
+
+class StandinModel:
+    """
+    A simulated model with one input (FP32 unless input_datatype says
+    otherwise, e.g. the FP16 or INT8 input of a reduced-precision engine)
+    and one FP32 output. Requests
+    are executed on a Device shared by all models, as on a single GPU, and
+    accounted in Triton-style cumulative counters.
+    """
+
+    def __init__(self, name, input_shape, output_shape, max_batch_size,
+                 base_latency, per_sample_latency, device, latency_jitter=0.0,
+                 input_datatype="FP32"):
+        self.name = name
+        self.version = "1"
+        self.input_name = "input_1"
+        self.output_name = "output_1"
+        self.input_shape = list(input_shape)
+        self.input_datatype = input_datatype
+        self.output_shape = list(output_shape)
+        self.max_batch_size = max_batch_size
+        self.base_latency = base_latency
+        self.per_sample_latency = per_sample_latency
+        self.latency_jitter = latency_jitter
+        self.device = device
+        self.rng = np.random.RandomState(1)
+        self.counters_lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            [
+                "request_success",
+                "request_failure",
+                "count",
+                "exec_count",
+                "request_duration_us",
+                "queue_duration_us",
+                "compute_input_duration_us",
+                "compute_infer_duration_us",
+                "compute_output_duration_us",
+            ],
+            0,
+        )
+        # Fixed projection from a strided view of the input to the output
+        size = int(np.prod(self.output_shape))
+        self.projection = np.random.RandomState(0).standard_normal((64, size)).astype(np.float32)
+
+    def _batch_dims(self):
+        return [-1] if self.max_batch_size > 0 else []
+
+    def batch_size(self, batch):
+        return batch.shape[0] if self.max_batch_size > 0 else 1
+
+    def metadata(self):
+        return {
+            "name": self.name,
+            "versions": [self.version],
+            "platform": "tensorrt_plan",
+            "inputs": [{"name": self.input_name, "datatype": self.input_datatype,
+                        "shape": self._batch_dims() + self.input_shape}],
+            "outputs": [{"name": self.output_name, "datatype": "FP32",
+                         "shape": self._batch_dims() + self.output_shape}],
+        }
+
+    def config(self):
+        config = {
+            "name": self.name,
+            "platform": "tensorrt_plan",
+            "max_batch_size": self.max_batch_size,
+            "input": [{"name": self.input_name, "data_type": "TYPE_" + self.input_datatype,
+                       "format": "FORMAT_NONE", "dims": self.input_shape}],
+            "output": [{"name": self.output_name, "data_type": "TYPE_FP32",
+                        "dims": self.output_shape}],
+        }
+        if self.device.max_queue_delay_us is not None and self.max_batch_size > 0:
+            config["dynamic_batching"] = {
+                "max_queue_delay_microseconds": self.device.max_queue_delay_us}
+        return config
+
+    def compute(self, batch, timeout_us=None):
+        """
+        Runs the simulated inference on batch (leading batch dimension)
+        and returns the output array. A request with a timeout that is
+        still queued when it expires fails, as in Triton.
+        """
+        return self.device.submit(self, batch, timeout_us)
+
+    def execute(self, requests, start_ns):
+        """
+        Executes the DeviceRequests of one batch, holding the device for
+        the latency of the whole batch, and completes them.
+        """
+        sizes = [self.batch_size(request.batch) for request in requests]
+        batch_size = sum(sizes)
+        flat = np.concatenate([request.batch.reshape(size, -1)
+                               for request, size in zip(requests, sizes)])
+        for request in requests:
+            # The input may be a view of a shared-memory region, which
+            # cannot be unregistered while it is referenced
+            request.batch = None
+        features = flat[:, :: max(1, flat.shape[1] // 64)][:, :64]
+        if features.shape[1] < 64:
+            features = np.pad(features, ((0, 0), (0, 64 - features.shape[1])))
+        output = features.astype(np.float32) @ self.projection
+        latency = self.base_latency + self.per_sample_latency * batch_size
+        if self.latency_jitter > 0:
+            latency *= max(0.0, 1.0 + self.latency_jitter * self.rng.standard_normal())
+        remaining = latency / 1000.0 - (time.monotonic_ns() - start_ns) / 1e9
+        if remaining > 0:
+            time.sleep(remaining)
+        end_ns = time.monotonic_ns()
+        output = output.reshape([batch_size] + self.output_shape)
+        with self.counters_lock:
+            self.counters["exec_count"] += 1
+            for request, size in zip(requests, sizes):
+                self.counters["request_success"] += 1
+                self.counters["count"] += size
+                self.counters["request_duration_us"] += (end_ns - request.received_ns) // 1000
+                self.counters["queue_duration_us"] += (start_ns - request.received_ns) // 1000
+                self.counters["compute_infer_duration_us"] += (end_ns - start_ns) // 1000
+        offset = 0
+        for request, size in zip(requests, sizes):
+            request.output = output[offset: offset + size]
+            if self.max_batch_size == 0:
+                request.output = request.output[0]
+            offset += size
+            request.done.set()
+
+    def record_failure(self):
+        with self.counters_lock:
+            self.counters["request_failure"] += 1
+
+
+class RequestTimeout(ValueError):
+    """
+    The request spent longer than its timeout in the queue. Triton reports
+    this as UNAVAILABLE, HTTP 503, rather than as an invalid request.
+    """
+
+
+class DeviceRequest:
+    def __init__(self, model, batch, timeout_us):
+        self.model = model
+        self.batch = batch
+        self.timeout_us = timeout_us
+        self.received_ns = time.monotonic_ns()
+        self.output = None
+        self.error = None
+        self.timed_out = False
+        self.done = threading.Event()
+
+
+class Device:
+    """
+    The simulated GPU. Requests of every model wait in one queue and are
+    executed one batch at a time in arrival order. With dynamic batching
+    (max_queue_delay_us not None), the queued requests of the model at the
+    head are merged into one execution of up to max_batch_size, waiting at
+    most max_queue_delay_us from the oldest one for the batch to fill.
+    """
+
+    def __init__(self, max_queue_delay_us=None):
+        self.max_queue_delay_us = max_queue_delay_us
+        self.cond = threading.Condition()
+        self.queue = []
+        # Execution time so far, and start of the running execution
+        self.busy_ns = 0
+        self.busy_since_ns = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, model, batch, timeout_us=None):
+        request = DeviceRequest(model, batch, timeout_us)
+        with self.cond:
+            self.queue.append(request)
+            self.cond.notify_all()
+        request.done.wait()
+        if request.timed_out:
+            raise RequestTimeout(request.error)
+        if request.error is not None:
+            raise ValueError(request.error)
+        return request.output
+
+    def busy_time_ns(self):
+        """
+        Execution time so far, including the running execution.
+        """
+        with self.cond:
+            busy_ns = self.busy_ns
+            if self.busy_since_ns is not None:
+                busy_ns += time.monotonic_ns() - self.busy_since_ns
+        return busy_ns
+
+    def _take(self):
+        while not self.queue:
+            self.cond.wait()
+        head = self.queue[0]
+        model = head.model
+        if self.max_queue_delay_us is None or model.max_batch_size == 0:
+            taken = [head]
+        else:
+            deadline_ns = head.received_ns + self.max_queue_delay_us * 1000
+            while True:
+                queued = sum(model.batch_size(r.batch) for r in self.queue if r.model is model)
+                remaining_ns = deadline_ns - time.monotonic_ns()
+                if queued >= model.max_batch_size or remaining_ns <= 0:
+                    break
+                self.cond.wait(remaining_ns / 1e9)
+            taken = []
+            size = 0
+            for request in self.queue:
+                request_size = model.batch_size(request.batch)
+                if request.model is model and size + request_size <= model.max_batch_size:
+                    taken.append(request)
+                    size += request_size
+        self.queue = [request for request in self.queue if request not in taken]
+        return taken
+
+    def run(self):
+        while True:
+            with self.cond:
+                taken = self._take()
+                start_ns = time.monotonic_ns()
+                self.busy_since_ns = start_ns
+            live = []
+            for request in taken:
+                if request.timeout_us and start_ns - request.received_ns > request.timeout_us * 1000:
+                    request.error = "Request timeout expired"
+                    request.timed_out = True
+                    request.batch = None
+                    request.done.set()
+                else:
+                    live.append(request)
+            try:
+                if live:
+                    live[0].model.execute(live, start_ns)
+            except Exception as e:
+                for request in live:
+                    if not request.done.is_set():
+                        request.error = str(e)
+                        request.batch = None
+                        request.done.set()
+            with self.cond:
+                self.busy_ns += time.monotonic_ns() - start_ns
+                self.busy_since_ns = None
+
+
+class PowerModel:
+    """
+    Power drawn by the simulated board: every interval the utilization of
+    the device over the interval sets the power of each rail to
+    idle + load * utilization (RAIL_POWER, mW). With a sysfs root, the
+    current and voltage files of the INA3221 rails of device_name are
+    created there and rewritten every interval at a constant voltage.
+    """
+
+    def __init__(self, device, interval, rail_power, sysfs_root=None,
+                 device_name="orin2", voltage=5000, config=None):
+        self.device = device
+        self.interval = interval
+        self.rail_power = rail_power
+        self.voltage = voltage
+        self.utilization = 0.0
+        self.current_fds = {}
+        if sysfs_root is not None:
+            rails = list(load_sensor_map(device_name, config))
+            files = create_fake_sysfs(
+                sysfs_root, device_name, dict((rail, self._current(rail, 0.0)) for rail in rails),
+                voltage, config)
+            self.current_fds = dict(
+                (rail, os.open(paths[0], os.O_WRONLY)) for rail, paths in files.items())
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def power(self, rail, utilization):
+        idle, load = self.rail_power.get(rail, RAIL_POWER_DEFAULT)
+        return idle + load * utilization
+
+    def _current(self, rail, utilization):
+        return int(round(self.power(rail, utilization) * 1000.0 / self.voltage))
+
+    def run(self):
+        last_ns = time.monotonic_ns()
+        last_busy_ns = self.device.busy_time_ns()
+        while True:
+            time.sleep(self.interval)
+            now_ns = time.monotonic_ns()
+            busy_ns = self.device.busy_time_ns()
+            self.utilization = min(1.0, (busy_ns - last_busy_ns) / max(now_ns - last_ns, 1))
+            last_ns, last_busy_ns = now_ns, busy_ns
+            for rail, fd in self.current_fds.items():
+                # Fixed width, so a shorter value leaves no stale digits
+                os.pwrite(fd, "{:>10d}\n".format(self._current(rail, self.utilization)).encode(), 0)
+
+
+class SharedMemoryRegistry:
+    """
+    System shared-memory regions registered by the clients.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.regions = {}
+
+    def register(self, name, key, offset, byte_size):
+        with self.lock:
+            if name in self.regions:
+                raise ValueError("shared memory region '{}' already in manager".format(name))
+            shm = mpshm.SharedMemory(name=key.lstrip("/"))
+            # The client owns the segment, do not unlink it when we exit
+            resource_tracker.unregister(shm._name, "shared_memory")
+            self.regions[name] = (shm, key, offset, byte_size)
+
+    def unregister(self, name=None):
+        with self.lock:
+            names = [name] if name else list(self.regions)
+            for n in names:
+                region = self.regions.pop(n, None)
+                if region is not None:
+                    region[0].close()
+
+    def status(self, name=None):
+        with self.lock:
+            return [
+                {"name": n, "key": key, "offset": offset, "byte_size": byte_size}
+                for n, (_, key, offset, byte_size) in self.regions.items()
+                if name is None or n == name
+            ]
+
+    def view(self, name, offset, byte_size):
+        with self.lock:
+            if name not in self.regions:
+                raise ValueError("unable to find shared memory region: '{}'".format(name))
+            shm, _, region_offset, region_size = self.regions[name]
+        if offset + byte_size > region_size:
+            raise ValueError("shared memory region '{}' is too small".format(name))
+        start = region_offset + offset
+        return shm.buf[start: start + byte_size]
+
+
+class StandinServer:
+    def __init__(self, models, shared_memory, power=None):
+        self.models = {m.name: m for m in models}
+        self.shared_memory = shared_memory
+        self.power = power
+
+    def infer(self, model, request, binary):
+        """
+        Executes a decoded v2 inference request and returns
+        (response json, [binary output buffers]).
+        """
+        params = request["inputs"][0].get("parameters", {})
+        shape = request["inputs"][0]["shape"]
+        if request["inputs"][0]["datatype"] != model.input_datatype:
+            raise ValueError(
+                "inference input '{}' data-type is '{}', but model '{}' expects '{}'".format(
+                    request["inputs"][0]["name"], request["inputs"][0]["datatype"],
+                    model.name, model.input_datatype))
+        dtype = triton_to_np_dtype(request["inputs"][0]["datatype"])
+        if "shared_memory_region" in params:
+            data = self.shared_memory.view(
+                params["shared_memory_region"],
+                params.get("shared_memory_offset", 0),
+                params["shared_memory_byte_size"],
+            )
+            batch = np.frombuffer(data, dtype=dtype).reshape(shape)
+        elif "binary_data_size" in params:
+            batch = np.frombuffer(binary[: params["binary_data_size"]], dtype=dtype).reshape(shape)
+        else:
+            batch = np.array(request["inputs"][0]["data"], dtype=dtype).reshape(shape)
+        if model.max_batch_size > 0 and shape[0] > model.max_batch_size:
+            raise ValueError(
+                "inference request batch-size must be <= {} for '{}'".format(
+                    model.max_batch_size, model.name))
+
+        output = model.compute(batch, request.get("parameters", {}).get("timeout"))
+
+        requested = (request.get("outputs") or [{"name": model.output_name}])[0]
+        out_params = requested.get("parameters", {})
+        response_output = {"name": model.output_name}
+        buffers = []
+        if out_params.get("classification", 0) > 0:
+            k = out_params["classification"]
+            rows = output.reshape(output.shape[0] if model.max_batch_size > 0 else 1, -1)
+            top = np.argsort(-rows, axis=1)[:, :k]
+            labels = [
+                "{:f}:{}".format(rows[r, i], i).encode() for r in range(rows.shape[0]) for i in top[r]
+            ]
+            data = b"".join(struct.pack("<I", len(l)) + l for l in labels)
+            response_output.update(
+                {"datatype": "BYTES", "shape": [rows.shape[0], k] if model.max_batch_size > 0 else [k],
+                 "parameters": {"binary_data_size": len(data)}})
+            buffers.append(data)
+        else:
+            response_output.update(
+                {"datatype": np_to_triton_dtype(output.dtype), "shape": list(output.shape)})
+            if "shared_memory_region" in out_params:
+                view = self.shared_memory.view(
+                    out_params["shared_memory_region"],
+                    out_params.get("shared_memory_offset", 0),
+                    output.nbytes,
+                )
+                view[:] = output.tobytes()
+                response_output["parameters"] = dict(out_params)
+            elif out_params.get("binary_data", False) or request.get("parameters", {}).get("binary_data_output"):
+                data = output.tobytes()
+                response_output["parameters"] = {"binary_data_size": len(data)}
+                buffers.append(data)
+            else:
+                response_output["data"] = output.flatten().tolist()
+
+        response = {"model_name": model.name, "model_version": model.version,
+                    "outputs": [response_output]}
+        if "id" in request:
+            response["id"] = request["id"]
+        return response, buffers
+
+    def metrics_text(self):
+        families = [
+            ("request_success", "Number of successful inference requests, all batch sizes"),
+            ("request_failure", "Number of failed inference requests, all batch sizes"),
+            ("count", "Number of inferences performed (does not include cached requests)"),
+            ("exec_count", "Number of model executions performed (does not include cached requests)"),
+            ("request_duration_us", "Cumulative inference request duration in microseconds"),
+            ("queue_duration_us", "Cumulative inference queuing duration in microseconds"),
+            ("compute_input_duration_us", "Cumulative compute input duration in microseconds"),
+            ("compute_infer_duration_us", "Cumulative compute inference duration in microseconds"),
+            ("compute_output_duration_us", "Cumulative inference compute output duration in microseconds"),
+        ]
+        lines = []
+        for key, help_text in families:
+            metric = "nv_inference_" + key
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} counter".format(metric))
+            for model in self.models.values():
+                with model.counters_lock:
+                    value = model.counters[key]
+                lines.append('{}{{model="{}",version="{}"}} {}'.format(
+                    metric, model.name, model.version, value))
+        if self.power is not None:
+            utilization = self.power.utilization
+            for metric, help_text, value in (
+                    ("nv_gpu_utilization", "GPU utilization rate [0.0 - 1.0)", utilization),
+                    ("nv_gpu_power_usage", "GPU power usage in watts",
+                     self.power.power("GPU", utilization) / 1000.0)):
+                lines.append("# HELP {} {}".format(metric, help_text))
+                lines.append("# TYPE {} gauge".format(metric))
+                lines.append('{}{{gpu_uuid="standin"}} {}'.format(metric, value))
+        return "\n".join(lines) + "\n"
+
+
+def make_http_handler(server):
+    model_re = re.compile(r"^/v2/models/([^/]+)(?:/versions/([^/]+))?(/config|/infer|/ready)?$")
+    shm_re = re.compile(r"^/v2/systemsharedmemory(?:/region/([^/]+))?/(register|unregister|status)$")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            BaseHTTPRequestHandler.setup(self)
+            # Headers and body are written separately, avoid Nagle delays
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body=b"", headers=None, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, str(value))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status, obj):
+            self._reply(status, json.dumps(obj).encode())
+
+        def _error(self, status, message):
+            self._json(status, {"error": message})
+
+        def _body(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            # Requests compressed by the client (request_compression_algorithm)
+            encoding = self.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                return gzip.decompress(body)
+            if encoding == "deflate":
+                return zlib.decompress(body)
+            return body
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path in ("/v2/health/live", "/v2/health/ready"):
+                return self._reply(200)
+            if path == "/v2":
+                return self._json(200, {"name": "triton-standin", "version": "0", "extensions": [
+                    "binary_tensor_data", "system_shared_memory", "classification"]})
+            if path == "/metrics":
+                return self._reply(200, server.metrics_text().encode(),
+                                   content_type="text/plain; charset=utf-8")
+            match = shm_re.match(path)
+            if match and match.group(2) == "status":
+                return self._json(200, server.shared_memory.status(match.group(1)))
+            match = model_re.match(path)
+            if match is None or match.group(1) not in server.models:
+                return self._error(400, "Request for unknown model")
+            model = server.models[match.group(1)]
+            if match.group(3) == "/config":
+                return self._json(200, model.config())
+            if match.group(3) == "/ready":
+                return self._reply(200)
+            return self._json(200, model.metadata())
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            body = self._body()
+            match = shm_re.match(path)
+            if match:
+                try:
+                    if match.group(2) == "register":
+                        params = json.loads(body)
+                        server.shared_memory.register(
+                            match.group(1), params["key"], params.get("offset", 0),
+                            params["byte_size"])
+                    elif match.group(2) == "unregister":
+                        server.shared_memory.unregister(match.group(1))
+                    else:
+                        return self._error(400, "unsupported shared memory request")
+                except (ValueError, FileNotFoundError) as e:
+                    return self._error(400, str(e))
+                return self._reply(200)
+
+            match = model_re.match(path)
+            if match is None or match.group(3) != "/infer" or match.group(1) not in server.models:
+                return self._error(400, "Request for unknown model")
+            model = server.models[match.group(1)]
+            header_length = self.headers.get("Inference-Header-Content-Length")
+            if header_length is None:
+                request, binary = json.loads(body), b""
+            else:
+                request = json.loads(body[: int(header_length)])
+                binary = body[int(header_length):]
+            try:
+                response, buffers = server.infer(model, request, binary)
+            except (ValueError, KeyError) as e:
+                model.record_failure()
+                return self._error(503 if isinstance(e, RequestTimeout) else 400, str(e))
+            header = json.dumps(response).encode()
+            if buffers:
+                self._reply(200, header + b"".join(buffers),
+                            headers={"Inference-Header-Content-Length": len(header)},
+                            content_type="application/octet-stream")
+            else:
+                self._reply(200, header)
+
+    return Handler
+
+
+def _grpc_parameters(parameters):
+    return dict(
+        (key, getattr(value, value.WhichOneof("parameter_choice")))
+        for key, value in parameters.items()
+        if value.WhichOneof("parameter_choice") is not None)
+
+
+def _set_grpc_parameters(target, parameters):
+    for key, value in parameters.items():
+        if isinstance(value, bool):
+            target[key].bool_param = value
+        elif isinstance(value, int):
+            target[key].int64_param = value
+        else:
+            target[key].string_param = str(value)
+
+
+def make_grpc_servicer(server):
+    """
+    GRPCInferenceService on top of the HTTP request handling: a gRPC
+    request is translated into the v2 JSON request with its raw input as
+    the binary data, and the response back. Needs grpcio.
+    """
+    import grpc
+    from google.protobuf import json_format
+    from tritonclient.grpc import model_config_pb2, service_pb2, service_pb2_grpc
+
+    def infer(request):
+        model = server.models.get(request.model_name)
+        if model is None:
+            raise KeyError("Request for unknown model '{}'".format(request.model_name))
+        binary = request.raw_input_contents[0] if request.raw_input_contents else b""
+        inputs = []
+        for tensor in request.inputs:
+            params = _grpc_parameters(tensor.parameters)
+            if not inputs and request.raw_input_contents:
+                params["binary_data_size"] = len(binary)
+            inputs.append({"name": tensor.name, "shape": list(tensor.shape),
+                           "datatype": tensor.datatype, "parameters": params})
+        outputs = []
+        for tensor in request.outputs:
+            params = _grpc_parameters(tensor.parameters)
+            # gRPC outputs are always raw
+            params.setdefault("binary_data", True)
+            outputs.append({"name": tensor.name, "parameters": params})
+        json_request = {"id": request.id, "inputs": inputs, "outputs": outputs,
+                        "parameters": _grpc_parameters(request.parameters)}
+        try:
+            response, buffers = server.infer(model, json_request, binary)
+        except (ValueError, KeyError):
+            model.record_failure()
+            raise
+        grpc_response = service_pb2.ModelInferResponse(
+            model_name=response["model_name"], model_version=response["model_version"],
+            id=response.get("id", ""))
+        for output in response["outputs"]:
+            tensor = grpc_response.outputs.add(
+                name=output["name"], datatype=output["datatype"], shape=output["shape"])
+            params = dict(output.get("parameters", {}))
+            params.pop("binary_data_size", None)
+            params.pop("binary_data", None)
+            _set_grpc_parameters(tensor.parameters, params)
+        grpc_response.raw_output_contents.extend(buffers)
+        return grpc_response
+
+    def lookup(name, context):
+        if name not in server.models:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "Request for unknown model '{}'".format(name))
+        return server.models[name]
+
+    class Servicer(service_pb2_grpc.GRPCInferenceServiceServicer):
+        def ServerLive(self, request, context):
+            return service_pb2.ServerLiveResponse(live=True)
+
+        def ServerReady(self, request, context):
+            return service_pb2.ServerReadyResponse(ready=True)
+
+        def ModelReady(self, request, context):
+            return service_pb2.ModelReadyResponse(ready=request.name in server.models)
+
+        def ServerMetadata(self, request, context):
+            return service_pb2.ServerMetadataResponse(
+                name="triton-standin", version="0",
+                extensions=["binary_tensor_data", "system_shared_memory", "classification"])
+
+        def ModelMetadata(self, request, context):
+            return json_format.ParseDict(
+                lookup(request.name, context).metadata(), service_pb2.ModelMetadataResponse())
+
+        def ModelConfig(self, request, context):
+            config = json_format.ParseDict(
+                lookup(request.name, context).config(), model_config_pb2.ModelConfig())
+            return service_pb2.ModelConfigResponse(config=config)
+
+        def ModelInfer(self, request, context):
+            try:
+                return infer(request)
+            except RequestTimeout as e:
+                context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+            except (ValueError, KeyError) as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        def ModelStreamInfer(self, request_iterator, context):
+            # Requests of a stream run concurrently, so that the ones in
+            # flight can be batched, and are answered as they complete
+            responses = queue.Queue()
+
+            def handle(request):
+                try:
+                    responses.put(service_pb2.ModelStreamInferResponse(infer_response=infer(request)))
+                except (ValueError, KeyError) as e:
+                    responses.put(service_pb2.ModelStreamInferResponse(
+                        error_message=str(e),
+                        infer_response=service_pb2.ModelInferResponse(id=request.id)))
+
+            def read():
+                with futures.ThreadPoolExecutor(max_workers=64) as executor:
+                    for request in request_iterator:
+                        executor.submit(handle, request)
+                responses.put(None)
+
+            threading.Thread(target=read, daemon=True).start()
+            while True:
+                response = responses.get()
+                if response is None:
+                    return
+                yield response
+
+        def SystemSharedMemoryStatus(self, request, context):
+            response = service_pb2.SystemSharedMemoryStatusResponse()
+            for region in server.shared_memory.status(request.name or None):
+                response.regions[region["name"]].CopyFrom(
+                    service_pb2.SystemSharedMemoryStatusResponse.RegionStatus(**region))
+            return response
+
+        def SystemSharedMemoryRegister(self, request, context):
+            try:
+                server.shared_memory.register(
+                    request.name, request.key, request.offset, request.byte_size)
+            except (ValueError, FileNotFoundError) as e:
+                context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+            return service_pb2.SystemSharedMemoryRegisterResponse()
+
+        def SystemSharedMemoryUnregister(self, request, context):
+            server.shared_memory.unregister(request.name or None)
+            return service_pb2.SystemSharedMemoryUnregisterResponse()
+
+    return Servicer()
+
+
+def serve_grpc(server, port, workers=64):
+    import grpc
+    from tritonclient.grpc import service_pb2_grpc
+
+    grpc_server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=workers),
+        options=[("grpc.max_send_message_length", -1),
+                 ("grpc.max_receive_message_length", -1)])
+    service_pb2_grpc.add_GRPCInferenceServiceServicer_to_server(
+        make_grpc_servicer(server), grpc_server)
+    grpc_server.add_insecure_port("0.0.0.0:{}".format(port))
+    grpc_server.start()
+    return grpc_server
+
+
+def serve(server, port, handler_factory):
+    httpd = ThreadingHTTPServer(("0.0.0.0", port), handler_factory(server))
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--http-port", type=int, default=8000,
+                        help="KServe v2 HTTP port. Default is 8000.")
+    parser.add_argument("--metrics-port", type=int, default=8002,
+                        help="Prometheus metrics port. Default is 8002.")
+    parser.add_argument("--model", action="append", default=None,
+                        help="Model served, as NAME=INPUTSHAPE:OUTPUTSHAPE[:INPUTDATATYPE] "
+                        + "(e.g. 3D_best_0_batchd=25x60x60x2:256, or ...:256:FP16 for an "
+                        + "FP16 input). Can be repeated. "
+                        + "Default is the two models of model_repository.tgz.")
+    parser.add_argument("--max-batch-size", type=int, default=32,
+                        help="max_batch_size of every model. Default is 32.")
+    parser.add_argument("--base-latency", type=float, default=2.0,
+                        help="Fixed compute time (ms) of every execution. Default is 2.")
+    parser.add_argument("--per-sample-latency", type=float, default=0.5,
+                        help="Compute time (ms) added per batch element. Default is 0.5.")
+    parser.add_argument("--latency-jitter", type=float, default=0.0,
+                        help="Relative standard deviation of the execution time. Default is 0.")
+    parser.add_argument("--max-queue-delay", type=float, default=None,
+                        help="Enable dynamic batching: merge queued requests of a model, "
+                        + "waiting up to this many us for the batch to fill. "
+                        + "Default is no dynamic batching.")
+    parser.add_argument("--grpc-port", type=int, default=8001,
+                        help="KServe v2 gRPC port, 0 to disable it (needs grpcio). Default is 8001.")
+    parser.add_argument("--grpc-workers", type=int, default=64,
+                        help="gRPC handler threads, at least the requests in flight. Default is 64.")
+    parser.add_argument("--sysfs-root", type=str, default=None,
+                        help="Keep a fake sysfs tree with the power sensors of --power-device "
+                        + "here, following the device utilization. Default is none.")
+    parser.add_argument("--power-device", type=str, default="orin2",
+                        help="Device of the sensor map simulated under --sysfs-root. Default is orin2.")
+    parser.add_argument("--power-config", type=str, default=None,
+                        help="JSON sensor map. Default is power_sensors.json.")
+    parser.add_argument("--rail-power", action="append", default=None,
+                        help="Power of a rail as RAIL=IDLE:LOAD (mW when idle, added at "
+                        + "full utilization). Can be repeated. Default is e.g. GPU=1000:9000.")
+    parser.add_argument("--power-interval", type=float, default=5.0,
+                        help="Update period (ms) of the utilization and the power readings. Default is 5.")
+    FLAGS = parser.parse_args()
+
+    device = Device(None if FLAGS.max_queue_delay is None else int(FLAGS.max_queue_delay))
+    models = [
+        StandinModel(name, input_shape, output_shape, FLAGS.max_batch_size,
+                     FLAGS.base_latency, FLAGS.per_sample_latency, device, FLAGS.latency_jitter,
+                     input_datatype)
+        for name, input_shape, output_shape, input_datatype
+        in map(parse_model_spec, FLAGS.model or DEFAULT_MODELS)
+    ]
+    power = PowerModel(
+        device, FLAGS.power_interval / 1000.0, parse_rail_power(FLAGS.rail_power),
+        FLAGS.sysfs_root, FLAGS.power_device, config=FLAGS.power_config)
+    server = StandinServer(models, SharedMemoryRegistry(), power)
+    serve(server, FLAGS.http_port, make_http_handler)
+    if FLAGS.metrics_port != FLAGS.http_port:
+        serve(server, FLAGS.metrics_port, make_http_handler)
+    grpc_server = None
+    if FLAGS.grpc_port > 0:
+        grpc_server = serve_grpc(server, FLAGS.grpc_port, FLAGS.grpc_workers)
+    print("Stand-in server: HTTP on {}, gRPC on {}, metrics on {}, models {}".format(
+        FLAGS.http_port, FLAGS.grpc_port if grpc_server is not None else "-",
+        FLAGS.metrics_port, ", ".join(server.models)))
+    if FLAGS.sysfs_root is not None:
+        print("Power sensors of {} under {}".format(FLAGS.power_device, FLAGS.sysfs_root))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        if grpc_server is not None:
+            grpc_server.stop(0)
+        server.shared_memory.unregister()
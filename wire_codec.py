@@ -0,0 +1,147 @@
+"""
+Reduced-precision input transport: FP32 batches converted to the FP16 or
+INT8 input of a model before they are serialized, so a request carries
+two or four times fewer bytes.
+
+    python wire_codec.py -s 25x60x60x2 -b 32
+
+measures the encoding of random or real (a .npy file) batches per wire
+datatype, with the request size after gzip/deflate compression.
+"""
+
+import argparse
+import gzip
+import time
+import zlib
+
+import numpy as np
+from tritonclient.utils import triton_to_np_dtype
+
+WIRE_DTYPES = ("FP32", "FP16", "INT8")
+
+COMPRESSORS = {
+    "none": lambda data: data,
+    # What tritonclient applies to an HTTP request body
+    "gzip": gzip.compress,
+    "deflate": zlib.compress,
+}
+
+
+class WireEncoder:
+    """
+    Converts FP32 batches to datatype (FP32, FP16 or INT8) with vectorized
+    NumPy, writing into preallocated buffers that are reused by every
+    batch. FP16 is a cast; INT8 is the affine quantization
+
+        q = clip(rint(x / scale) + zero_point, -128, 127)
+
+    as in a TensorRT INT8 input. With scale None it is calibrated on the
+    first batch encoded, symmetrically: max |x| / 127.
+
+    The returned batch is a view of the encoder buffer, valid until the
+    next encode(): requests serialize it when they are built.
+    """
+
+    def __init__(self, datatype, scale=None, zero_point=0):
+        if datatype not in WIRE_DTYPES:
+            raise Exception("unsupported wire datatype {}, expected one of {}".format(
+                datatype, ", ".join(WIRE_DTYPES)))
+        self.datatype = datatype
+        self.dtype = np.dtype(triton_to_np_dtype(datatype))
+        self.scale = scale
+        self.zero_point = zero_point
+        self._buffer = None
+        # FP32 work buffer of the INT8 quantization
+        self._scratch = None
+        self.encoded = 0
+
+    @staticmethod
+    def _reuse(buffer, shape, dtype):
+        # A buffer of at least shape[0] samples of shape[1:], kept across batches
+        if buffer is None or buffer.shape[1:] != tuple(shape[1:]) or buffer.shape[0] < shape[0]:
+            buffer = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def calibrate(self, batch):
+        peak = float(np.max(np.abs(batch))) if batch.size else 0.0
+        self.scale = peak / 127.0 if peak > 0 else 1.0
+
+    def encode(self, batch, out=None):
+        """
+        Batch (leading batch dimension) in the wire datatype, written into
+        out or into the encoder buffer.
+        """
+        self.encoded += 1
+        if self.datatype == "FP32" and out is None and batch.dtype == np.float32:
+            return batch
+        if out is None:
+            self._buffer = self._reuse(self._buffer, batch.shape, self.dtype)
+            out = self._buffer[:batch.shape[0]]
+        if self.datatype != "INT8":
+            np.copyto(out, batch, casting="same_kind")
+            return out
+        if self.scale is None:
+            self.calibrate(batch)
+        self._scratch = self._reuse(self._scratch, batch.shape, np.float32)
+        scratch = self._scratch[:batch.shape[0]]
+        np.multiply(batch, 1.0 / self.scale, out=scratch, casting="unsafe")
+        np.rint(scratch, out=scratch)
+        if self.zero_point:
+            np.add(scratch, self.zero_point, out=scratch)
+        np.clip(scratch, -128, 127, out=scratch)
+        np.copyto(out, scratch, casting="unsafe")
+        return out
+
+    def decode(self, batch):
+        """
+        FP32 values of an encoded batch, to check the quantization error.
+        """
+        values = batch.astype(np.float32)
+        if self.datatype == "INT8":
+            values -= self.zero_point
+            values *= self.scale
+        return values
+
+
+def request_bytes(batch, compression="none"):
+    """
+    Bytes of the input tensor of a request carrying batch, compressed as
+    the client compresses it.
+    """
+    return len(COMPRESSORS[compression](batch.tobytes()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, nargs="?", default=None,
+                        help="Packed .npy array of FP32 samples. Default is random data.")
+    parser.add_argument("-s", "--sample-shape", type=str, default="25x60x60x2",
+                        help="Sample shape of the random data. Default is 25x60x60x2.")
+    parser.add_argument("-b", "--batch-size", type=int, default=32,
+                        help="Batch size. Default is 32.")
+    parser.add_argument("-n", "--batches", type=int, default=50,
+                        help="Batches encoded per datatype. Default is 50.")
+    FLAGS = parser.parse_args()
+
+    if FLAGS.path:
+        samples = np.load(FLAGS.path, mmap_mode="r")
+        batch = np.array(samples[:FLAGS.batch_size], dtype=np.float32)
+    else:
+        shape = [FLAGS.batch_size] + [int(d) for d in FLAGS.sample_shape.split("x")]
+        batch = np.random.rand(*shape).astype(np.float32)
+    print("Batch=", list(batch.shape), "FP32(MB)=", round(batch.nbytes / 1e6, 2))
+
+    for datatype in WIRE_DTYPES:
+        encoder = WireEncoder(datatype)
+        encoded = encoder.encode(batch)
+        start = time.process_time()
+        for _ in range(FLAGS.batches):
+            encoder.encode(batch).tobytes()
+        seconds = time.process_time() - start
+        error = float(np.max(np.abs(encoder.decode(encoded) - batch)))
+        sizes = []
+        for name in COMPRESSORS:
+            sizes += ["{}(MB)=".format("Raw" if name == "none" else name.capitalize()),
+                      round(request_bytes(encoded, name) / 1e6, 2)]
+        print("   ", datatype, "Encode+serialize_CPU(ms)=", round(1000.0 * seconds / FLAGS.batches, 3),
+              "Max_error=", round(error, 5), *sizes)